@@ -1,10 +1,13 @@
-from flask import Flask, render_template, request, jsonify, session
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context, g, abort
+from flask.sessions import SecureCookieSessionInterface
 import os
 from datetime import datetime
+import time
+import hmac
 import uuid
+import hashlib
+import threading
+import json
 import logging
 
 # Load environment variables from .env file if it exists
@@ -16,307 +19,215 @@ except ImportError:
     pass
 
 # Import Azure OpenAI service
-from azure_openai_service import AzureOpenAIService
+from azure_openai_service import get_azure_openai_service
+from session_store import create_session_store
+from email_dispatch import create_email_dispatcher
+from job_store import create_job_store
+from email_summary import get_summary_renderer
+from session_summary import create_summary_pipeline
+from conversation_archive import create_conversation_archive
+from knowledge_base import get_knowledge_base_loader, render_reply, FOLLOW_UP_PROMPT
+from rate_limit import create_rate_limiter
+from chat_history import ChatMessage, Sender
+from static_assets import get_static_assets, compressed_response
+import metrics
 
-app = Flask(__name__)
+HTTP_SECONDS = metrics.histogram('it_support_http_request_duration_seconds', 'Time until the response starts', ['endpoint'])
+COOKIE_BYTES = metrics.histogram(
+    'it_support_session_cookie_bytes', 'Size of the Set-Cookie header for the session cookie',
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096)
+)
+CACHE_ENTRIES = metrics.gauge('it_support_response_cache_entries', 'Answers held in the response cache')
+EMAIL_QUEUE = metrics.gauge('it_support_email_queue_size', 'Summary emails waiting for a worker')
+
+class MeteredSessionInterface(SecureCookieSessionInterface):
+    """Cookie sessions that record how long saving takes and how large the cookie is"""
+
+    def save_session(self, app, session, response):
+        with metrics.span('session_cookie_save'):
+            super().save_session(app, session, response)
+        if metrics.registry.enabled:
+            cookie_name = self.get_cookie_name(app)
+            for header in response.headers.getlist('Set-Cookie'):
+                if header.startswith(cookie_name + '='):
+                    COOKIE_BYTES.observe(len(header))
+
+# static/ is served fingerprinted and precompressed by static_assets, not by Flask
+app = Flask(__name__, static_folder=None)
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
+app.session_interface = MeteredSessionInterface()
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize Azure OpenAI service
-azure_ai_service = AzureOpenAIService()
-
-# IT Support knowledge base with common issues and solutions in German
-IT_KNOWLEDGE_BASE = {
-    'password': {
-        'keywords': ['passwort', 'kennwort', 'reset', 'vergessen', 'anmeldung', 'konto', 'gesperrt', 'password', 'login'],
-        'title': 'Passwort zurücksetzen',
-        'steps': [
-            "1. Gehen Sie zur Unternehmens-Anmeldeseite",
-            "2. Klicken Sie auf den Link 'Passwort vergessen'",
-            "3. Geben Sie Ihre E-Mail-Adresse ein",
-            "4. Überprüfen Sie Ihre E-Mails für Anweisungen zum Zurücksetzen",
-            "5. Folgen Sie dem Link in der E-Mail und erstellen Sie ein neues Passwort",
-            "6. Ihr neues Passwort sollte mindestens 8 Zeichen mit Groß-, Kleinbuchstaben, Zahlen und Symbolen enthalten",
-            "Falls Sie weiterhin nicht auf Ihr Konto zugreifen können, kontaktieren Sie die IT unter Durchwahl 1234"
-        ]
-    },
-    'vpn': {
-        'keywords': ['vpn', 'verbindung', 'remote', 'fernzugriff', 'netzwerk', 'verbinden', 'connection'],
-        'title': 'VPN-Verbindungsprobleme',
-        'steps': [
-            "1. Überprüfen Sie zuerst Ihre Internetverbindung",
-            "2. Stellen Sie sicher, dass der VPN-Client installiert und aktualisiert ist",
-            "3. Überprüfen Sie, ob Ihre VPN-Anmeldedaten korrekt sind",
-            "4. Versuchen Sie, die Verbindung zu trennen und erneut zu verbinden",
-            "5. Löschen Sie den VPN-Cache und starten Sie die Anwendung neu",
-            "6. Überprüfen Sie, ob Ihre Firewall oder Antivirus das VPN blockiert",
-            "7. Versuchen Sie, sich mit einem anderen VPN-Server zu verbinden",
-            "Falls Probleme bestehen bleiben, kontaktieren Sie die IT mit Fehlercodes"
-        ]
-    },
-    'email': {
-        'keywords': ['email', 'e-mail', 'outlook', 'mail', 'senden', 'empfangen', 'synchronisierung', 'sync'],
-        'title': 'E-Mail-Probleme',
-        'steps': [
-            "1. Überprüfen Sie Ihre Internetverbindung",
-            "2. Starten Sie Ihren E-Mail-Client (Outlook, etc.) neu",
-            "3. Überprüfen Sie, ob Sie innerhalb des Speicherkontingents sind",
-            "4. Überprüfen Sie die E-Mail-Server-Einstellungen",
-            "5. Versuchen Sie, auf E-Mails über den Webbrowser zuzugreifen",
-            "6. Löschen Sie den E-Mail-Cache und Offline-Dateien",
-            "7. Aktualisieren Sie Ihren E-Mail-Client auf die neueste Version",
-            "Kontaktieren Sie die IT, wenn Sie Server-Konfigurationsdetails benötigen"
-        ]
-    },
-    'printer': {
-        'keywords': ['drucker', 'drucken', 'papier', 'stau', 'toner', 'printer', 'print'],
-        'title': 'Drucker-Probleme',
-        'steps': [
-            "1. Überprüfen Sie, ob der Drucker eingeschaltet und verbunden ist",
-            "2. Überprüfen Sie, ob das Papier korrekt eingelegt ist",
-            "3. Suchen Sie nach Papierstaus und beseitigen Sie diese",
-            "4. Stellen Sie sicher, dass der Toner-/Tintenstand ausreichend ist",
-            "5. Starten Sie sowohl Computer als auch Drucker neu",
-            "6. Aktualisieren oder installieren Sie die Druckertreiber neu",
-            "7. Überprüfen Sie die Druckwarteschlange und löschen Sie hängende Aufträge",
-            "Bei Hardware-Problemen kontaktieren Sie die Gebäudeverwaltung"
-        ]
-    },
-    'software': {
-        'keywords': ['software', 'anwendung', 'programm', 'installieren', 'aktualisieren', 'absturz', 'application'],
-        'title': 'Software-Probleme',
-        'steps': [
-            "1. Schließen und starten Sie die Anwendung neu",
-            "2. Überprüfen Sie auf verfügbare Software-Updates",
-            "3. Starten Sie Ihren Computer neu",
-            "4. Führen Sie das Programm als Administrator aus",
-            "5. Überprüfen Sie Systemanforderungen und Kompatibilität",
-            "6. Deaktivieren Sie temporär das Antivirus und versuchen Sie es erneut",
-            "7. Installieren Sie die Software bei Bedarf neu",
-            "Kontaktieren Sie die IT für Software-Lizenzierung oder Installationshilfe"
-        ]
-    },
-    'computer': {
-        'keywords': ['langsam', 'leistung', 'einfrieren', 'absturz', 'start', 'boot', 'slow', 'performance'],
-        'title': 'Computer-Leistungsprobleme',
-        'steps': [
-            "1. Starten Sie Ihren Computer neu",
-            "2. Überprüfen Sie den verfügbaren Festplattenspeicher (sollte mindestens 15% frei haben)",
-            "3. Führen Sie eine Festplattenbereinigung aus, um temporäre Dateien zu entfernen",
-            "4. Überprüfen Sie mit Antivirus-Software auf Malware",
-            "5. Aktualisieren Sie Ihr Betriebssystem",
-            "6. Schließen Sie unnötige Programme im Hintergrund",
-            "7. Überprüfen Sie den Task-Manager auf hohe CPU-/Speichernutzung",
-            "Falls Probleme bestehen bleiben, könnte eine Hardware-Diagnose erforderlich sein"
-        ]
-    }
-}
+# Shared Azure OpenAI service (one pooled client per process)
+azure_ai_service = get_azure_openai_service()
 
-def find_relevant_solution(message):
-    """Find the most relevant IT solution based on user message"""
-    message_lower = message.lower()
-    
-    for category, info in IT_KNOWLEDGE_BASE.items():
-        for keyword in info['keywords']:
-            if keyword in message_lower:
-                return info
-    
-    return {
-        'title': 'Allgemeine IT-Unterstützung',
-        'steps': [
-            "Ich verstehe, dass Sie ein IT-Problem haben. Hier sind einige allgemeine Schritte zur Fehlerbehebung:",
-            "1. Versuchen Sie, Ihr Gerät neu zu starten",
-            "2. Überprüfen Sie alle Kabelverbindungen",
-            "3. Aktualisieren Sie Ihre Software/Treiber",
-            "4. Kontaktieren Sie die IT-Unterstützung unter Durchwahl 1234 für spezielle Hilfe",
-            "Bitte geben Sie weitere Details zu Ihrem spezifischen Problem für bessere Hilfe an."
-        ]
-    }
-
-def send_email_summary(user_name, user_email, chat_history, main_issue):
-    """Send email summary to IT support"""
-    try:
-        # Email configuration - in production, use environment variables
-        smtp_server = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
-        smtp_port = int(os.environ.get('SMTP_PORT', '587'))
-        sender_email = os.environ.get('SENDER_EMAIL', 'your-email@company.com')
-        sender_password = os.environ.get('SENDER_PASSWORD', 'your-app-password')
-        
-        # Debug credential validation
-        logger.info(f"🔍 DEBUG - Checking credentials:")
-        logger.info(f"sender_email: '{sender_email}'")
-        logger.info(f"sender_password: '{sender_password}'")
-        logger.info(f"Email in placeholder list: {sender_email in ['test@example.com', 'your-gmail@gmail.com', 'your-email@company.com']}")
-        logger.info(f"Password in placeholder list: {sender_password in ['test-password', 'your-app-password', 'your-16-digit-app-password']}")
-        logger.info(f"'your-' in email: {'your-' in sender_email}")
-        logger.info(f"'your-' in password: {'your-' in sender_password}")
-        
-        # Check if using test/placeholder credentials
-        if (sender_email in ['test@example.com', 'your-gmail@gmail.com', 'your-email@company.com'] or 
-            sender_password in ['test-password', 'your-app-password', 'your-16-digit-app-password'] or
-            'your-' in sender_email or 'your-' in sender_password):
-            logger.info(f"DEVELOPMENT MODE: Email summary would be sent for session with {user_email}")
-            logger.info(f"Subject: IT-Support Sitzung Zusammenfassung: {main_issue}")
-            
-            # Log the full email content for testing
-            email_content = f"""
-IT-Support Chat-Sitzung Zusammenfassung
-
-Benutzerinformationen:
-- Name: {user_name}
-- E-Mail: {user_email}
-- Sitzungsdatum: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-Hauptproblem: {main_issue}
-
-Chat-Verlauf:
-"""
-            for entry in chat_history:
-                email_content += f"\n{entry['timestamp']} - {entry['sender']}: {entry['message']}\n"
-            
-            email_content += f"""
-
-Nächste Schritte:
-- Nachverfolgung mit Benutzer, falls Problem weiterhin besteht
-- Wissensdatenbank aktualisieren, falls neue Lösung gefunden wurde
-- Auf ähnliche Probleme von anderen Benutzern achten
-
-Dies ist eine automatische E-Mail vom IT-Support Chatbot System.
-"""
-            logger.info("EMAIL CONTENT PREVIEW:")
-            logger.info(email_content)
-            logger.warning("⚠️  To send real emails, update SENDER_EMAIL and SENDER_PASSWORD in .env file")
-            return True
-        
-        # PRODUCTION: Send real email
-        logger.info(f"📧 Sending real email from {sender_email} to yimiwang@microsoft.com")
-        
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = 'yimiwang@microsoft.com'
-        msg['Subject'] = f'IT-Support Sitzung Zusammenfassung: {main_issue}'
-        
-        # Create email body
-        body = f"""
-IT-Support Chat-Sitzung Zusammenfassung
+# Server-side chat sessions, the cookie only holds the session id
+session_store = create_session_store()
 
-Benutzerinformationen:
-- Name: {user_name}
-- E-Mail: {user_email}
-- Sitzungsdatum: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+# Status of summary and email jobs, shared by all workers with SESSION_STORE=sqlite
+job_store = create_job_store()
 
-Hauptproblem: {main_issue}
+# Background SMTP delivery for session summaries
+email_dispatcher = create_email_dispatcher(job_store)
+SUMMARY_RECIPIENT = os.environ.get('SUMMARY_RECIPIENT', 'yimiwang@microsoft.com')
+# Ended sessions are summarized (LLM or local) after /end_session returned, in digests when many end at once
+summary_pipeline = create_summary_pipeline(email_dispatcher, SUMMARY_RECIPIENT, azure_ai_service.summarize_session,
+                                           job_store)
 
-Chat-Verlauf:
-"""
-        
-        for entry in chat_history:
-            body += f"\n{entry['timestamp']} - {entry['sender']}: {entry['message']}\n"
-        
-        body += f"""
+# IT Support knowledge base, loaded from kb/ and reloaded when its files change
+knowledge_base = get_knowledge_base_loader()
 
-Nächste Schritte:
-- Nachverfolgung mit Benutzer, falls Problem weiterhin besteht
-- Wissensdatenbank aktualisieren, falls neue Lösung gefunden wurde
-- Auf ähnliche Probleme von anderen Benutzern achten
+# Searchable archive of ended sessions; the query API needs ARCHIVE_API_TOKEN
+conversation_archive = create_conversation_archive()
+ARCHIVE_API_TOKEN = os.environ.get('ARCHIVE_API_TOKEN', '')
 
-Dies ist eine automatische E-Mail vom IT-Support Chatbot System.
-"""
-        
-        msg.attach(MIMEText(body, 'plain'))
-        
-        # Send email
-        logger.info(f"🔄 Connecting to SMTP server {smtp_server}:{smtp_port}")
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        
-        logger.info("🔐 Authenticating...")
-        server.login(sender_email, sender_password)
-        
-        logger.info("📨 Sending email...")
-        text = msg.as_string()
-        server.sendmail(sender_email, 'yimiwang@microsoft.com', text)
-        server.quit()
-        
-        logger.info(f"✅ Email summary sent successfully to yimiwang@microsoft.com")
-        return True
-        
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = 'yimiwang@microsoft.com'
-        msg['Subject'] = f'IT-Support Sitzung Zusammenfassung: {main_issue}'
-        
-        # Create email body
-        body = f"""
-IT-Support Chat-Sitzung Zusammenfassung
+# Message limits per session, per user and overall; over the limit the bot answers without the LLM
+rate_limiter = create_rate_limiter()
 
-Benutzerinformationen:
-- Name: {user_name}
-- E-Mail: {user_email}
-- Sitzungsdatum: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+# Push new chat messages over /chat_events; each open connection holds a worker thread
+HISTORY_PUSH = os.environ.get('HISTORY_PUSH', 'false').lower() in ('1', 'true', 'yes')
+HISTORY_PUSH_SECONDS = float(os.environ.get('HISTORY_PUSH_SECONDS', '25'))
+# Wakes /chat_events streams of this process when a message is recorded
+history_changed = threading.Condition()
 
-Hauptproblem: {main_issue}
+STARTED_AT = time.time()
 
-Chat-Verlauf:
-"""
-        
-        for entry in chat_history:
-            body += f"\n{entry['timestamp']} - {entry['sender']}: {entry['message']}\n"
-        
-        body += f"""
+def preload():
+    """
+    Load everything a request would otherwise build lazily
 
-Nächste Schritte:
-- Nachverfolgung mit Benutzer, falls Problem weiterhin besteht
-- Wissensdatenbank aktualisieren, falls neue Lösung gefunden wurde
-- Auf ähnliche Probleme von anderen Benutzern achten
+    Called by serve.py in the master process before forking, so workers share
+    the compiled knowledge base, retrieval index, templates and the modules
+    that app.py imports lazily copy-on-write.
+    """
+    kb = knowledge_base.current()
+    service = azure_ai_service
+    if service.retriever:
+        service.retriever.index_for(kb)
+    if service.intent_router:
+        service.intent_router.model_for(kb)
+    if service.configured:
+        import openai, httpx  # noqa: F401
+    with app.app_context():
+        index_page()
+    get_summary_renderer()
+    service.context_builder.build([ChatMessage(Sender.USER, 'preload')])
+    logger.info(f"Preloaded {len(kb.articles)} knowledge base articles, templates and static assets")
 
-Dies ist eine automatische E-Mail vom IT-Support Chatbot System.
-"""
-        
-        msg.attach(MIMEText(body, 'plain'))
-        
-        # Send email
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(sender_email, sender_password)
-        text = msg.as_string()
-        server.sendmail(sender_email, 'yimiwang@microsoft.com', text)
-        server.quit()
-        
-        logger.info(f"Email summary sent successfully for session with {user_email}")
+@app.template_global()
+def asset_url(name):
+    """Fingerprinted URL of a file in static/"""
+    return get_static_assets().url(name)
+
+def index_page():
+    """The chat UI, rendered and compressed once per process (it has no per-request content)"""
+    assets = get_static_assets()
+    page = assets.pages.get('index.html')
+    if page is None:
+        page = assets.add_page('index.html', render_template('index.html'))
+    return page
+
+def llm_allowed(chat_session):
+    """
+    False if this message is over a rate limit and must be answered from the fallback
+
+    Takes a token from each bucket; the service calls it only right before
+    an LLM call.
+    """
+    if rate_limiter is None:
         return True
+    return rate_limiter.check(chat_session['session_id'], chat_session.get('user_email')) is None
+
+def find_relevant_solution(message):
+    """Find the most relevant IT solution based on user message"""
+    return knowledge_base.current().find_article(message)
+
+def send_email_summary(chat_session):
+    """Queue the session for the summary email to IT support, return the summary job id or None"""
+    try:
+        job_id = summary_pipeline.submit(chat_session)
+        logger.info(f"📧 Summary for {chat_session['user_email']} queued as job {job_id}")
+        return job_id
         
     except Exception as e:
-        logger.error(f"Failed to send email summary: {str(e)}")
-        return False
+        logger.error(f"Failed to queue email summary: {str(e)}")
+        return None
+
+def sse_event(payload, event_id=None, event=None):
+    """Format a payload as a Server-Sent Events data frame"""
+    frame = f"data: {json.dumps(payload)}\n\n"
+    if event is not None:
+        frame = f"event: {event}\n" + frame
+    if event_id is not None:
+        frame = f"id: {event_id}\n" + frame
+    return frame
+
+def history_sync_key(session_id):
+    """Identifies a session to the client's transcript cache without revealing the session id"""
+    return hashlib.sha256(session_id.encode('utf-8')).hexdigest()[:16]
+
+def get_chat_session():
+    """Load the server-side session referenced by the session cookie"""
+    session_id = session.get('session_id')
+    if not session_id:
+        return None
+    with metrics.span('session_load'):
+        return session_store.get(session_id)
+
+def record_message(session_id, sender, message):
+    """Append a message to the session's chat history"""
+    with metrics.span('session_save'):
+        session_store.append_message(session_id, ChatMessage(sender, message))
+    with history_changed:
+        history_changed.notify_all()
+
+@app.before_request
+def start_request_timer():
+    if metrics.registry.enabled:
+        g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_duration(response):
+    started = g.get('request_started')
+    if started is not None:
+        HTTP_SECONDS.observe(time.perf_counter() - started, endpoint=request.endpoint or 'unknown')
+    return response
 
 @app.route('/')
 def index():
     """Main chat interface"""
-    return render_template('index.html')
+    return get_static_assets().respond(index_page(), request)
+
+@app.route('/static/<path:filename>', endpoint='static')
+def static_file(filename):
+    """CSS/JS from static/, immutable under fingerprinted names"""
+    asset = get_static_assets().get(filename)
+    if asset is None:
+        abort(404)
+    return get_static_assets().respond(asset, request)
 
 @app.route('/start_session', methods=['POST'])
 def start_session():
     """Initialize a new chat session"""
     data = request.get_json()
     
-    # Store user info in session
-    session['user_name'] = data.get('name')
-    session['user_email'] = data.get('email')
-    session['session_id'] = str(uuid.uuid4())
-    session['chat_history'] = []
-    session['main_issue'] = None
+    # Store user info server-side, the cookie only carries the session id
+    session_id = str(uuid.uuid4())
+    user_name = data.get('name')
+    user_email = data.get('email')
+    session_store.create(session_id, user_name, user_email)
+    session.clear()
+    session['session_id'] = session_id
     
-    logger.info(f"New session started for {session['user_email']}")
+    logger.info(f"New session started for {user_email}")
     
     return jsonify({
         'status': 'success',
-        'message': f"Hallo {session['user_name']}! Ich bin Ihr IT-Support-Assistent. Wie kann ich Ihnen heute helfen?"
+        'message': f"Hallo {user_name}! Ich bin Ihr IT-Support-Assistent. Wie kann ich Ihnen heute helfen?",
+        'sync_key': history_sync_key(session_id)
     })
 
 @app.route('/send_message', methods=['POST'])
@@ -332,32 +243,25 @@ def send_message():
     if user_message.lower() in ['end', 'finished', 'done', 'quit', 'exit', 'ende', 'fertig', 'beenden', 'schluss']:
         return end_session()
     
+    chat_session = get_chat_session()
+    if not chat_session:
+        return jsonify({'error': 'Keine aktive Sitzung'}), 400
+    session_id = chat_session['session_id']
+    previous_history = list(chat_session['chat_history'])
+    
     # Add user message to chat history
-    timestamp = datetime.now().strftime('%H:%M:%S')
-    session['chat_history'].append({
-        'timestamp': timestamp,
-        'sender': 'User',
-        'message': user_message
-    })
+    record_message(session_id, Sender.USER, user_message)
     
     # Set main issue if this is the first question
-    if session.get('main_issue') is None:
-        session['main_issue'] = user_message
+    if chat_session.get('main_issue') is None:
+        session_store.update(session_id, main_issue=user_message)
     
     # Get AI-powered response using Azure OpenAI
     try:
-        # Prepare conversation context for AI
-        conversation_context = []
-        for entry in session.get('chat_history', [])[-5:]:  # Last 5 messages for context
-            if entry['sender'] == 'User':
-                conversation_context.append(f"Benutzer: {entry['message']}")
-            else:
-                conversation_context.append(f"Assistent: {entry['message']}")
-        
-        # Get AI response
         bot_response = azure_ai_service.get_it_support_response(
-            user_message, 
-            context="\n".join(conversation_context[:-1])  # Exclude current message
+            user_message,
+            chat_history=previous_history,
+            llm_allowed=lambda: llm_allowed(chat_session)
         )
         
         logger.info(f"✅ AI response generated successfully")
@@ -365,63 +269,284 @@ def send_message():
     except Exception as e:
         logger.error(f"❌ Error getting AI response: {str(e)}")
         # Fallback to keyword-based response
-        solution = find_relevant_solution(user_message)
-        bot_response = f"Ich kann Ihnen bei {solution['title']} helfen. Hier sind die empfohlenen Schritte:\n\n"
-        bot_response += "\n".join(solution['steps'])
+        bot_response = find_relevant_solution(user_message)['response']
     
-    # Add standard ending to response
-    bot_response += "\n\nGibt es noch etwas anderes, womit ich Ihnen helfen kann? Schreiben Sie 'ende', wenn Sie fertig sind."
+    # Add standard ending to response; knowledge base answers come pre-rendered
+    reply = knowledge_base.current().replies.get(bot_response) or render_reply(bot_response)
+    bot_response, body = reply
     
     # Add bot response to chat history
-    session['chat_history'].append({
-        'timestamp': datetime.now().strftime('%H:%M:%S'),
-        'sender': 'Bot',
-        'message': bot_response
-    })
+    record_message(session_id, Sender.BOT, bot_response)
     
-    return jsonify({
-        'status': 'success',
-        'message': bot_response
-    })
+    return Response(body, mimetype='application/json')
+
+@app.route('/send_message_stream', methods=['POST'])
+def send_message_stream():
+    """Process user message and stream the bot response as Server-Sent Events"""
+    data = request.get_json()
+    user_message = data.get('message', '').strip()
+    
+    if not user_message:
+        return jsonify({'error': 'Message cannot be empty'}), 400
+    
+    # Check if user wants to end session
+    if user_message.lower() in ['end', 'finished', 'done', 'quit', 'exit', 'ende', 'fertig', 'beenden', 'schluss']:
+        return end_session()
+    
+    chat_session = get_chat_session()
+    if not chat_session:
+        return jsonify({'error': 'Keine aktive Sitzung'}), 400
+    session_id = chat_session['session_id']
+    previous_history = list(chat_session['chat_history'])
+    
+    # Add user message to chat history
+    record_message(session_id, Sender.USER, user_message)
+    
+    # Set main issue if this is the first question
+    if chat_session.get('main_issue') is None:
+        session_store.update(session_id, main_issue=user_message)
+    
+    def generate():
+        chunks = []
+        chunks = azure_ai_service.stream_it_support_response(
+            user_message, chat_history=previous_history, llm_allowed=lambda: llm_allowed(chat_session)
+        )
+        for chunk in chunks:
+            chunks.append(chunk)
+            yield sse_event({'delta': chunk})
+        
+        # Add standard ending to response
+        ending = FOLLOW_UP_PROMPT
+        chunks.append(ending)
+        yield sse_event({'delta': ending})
+        
+        # Finalize chat history only once the stream has completed
+        bot_response = ''.join(chunks)
+        record_message(session_id, Sender.BOT, bot_response)
+        
+        logger.info(f"✅ AI response streamed successfully")
+        # Position after this exchange, so the client's transcript cache skips it when syncing
+        yield sse_event({'done': True, 'message': bot_response, 'cursor': len(previous_history) + 2})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/end_session', methods=['POST'])
 def end_session():
     """End the chat session and send email summary"""
-    if not session.get('user_name'):
+    chat_session = get_chat_session()
+    if not chat_session:
         return jsonify({'error': 'Keine aktive Sitzung'}), 400
     
-    # Send email summary
-    email_sent = send_email_summary(
-        session['user_name'],
-        session['user_email'],
-        session['chat_history'],
-        session.get('main_issue', 'General IT Support')
-    )
+    # Summarizing and delivery happen in the background
+    email_job_id = send_email_summary(chat_session)
+    
+    # Keep the transcript for IT staff, written in the background
+    if conversation_archive:
+        main_issue = chat_session.get('main_issue')
+        category = find_relevant_solution(main_issue)['category'] if main_issue else None
+        conversation_archive.submit(chat_session, category=category)
     
     # Clear session
-    user_name = session['user_name']
+    user_name = chat_session['user_name']
+    session_store.delete(chat_session['session_id'])
     session.clear()
     
     response_message = f"Vielen Dank {user_name}! Ihre Sitzung wurde beendet."
-    if email_sent:
-        response_message += " Eine Zusammenfassung wurde an unser IT-Team gesendet."
+    if email_job_id:
+        response_message += " Eine Zusammenfassung wird an unser IT-Team gesendet."
     else:
         response_message += " Hinweis: Es gab ein Problem beim Senden der Zusammenfassungs-E-Mail."
     
     return jsonify({
         'status': 'success',
         'message': response_message,
-        'session_ended': True
+        'session_ended': True,
+        'email_job_id': email_job_id
     })
 
+@app.route('/email_status/<job_id>')
+def email_status(job_id):
+    """Get the status of a queued session summary and the delivery of its email"""
+    job = summary_pipeline.get_status(job_id) or email_dispatcher.get_status(job_id)
+    if not job:
+        return jsonify({'error': 'Unbekannter E-Mail-Auftrag'}), 404
+    return jsonify(job)
+
+def archive_access_denied():
+    """Error response unless the request carries the archive API token"""
+    if not conversation_archive or not ARCHIVE_API_TOKEN:
+        return jsonify({'error': 'Archiv-API ist nicht aktiviert'}), 404
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {ARCHIVE_API_TOKEN}'):
+        return jsonify({'error': 'Nicht autorisiert'}), 401
+    return None
+
+def parse_date(value):
+    """Epoch seconds for a YYYY-MM-DD date (local time), or None"""
+    return time.mktime(datetime.strptime(value, '%Y-%m-%d').timetuple()) if value else None
+
+@app.route('/archive/search')
+def archive_search():
+    """Search archived conversations by email, date range, category or text"""
+    denied = archive_access_denied()
+    if denied:
+        return denied
+    
+    args = request.args
+    try:
+        until = parse_date(args.get('until'))
+        page = conversation_archive.search(
+            user_email=args.get('email'),
+            since=parse_date(args.get('since')),
+            until=until + 86400 if until is not None else None,
+            category=args.get('category'),
+            text=args.get('q'),
+            limit=max(1, min(int(args.get('limit', 20)), 100)),
+            cursor=args.get('cursor')
+        )
+    except ValueError:
+        return jsonify({'error': 'Ungültiger Parameter'}), 400
+    return jsonify(page)
+
+@app.route('/archive/<int:conversation_id>')
+def archive_conversation(conversation_id):
+    """Full transcript of one archived conversation"""
+    denied = archive_access_denied()
+    if denied:
+        return denied
+    
+    conversation = conversation_archive.get(conversation_id)
+    if not conversation:
+        return jsonify({'error': 'Unbekanntes Gespräch'}), 404
+    return jsonify(conversation)
+
+@app.route('/healthz')
+def healthz():
+    """Liveness of this worker process"""
+    return jsonify({'status': 'ok', 'pid': os.getpid(), 'uptime_seconds': round(time.time() - STARTED_AT, 1)})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness of this worker: knowledge base loaded, session store and email queue usable"""
+    checks = {}
+    try:
+        checks['knowledge_base'] = bool(knowledge_base.current().articles)
+    except Exception as e:
+        logger.error(f"Readiness check knowledge_base failed: {e}")
+        checks['knowledge_base'] = False
+    try:
+        session_store.get('readiness-probe')
+        checks['session_store'] = True
+    except Exception as e:
+        logger.error(f"Readiness check session_store failed: {e}")
+        checks['session_store'] = False
+    checks['email_queue'] = email_dispatcher.queue_size() < email_dispatcher.max_queue
+    
+    ready = all(checks.values())
+    return jsonify({
+        'status': 'ready' if ready else 'not ready',
+        'pid': os.getpid(),
+        'checks': checks,
+        'llm_circuit': azure_ai_service.circuit_breaker.state
+    }), 200 if ready else 503
+
+@app.route('/llm_status')
+def llm_status():
+    """Circuit breaker and request coalescing state of the Azure OpenAI dependency"""
+    return jsonify({
+        'configured': azure_ai_service.configured,
+        'circuit': azure_ai_service.circuit_breaker.snapshot(),
+        'coalescing': azure_ai_service.single_flight.stats()
+    })
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics for this worker process"""
+    if not metrics.registry.enabled:
+        return jsonify({'error': 'Metrics sind deaktiviert'}), 404
+    
+    CACHE_ENTRIES.set(azure_ai_service.response_cache.stats()['entries'])
+    EMAIL_QUEUE.set(email_dispatcher.queue_size())
+    
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/get_chat_history')
 def get_chat_history():
-    """Get current chat history"""
-    return jsonify({
-        'chat_history': session.get('chat_history', []),
-        'user_name': session.get('user_name'),
-        'session_active': bool(session.get('user_name'))
+    """
+    Get the chat history, or only the messages after a cursor
+
+    ?after=N&key=K returns the messages from position N on if K is the
+    sync_key of the current session; otherwise the full history with
+    reset=true. cursor is the position to send next time.
+    """
+    chat_session = get_chat_session()
+    if not chat_session:
+        return jsonify({'chat_history': [], 'user_name': None, 'session_active': False, 'push': HISTORY_PUSH})
+    
+    history = chat_session['chat_history']
+    sync_key = history_sync_key(chat_session['session_id'])
+    after = request.args.get('after', 0, type=int)
+    reset = request.args.get('key') != sync_key or not 0 <= after <= len(history)
+    if reset:
+        after = 0
+    body = json.dumps({
+        'chat_history': [message.to_dict() for message in history.since(after)],
+        'cursor': len(history),
+        'reset': reset,
+        'sync_key': sync_key,
+        'user_name': chat_session['user_name'],
+        'session_active': bool(chat_session['user_name']),
+        'push': HISTORY_PUSH
     })
+    return compressed_response(body.encode('utf-8'), 'application/json', request)
+
+@app.route('/chat_events')
+def chat_events():
+    """
+    Push new chat messages as Server-Sent Events (HISTORY_PUSH=true)
+
+    Each event id is the cursor after that message, so EventSource resumes
+    where it stopped via Last-Event-ID. The stream ends after
+    HISTORY_PUSH_SECONDS and the browser reconnects, so worker threads are
+    released regularly.
+    """
+    if not HISTORY_PUSH:
+        return jsonify({'error': 'Push ist deaktiviert'}), 404
+    chat_session = get_chat_session()
+    if not chat_session:
+        return jsonify({'error': 'Keine aktive Sitzung'}), 400
+    session_id = chat_session['session_id']
+    cursor = request.headers.get('Last-Event-ID', type=int)
+    if cursor is None:
+        cursor = request.args.get('after', 0, type=int)
+    
+    def generate():
+        position = cursor
+        deadline = time.monotonic() + HISTORY_PUSH_SECONDS
+        yield "retry: 1000\n\n"
+        while True:
+            record = session_store.get(session_id)
+            if record is None:
+                yield sse_event({}, event='ended')
+                return
+            for message in record['chat_history'].since(position):
+                position += 1
+                yield sse_event(message.to_dict(), event_id=position)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            # Other workers do not notify this process: look again at least every second
+            with history_changed:
+                history_changed.wait(min(remaining, 1.0))
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
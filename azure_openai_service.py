@@ -1,43 +1,25 @@
 import os
+import sys
+import time
 import base64
-from openai import AzureOpenAI
+import threading
 import logging
 
+import metrics
+from response_cache import create_response_cache
+from knowledge_base import get_knowledge_base
+from retrieval import create_retriever, format_context
+from intent_router import create_intent_router
+from context_builder import create_context_builder, count_tokens
+from circuit_breaker import create_circuit_breaker
+from single_flight import SingleFlight, flight_key
+from rate_limit import create_azure_quota
+from llm_providers import API_VERSION, CompletionRequest, KeywordProvider, create_llm_provider
+
 logger = logging.getLogger(__name__)
 
-class AzureOpenAIService:
-    def __init__(self):
-        self.endpoint = os.getenv("ENDPOINT_URL", "https://aifoundry-bundai-101.cognitiveservices.azure.com/")
-        self.deployment = os.getenv("DEPLOYMENT_NAME", "gpt-4.1-mini")
-        self.subscription_key = os.getenv("AZURE_OPENAI_API_KEY", "")
-        
-        if not self.subscription_key or self.subscription_key == "REPLACE_WITH_YOUR_KEY_VALUE_HERE":
-            logger.warning("Azure OpenAI API key not configured. Using fallback responses.")
-            self.client = None
-        else:
-            try:
-                # Initialize Azure OpenAI client with key-based authentication
-                self.client = AzureOpenAI(
-                    azure_endpoint=self.endpoint,
-                    api_key=self.subscription_key,
-                    api_version="2025-01-01-preview",
-                )
-                logger.info("Azure OpenAI client initialized successfully")
-            except Exception as e:
-                logger.error(f"Failed to initialize Azure OpenAI client: {e}")
-                self.client = None
-
-    def get_it_support_response(self, user_message, chat_history=None):
-        """
-        Get an enhanced IT support response using Azure OpenAI
-        """
-        if not self.client:
-            # Fallback to basic keyword-based responses if no LLM available
-            return self._get_fallback_response(user_message)
-        
-        try:
-            # Prepare the system prompt for IT support
-            system_prompt = """Sie sind ein professioneller IT-Support-Assistent für ein deutsches Unternehmen. 
+# System prompt for IT support
+SYSTEM_PROMPT = """Sie sind ein professioneller IT-Support-Assistent für ein deutsches Unternehmen.
             Ihre Aufgabe ist es, technische Probleme zu lösen und Schritt-für-Schritt-Anleitungen zu geben.
 
             Anweisungen:
@@ -58,166 +40,418 @@ class AzureOpenAIService:
             - Passwort-Zurücksetzung
             """
 
-            # Build chat history for context
-            messages = [
-                {
-                    "role": "system",
-                    "content": [{"type": "text", "text": system_prompt}]
-                }
-            ]
-
-            # Add chat history if available
-            if chat_history:
-                for entry in chat_history[-5:]:  # Last 5 messages for context
-                    role = "user" if entry['sender'] == 'user' else "assistant"
-                    messages.append({
-                        "role": role,
-                        "content": [{"type": "text", "text": entry['message']}]
-                    })
-
-            # Add current user message
-            messages.append({
-                "role": "user",
-                "content": [{"type": "text", "text": user_message}]
-            })
+# Prompt for the session summary sent to the IT team
+SUMMARY_PROMPT = """Fassen Sie die folgende IT-Support-Chat-Sitzung für das IT-Team zusammen.
 
-            # Generate the completion
-            completion = self.client.chat.completions.create(
-                model=self.deployment,
-                messages=messages,
-                max_tokens=800,
-                temperature=0.3,  # Lower temperature for more consistent IT support
-                top_p=0.95,
-                frequency_penalty=0,
-                presence_penalty=0,
-                stop=None,
-                stream=False
-            )
-
-            response = completion.choices[0].message.content
-            logger.info(f"Generated Azure OpenAI response for: {user_message[:50]}...")
-            return response
+            Anweisungen:
+            - Antworten Sie auf Deutsch mit höchstens 5 Stichpunkten, jeder beginnt mit "- "
+            - Nennen Sie das Problem, wichtige Details (Geräte, Fehlermeldungen, Programme),
+              die vorgeschlagene Lösung und ob das Problem gelöst ist oder was offen bleibt
+            - Keine Einleitung, keine Grußformel
+            """
 
-        except Exception as e:
-            logger.error(f"Error calling Azure OpenAI API: {e}")
-            return self._get_fallback_response(user_message)
+RESPONSES = metrics.counter('it_support_responses_total', 'Bot answers by source', ['source'])
+FALLBACKS = metrics.counter('it_support_fallbacks_total', 'Keyword fallback answers by reason', ['reason'])
+LLM_TOKENS = metrics.counter('it_support_llm_tokens_total', 'Azure OpenAI tokens used', ['direction'])
+LLM_FIRST_TOKEN = metrics.histogram('it_support_llm_first_token_seconds', 'Time until the first streamed token')
 
-    def _get_fallback_response(self, user_message):
+class AzureOpenAIService:
+    """
+    IT support answers from the configured LLM provider
+
+    Checks the response cache, rate limits, deployment quota and circuit
+    breaker before a completion, and answers from the keyword fallback
+    tier whenever the LLM is skipped or fails. Calls run on the Flask
+    request thread over the provider's pooled client, so a process serves
+    as many chats at once as it has request threads.
+    """
+
+    def __init__(self, provider=None):
+        # Azure OpenAI, the local mock or keyword-only answers (LLM_PROVIDER)
+        self.provider = provider or create_llm_provider()
+        self.fallback_provider = self.provider if isinstance(self.provider, KeywordProvider) else KeywordProvider()
+        self.deployment = self.provider.model
+
+        # Completion budget; answers grounded in retrieved articles need fewer tokens
+        self.max_tokens = int(os.getenv("AZURE_OPENAI_MAX_TOKENS", "800"))
+        self.rag_max_tokens = int(os.getenv("RAG_MAX_TOKENS", "500"))
+        self.circuit_breaker = create_circuit_breaker()
+        # Requests/tokens per minute of the deployment, None when not configured
+        self.azure_quota = create_azure_quota()
+        # Identical prompts in flight at the same time share one upstream call
+        self.single_flight = SingleFlight(enabled=os.getenv("LLM_COALESCING", "true").lower() in ("1", "true", "yes"))
+        self.retriever = create_retriever()
+        # Greetings, thanks and short well-covered questions are answered without the LLM
+        self.intent_router = create_intent_router()
+        self.context_builder = create_context_builder()
+
+        # Cache of LLM answers, scoped to the current prompt and deployment
+        self.response_cache = create_response_cache()
+        self._cache_kb_fingerprint = None
+        self.response_cache.set_namespace(SYSTEM_PROMPT, self.provider.name, self.deployment, API_VERSION, repr(None))
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    @property
+    def configured(self):
+        """True if answers come from a language model, not only from the keyword fallback"""
+        return self.provider.uses_llm
+
+    def _after_fork(self):
+        # In-flight calls belong to the parent's threads
+        self.single_flight = SingleFlight(enabled=self.single_flight.enabled)
+
+    def _refresh_cache_namespace(self):
+        """Drop cached answers when the knowledge base injected into prompts changes"""
+        if not self.retriever:
+            return
+        # The articles of the index actually served, which lags a reload until the rebuild is done
+        self.retriever.ready_index(get_knowledge_base())
+        fingerprint = self.retriever.fingerprint
+        if fingerprint != self._cache_kb_fingerprint:
+            self._cache_kb_fingerprint = fingerprint
+            self.response_cache.set_namespace(SYSTEM_PROMPT, self.provider.name, self.deployment, API_VERSION, repr(fingerprint))
+
+    def _retrieve_knowledge(self, user_message):
+        """Return the most relevant knowledge base articles formatted for the prompt, or None"""
+        if not self.retriever:
+            return None
+        results = self.retriever.retrieve(get_knowledge_base(), user_message)
+        return format_context(results) if results else None
+
+    def _cache_context(self, history_messages):
+        """Cache key part for the history that is sent to the model"""
+        return tuple(f"{message['role']}: {message['content'][0]['text']}" for message in history_messages)
+
+    def _build_messages(self, user_message, history_messages=(), knowledge_context=None):
         """
-        Fallback response when Azure OpenAI is not available
+        Build the chat completion message list for a user message
         """
-        message_lower = user_message.lower()
-        
-        # Enhanced keyword-based responses with better structure
-        if any(word in message_lower for word in ['computer', 'pc', 'rechner', 'start', 'boot', 'hochfahren']):
-            return """🖥️ **Computer-Startprobleme - Lösungsschritte:**
-
-1. **Stromversorgung prüfen:**
-   - Ist das Netzkabel richtig eingesteckt?
-   - Leuchtet die Stromled am Computer?
-
-2. **Hardware-Check:**
-   - Alle Kabel (Monitor, Tastatur, Maus) überprüfen
-   - RAM-Module neu einstecken (bei Desktop-PCs)
-
-3. **Neustart versuchen:**
-   - Computer vollständig ausschalten (30 Sekunden warten)
-   - Wieder einschalten
-
-4. **Erweiterte Optionen:**
-   - F8 beim Start drücken für Startoptionen
-   - Abgesicherter Modus versuchen
-
-**Wenn das Problem weiterhin besteht:** Kontaktieren Sie die IT-Abteilung unter Durchwahl 1234 mit der genauen Fehlermeldung."""
-
-        elif any(word in message_lower for word in ['email', 'e-mail', 'outlook', 'mail']):
-            return """📧 **E-Mail-Probleme - Schritt-für-Schritt-Lösung:**
-
-1. **Internetverbindung testen:**
-   - Können Sie andere Websites öffnen?
-   - WLAN/LAN-Verbindung überprüfen
-
-2. **Outlook neu starten:**
-   - Outlook vollständig schließen
-   - Warten Sie 30 Sekunden
-   - Outlook erneut öffnen
-
-3. **E-Mail-Einstellungen prüfen:**
-   - Datei → Kontoeinstellungen → Kontoeinstellungen
-   - "Kontoeinstellungen testen" klicken
-
-4. **Postfach-Größe überprüfen:**
-   - Sind Sie innerhalb des Speicherlimits?
-   - Alte E-Mails archivieren
-
-**Bei Passwort-Problemen:** Wenden Sie sich an die IT für eine Passwort-Zurücksetzung."""
-
-        elif any(word in message_lower for word in ['drucker', 'printer', 'drucken', 'print']):
-            return """🖨️ **Drucker-Probleme - Fehlerbehebung:**
-
-1. **Grundlegende Überprüfung:**
-   - Ist der Drucker eingeschaltet?
-   - USB/Netzwerkkabel richtig verbunden?
-   - Genug Papier und Toner/Tinte?
-
-2. **Druckwarteschlange leeren:**
-   - Windows: Einstellungen → Drucker & Scanner
-   - Drucker auswählen → "Warteschlange öffnen"
-   - Alle Aufträge löschen
-
-3. **Drucker neu starten:**
-   - Drucker ausschalten (30 Sekunden warten)
-   - Wieder einschalten
-   - Testseite drucken
-
-4. **Treiber aktualisieren:**
-   - Geräte-Manager öffnen
-   - Drucker suchen → Rechtsklick → "Treiber aktualisieren"
-
-**Bei Papierstau:** Schalten Sie den Drucker aus, bevor Sie Papier entfernen!"""
+        messages = [
+            {
+                "role": "system",
+                "content": [{"type": "text", "text": SYSTEM_PROMPT}]
+            }
+        ]
+
+        # Ground the answer in our own knowledge base articles
+        if knowledge_context:
+            messages.append({
+                "role": "system",
+                "content": [{"type": "text", "text": knowledge_context}]
+            })
 
-        elif any(word in message_lower for word in ['passwort', 'password', 'login', 'anmeldung']):
-            return """🔐 **Passwort-Probleme - Sofortige Hilfe:**
+        # Add the chat history that fits the prompt budget
+        messages.extend(history_messages)
+
+        # Add current user message
+        messages.append({
+            "role": "user",
+            "content": [{"type": "text", "text": user_message}]
+        })
+        return messages
+
+    def _record_outcome(self, error=None):
+        """Report a finished call to the circuit breaker"""
+        if error is None:
+            self.circuit_breaker.record_success()
+        elif is_dependency_failure(error):
+            self.circuit_breaker.record_failure()
+        else:
+            # e.g. a prompt rejected with 400 or by the content filter: the service itself is fine
+            self.circuit_breaker.record_neutral()
 
-1. **Passwort-Zurücksetzung:**
-   - Kontaktieren Sie die IT-Hotline: **Durchwahl 1234**
-   - Halten Sie Ihren Personalausweis bereit
-   - Temporäres Passwort wird erstellt
+    def _reserve_quota(self, messages, max_tokens):
+        """
+        Reserve deployment quota for a call; returns the reserved token estimate,
+        or None if the requests or tokens per minute are used up
+        """
+        if not self.azure_quota:
+            return 0
+        # Azure counts the prompt plus the completion budget against the TPM limit
+        estimate = max_tokens + sum(count_tokens(part['text']) for message in messages for part in message['content'])
+        return estimate if self.azure_quota.acquire(estimate) else None
+
+    def _record_usage(self, usage, reserved=0):
+        if usage is not None:
+            LLM_TOKENS.inc(usage.prompt_tokens, direction='prompt')
+            LLM_TOKENS.inc(usage.completion_tokens, direction='completion')
+            if reserved:
+                self.azure_quota.settle(reserved, usage.total_tokens)
+
+    def _refund_quota(self, reserved):
+        """Give back the token estimate of a call that reported no usage"""
+        if reserved:
+            self.azure_quota.settle(reserved, 0)
+
+    def get_it_support_response(self, user_message, chat_history=None, llm_allowed=None):
+        """
+        Get an enhanced IT support response using Azure OpenAI
 
-2. **Caps Lock prüfen:**
-   - Ist die Feststelltaste aktiviert?
-   - Wird das richtige Tastaturlayout verwendet?
+        llm_allowed is called only when the answer has to come from the LLM
+        (no intent route, no cached answer), so rate limits are spent on LLM
+        calls alone. When it returns False (the user is over a rate limit) the
+        keyword fallback is returned.
+        """
+        routed = self._route_intent(user_message, chat_history)
+        if routed is not None:
+            return routed
+        if not self.configured:
+            # Keyword-based responses only, no LLM available
+            return self._get_fallback_response(user_message, reason='no_client')
+
+        self._refresh_cache_namespace()
+        history_messages = self.context_builder.build(chat_history)
+        context = self._cache_context(history_messages)
+        cached = self.response_cache.get(user_message, context)
+        if cached is not None:
+            logger.info(f"Serving cached response for: {user_message[:50]}...")
+            RESPONSES.inc(source='cache')
+            return cached
+        if llm_allowed is not None and not llm_allowed():
+            return self._get_fallback_response(user_message, reason='rate_limited')
+
+        return self.single_flight.do(
+            flight_key(self.response_cache.namespace, user_message, context),
+            lambda: self._generate_response(user_message, history_messages, context)
+        )
+
+    def _generate_response(self, user_message, history_messages, context):
+        """Ask the LLM provider on a cache miss, falling back to the knowledge base"""
+        reserved = 0
+        try:
+            knowledge_context = self._retrieve_knowledge(user_message)
+            messages = self._build_messages(user_message, history_messages, knowledge_context)
+            max_tokens = self.rag_max_tokens if knowledge_context else self.max_tokens
+            # Answer from the keyword fallback right away while Azure OpenAI is failing
+            if not self.circuit_breaker.allow():
+                return self._get_fallback_response(user_message, reason='circuit_open')
+            # Do not send calls the deployment would reject with 429
+            reserved = self._reserve_quota(messages, max_tokens)
+            if reserved is None:
+                return self._get_fallback_response(user_message, reason='azure_quota')
 
-3. **Passwort-Richtlinien beachten:**
-   - Mindestens 8 Zeichen
-   - Großbuchstaben, Kleinbuchstaben, Zahlen
-   - Sonderzeichen verwenden
+            # Generate the completion
+            with metrics.span('llm_completion'):
+                completion = self.provider.complete(CompletionRequest(messages, max_tokens, user_message))
+            self._record_outcome()
+
+            response = completion.text
+            self._record_usage(completion.usage, reserved)
+            reserved = 0
+            RESPONSES.inc(source='llm')
+            logger.info(f"Generated {completion.provider} response in {completion.seconds:.2f}s for: {user_message[:50]}...")
+            if response:
+                self.response_cache.put(user_message, response, context)
+            return response
 
-4. **Sicherheitstipps:**
-   - Passwort nicht aufschreiben
-   - Regelmäßig ändern (alle 90 Tage)
-   - Nicht mit anderen teilen
+        except TimeoutError as e:
+            self._record_outcome(e)
+            logger.error(f"LLM provider {self.provider.name} did not answer within {self.provider.timeout:.0f}s")
+            return self._get_fallback_response(user_message, reason='timeout')
 
-**Wichtig:** Bei gesperrtem Konto sofort IT kontaktieren!"""
+        except Exception as e:
+            self._record_outcome(e)
+            logger.error(f"Error calling LLM provider {self.provider.name}: {e}")
+            return self._get_fallback_response(user_message, reason='error')
 
-        else:
-            return """🛠️ **Allgemeine IT-Unterstützung:**
+        finally:
+            # No usage was reported for a failed or cancelled call
+            self._refund_quota(reserved)
 
-Vielen Dank für Ihre Anfrage! Hier sind die ersten Schritte zur Problemlösung:
+    def stream_it_support_response(self, user_message, chat_history=None, llm_allowed=None):
+        """
+        Yield the IT support response in text chunks as Azure OpenAI generates them.
 
-1. **Computer neu starten** - Löst 80% aller Probleme
-2. **Alle Kabelverbindungen überprüfen**
-3. **Software-Updates installieren**
-4. **Antivirus-Scan durchführen**
+        The fallback response is yielded as a single chunk when no client is
+        configured, the user is over a rate limit (llm_allowed() returns
+        False, asked only before an LLM call) or the call fails before the
+        first token arrived.
+        """
+        routed = self._route_intent(user_message, chat_history)
+        if routed is not None:
+            yield routed
+            return
+        if not self.configured:
+            yield self._get_fallback_response(user_message, reason='no_client')
+            return
+
+        self._refresh_cache_namespace()
+        history_messages = self.context_builder.build(chat_history)
+        context = self._cache_context(history_messages)
+        cached = self.response_cache.get(user_message, context)
+        if cached is not None:
+            logger.info(f"Serving cached response for: {user_message[:50]}...")
+            RESPONSES.inc(source='cache')
+            yield cached
+            return
+        if llm_allowed is not None and not llm_allowed():
+            yield self._get_fallback_response(user_message, reason='rate_limited')
+            return
+
+        chunks = self.single_flight.stream(
+            flight_key(self.response_cache.namespace, user_message, context),
+            lambda: self._generate_stream(user_message, history_messages, context)
+        )
+        try:
+            yield from chunks
+        finally:
+            chunks.close()
+
+    def _generate_stream(self, user_message, history_messages, context):
+        """Stream the LLM provider's answer for a cache miss, falling back to the knowledge base"""
+        produced = []
+        reserved = 0
+        try:
+            knowledge_context = self._retrieve_knowledge(user_message)
+            messages = self._build_messages(user_message, history_messages, knowledge_context)
+            max_tokens = self.rag_max_tokens if knowledge_context else self.max_tokens
+            # Answer from the keyword fallback right away while Azure OpenAI is failing
+            if not self.circuit_breaker.allow():
+                yield self._get_fallback_response(user_message, reason='circuit_open')
+                return
+            # Do not send calls the deployment would reject with 429
+            reserved = self._reserve_quota(messages, max_tokens)
+            if reserved is None:
+                yield self._get_fallback_response(user_message, reason='azure_quota')
+                return
+
+            started = time.perf_counter()
+            with metrics.span('llm_stream'):
+                chunks = self.provider.stream(CompletionRequest(messages, max_tokens, user_message))
+                try:
+                    for chunk in chunks:
+                        # The final chunk carries the token usage
+                        if chunk.usage is not None:
+                            self._record_usage(chunk.usage, reserved)
+                            reserved = 0
+                        if chunk.text:
+                            if not produced:
+                                LLM_FIRST_TOKEN.observe(time.perf_counter() - started)
+                            produced.append(chunk.text)
+                            yield chunk.text
+                finally:
+                    chunks.close()
+            self._record_outcome()
+            # A provider that reports no usage keeps the estimate
+            reserved = 0
+            RESPONSES.inc(source='llm')
+            logger.info(f"Streamed {self.provider.name} response for: {user_message[:50]}...")
+            if produced:
+                self.response_cache.put(user_message, ''.join(produced), context)
+
+        except TimeoutError as e:
+            self._record_outcome(e)
+            logger.error(f"LLM provider {self.provider.name} stream stalled for more than {self.provider.timeout:.0f}s")
+            if not produced:
+                yield self._get_fallback_response(user_message, reason='timeout')
 
-**Für spezielle Hilfe kontaktieren Sie:**
-- 📞 IT-Hotline: **Durchwahl 1234**
-- 📧 E-Mail: it-support@firma.com
-- 🕐 Verfügbar: Mo-Fr, 8:00-17:00 Uhr
+        except Exception as e:
+            self._record_outcome(e)
+            logger.error(f"Error streaming {self.provider.name} response: {e}")
+            if not produced:
+                yield self._get_fallback_response(user_message, reason='error')
 
-**Bitte beschreiben Sie Ihr Problem genauer, damit ich Ihnen besser helfen kann!**
+        finally:
+            # No usage was reported for a failed or cancelled stream
+            self._refund_quota(reserved)
 
-Mögliche Bereiche: Computer-Probleme, E-Mail-Probleme, Drucker-Probleme, Passwort-Zurücksetzung"""
+    def summarize_session(self, chat_history, main_issue, deadline=15.0, max_tokens=300):
+        """
+        Condense an ended session into a few bullet points with one LLM call
 
-# Global instance
-azure_openai_service = AzureOpenAIService()
+        Returns the summary text, or None if no LLM is configured, the quota
+        or circuit breaker does not allow a call, or it fails or takes longer
+        than deadline seconds; the caller then summarizes locally.
+        """
+        if not self.configured:
+            return None
+        messages = [
+            {"role": "system", "content": [{"type": "text", "text": SUMMARY_PROMPT}]},
+            {"role": "user", "content": [{"type": "text", "text": summary_transcript(chat_history, main_issue)}]},
+        ]
+        if not self.circuit_breaker.allow():
+            return None
+        reserved = self._reserve_quota(messages, max_tokens)
+        if reserved is None:
+            return None
+        try:
+            with metrics.span('llm_summary'):
+                completion = self.provider.complete(CompletionRequest(messages, max_tokens, main_issue or ''),
+                                                    timeout=min(deadline, self.provider.timeout or deadline))
+        except TimeoutError as e:
+            self._record_outcome(e)
+            logger.warning(f"Session summary from {self.provider.name} took longer than {deadline:g}s")
+            self._refund_quota(reserved)
+            return None
+        except Exception as e:
+            self._record_outcome(e)
+            logger.error(f"Error summarizing session with {self.provider.name}: {e}")
+            self._refund_quota(reserved)
+            return None
+        self._record_outcome()
+        self._record_usage(completion.usage, reserved)
+        return completion.text
+
+    def _route_intent(self, user_message, chat_history):
+        """Answer from the knowledge base if the intent router is confident, else None"""
+        if not self.intent_router:
+            return None
+        with metrics.span('intent_route'):
+            route = self.intent_router.route(get_knowledge_base(), user_message, chat_history or ())
+        if route is None:
+            return None
+        RESPONSES.inc(source='intent')
+        logger.info(f"Routed to intent {route.intent} ({route.confidence:.2f}): {user_message[:50]}...")
+        return route.answer
+
+    def _get_fallback_response(self, user_message, reason='direct'):
+        """
+        Answer from the keyword fallback tier, counted by the reason the LLM was not used
+        """
+        RESPONSES.inc(source='fallback')
+        FALLBACKS.inc(reason=reason)
+        return self.fallback_provider.answer(user_message)
+
+def summary_transcript(chat_history, main_issue, max_chars=500, max_messages=40):
+    """
+    The chat as prompt text for a summary
+
+    Long messages are clipped and only the first and the most recent
+    messages of a very long chat are included, so the prompt stays small.
+    """
+    entries = list(chat_history)
+    if len(entries) > max_messages:
+        entries = entries[:2] + entries[-(max_messages - 2):]
+    lines = [f"Hauptproblem: {main_issue}", ""]
+    for entry in entries:
+        text = entry.message if len(entry.message) <= max_chars else entry.message[:max_chars] + ' …'
+        lines.append(f"{entry.sender.label}: {text}")
+    return "\n".join(lines)
+
+def is_dependency_failure(error):
+    """True for errors that mean the LLM service itself is unhealthy (not e.g. a rejected prompt)"""
+    if isinstance(error, TimeoutError):
+        return True
+    if 'openai' not in sys.modules:
+        # Only the Azure provider imports the SDK; other providers raise no HTTP errors
+        return False
+    import httpx
+    from openai import APIError, APIStatusError
+
+    if isinstance(error, APIStatusError):
+        return error.status_code >= 500 or error.status_code == 429
+    return isinstance(error, (APIError, httpx.HTTPError))
+
+# Shared instance, created on first use
+_service = None
+_service_lock = threading.Lock()
+
+def get_azure_openai_service():
+    """Return the process-wide AzureOpenAIService"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = AzureOpenAIService()
+        return _service
@@ -0,0 +1,118 @@
+import enum
+import time
+import struct
+from datetime import datetime
+
+class Sender(enum.IntEnum):
+    USER = 0
+    BOT = 1
+
+    @property
+    def label(self):
+        """Name shown in the chat, emails and archive ('User' / 'Bot')"""
+        return 'User' if self is Sender.USER else 'Bot'
+
+    @classmethod
+    def parse(cls, value):
+        """Accept a Sender, its number or a label such as 'User' / 'bot'"""
+        if isinstance(value, str) and not value.isdigit():
+            return cls.USER if value.lower() == 'user' else cls.BOT
+        return cls(int(value))
+
+class ChatMessage:
+    """
+    One chat history entry
+
+    Slotted and holding only the text, the Sender and epoch seconds, so a
+    long history costs little more than its message strings. Display
+    strings are produced when the history is rendered, not when it grows.
+    """
+
+    __slots__ = ('timestamp', 'sender', 'message')
+
+    def __init__(self, sender, message, timestamp=None):
+        self.sender = Sender.parse(sender)
+        self.message = message
+        self.timestamp = int(time.time()) if timestamp is None else int(timestamp)
+
+    @property
+    def time(self):
+        """Local time of day, e.g. '14:05:09'"""
+        return datetime.fromtimestamp(self.timestamp).strftime('%H:%M:%S')
+
+    def to_dict(self):
+        """JSON form used by the web UI and the archive API"""
+        return {'timestamp': self.time, 'sender': self.sender.label, 'message': self.message}
+
+    def __eq__(self, other):
+        if not isinstance(other, ChatMessage):
+            return NotImplemented
+        return (self.timestamp, self.sender, self.message) == (other.timestamp, other.sender, other.message)
+
+    def __repr__(self):
+        return f"ChatMessage({self.sender.label}, {self.message[:30]!r}, {self.timestamp})"
+
+class ChatHistory:
+    """
+    Append-only message buffer of one session
+
+    Entries are never changed or removed, so a reader can take the first n
+    messages as a stable snapshot while new ones are appended.
+    """
+
+    __slots__ = ('_messages',)
+
+    def __init__(self, messages=()):
+        self._messages = list(messages)
+
+    def append(self, message):
+        self._messages.append(message)
+
+    def extend(self, messages):
+        self._messages.extend(messages)
+
+    def since(self, index):
+        """Messages from position index on"""
+        return self._messages[index:]
+
+    def to_dicts(self):
+        return [message.to_dict() for message in self._messages]
+
+    def __len__(self):
+        return len(self._messages)
+
+    def __iter__(self):
+        return iter(self._messages)
+
+    def __reversed__(self):
+        return reversed(self._messages)
+
+    def __getitem__(self, index):
+        return self._messages[index]
+
+# Binary transcript: header, then per message (timestamp, sender, byte length) and the UTF-8 text
+_HEADER = b'CH\x01'
+_RECORD = struct.Struct('<qBI')
+
+def pack_history(messages):
+    """Serialize messages into the compact binary transcript format"""
+    parts = [_HEADER]
+    for message in messages:
+        text = message.message.encode('utf-8')
+        parts.append(_RECORD.pack(message.timestamp, message.sender, len(text)))
+        parts.append(text)
+    return b''.join(parts)
+
+def unpack_history(data):
+    """Read a transcript written by pack_history into a ChatHistory"""
+    if not data.startswith(_HEADER):
+        raise ValueError("Not a packed chat history")
+    data = memoryview(data)
+    history = ChatHistory()
+    offset = len(_HEADER)
+    while offset < len(data):
+        timestamp, sender, length = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        history.append(ChatMessage(Sender(sender), str(data[offset:offset + length], 'utf-8'), timestamp))
+        offset += length
+    return history
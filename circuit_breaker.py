@@ -0,0 +1,152 @@
+import os
+import time
+import threading
+import logging
+from collections import deque
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+BREAKER_STATE = metrics.gauge('it_support_circuit_state', 'Circuit breaker state (0 closed, 1 half open, 2 open)', ['name'])
+BREAKER_TRANSITIONS = metrics.counter('it_support_circuit_transitions_total', 'Circuit breaker state changes', ['name', 'state'])
+BREAKER_REJECTED = metrics.counter('it_support_circuit_rejected_total', 'Calls refused while the circuit was not closed', ['name'])
+
+class CircuitBreaker:
+    """
+    Rolling error-rate circuit breaker for a remote dependency
+
+    The circuit opens when at least min_calls calls finished within the last
+    window_seconds and failure_rate of them failed. While open, allow()
+    returns False so callers can answer from a fallback immediately. After
+    open_seconds the circuit goes half open and lets half_open_probes calls
+    through; a successful probe closes it, a failed one opens it again.
+    Calls that say nothing about the dependency's health (e.g. a rejected
+    prompt) are reported with record_neutral().
+    """
+
+    def __init__(self, name='azure_openai', failure_rate=0.5, min_calls=5, window_seconds=30.0,
+                 open_seconds=15.0, half_open_probes=1, clock=time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+        self.state = CLOSED
+        self.opened_at = None
+        self.rejected = 0
+        self.transitions = deque(maxlen=20)
+        self._outcomes = deque()
+        self._failures = 0
+        self._probes = 0
+        self._probe_started = None
+        self._lock = threading.Lock()
+        BREAKER_STATE.set(STATE_VALUES[CLOSED], name=name)
+
+    def allow(self):
+        """Return True if a call may go to the dependency now"""
+        with self._lock:
+            now = self.clock()
+            if self.state == OPEN and now - self.opened_at >= self.open_seconds:
+                self._transition(HALF_OPEN, now)
+
+            if self.state == CLOSED:
+                return True
+
+            # A probe that never reported back (e.g. cancelled) must not block probing forever
+            if self.state == HALF_OPEN and self._probes and now - self._probe_started >= self.open_seconds:
+                self._probes = 0
+            if self.state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                self._probe_started = now
+                return True
+
+            self.rejected += 1
+            BREAKER_REJECTED.inc(name=self.name)
+            return False
+
+    def record_success(self):
+        with self._lock:
+            now = self.clock()
+            if self.state == HALF_OPEN:
+                self._transition(CLOSED, now)
+                return
+            self._record(now, ok=True)
+
+    def record_failure(self):
+        with self._lock:
+            now = self.clock()
+            if self.state == HALF_OPEN:
+                self._transition(OPEN, now)
+                return
+            self._record(now, ok=False)
+            calls = len(self._outcomes)
+            if self.state == CLOSED and calls >= self.min_calls and self._failures / calls >= self.failure_rate:
+                self._transition(OPEN, now)
+
+    def record_neutral(self):
+        """A finished call that neither succeeded nor failed: only give its half-open probe slot back"""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes:
+                self._probes -= 1
+
+    def _record(self, now, ok):
+        self._outcomes.append((now, ok))
+        if not ok:
+            self._failures += 1
+        cutoff = now - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            _, old_ok = self._outcomes.popleft()
+            if not old_ok:
+                self._failures -= 1
+
+    def _transition(self, state, now):
+        previous, self.state = self.state, state
+        self._probes = 0
+        if state == OPEN:
+            self.opened_at = now
+        elif state == CLOSED:
+            self.opened_at = None
+            self._outcomes.clear()
+            self._failures = 0
+        self.transitions.append({'from': previous, 'to': state, 'at': time.time()})
+        BREAKER_STATE.set(STATE_VALUES[state], name=self.name)
+        BREAKER_TRANSITIONS.inc(name=self.name, state=state)
+        if state == OPEN:
+            logger.warning(f"⚡ Circuit {self.name} opened, using fallback responses for {self.open_seconds:.0f}s")
+        else:
+            logger.info(f"🔌 Circuit {self.name}: {previous} -> {state}")
+
+    def snapshot(self):
+        """Current state and recent transitions, for monitoring"""
+        with self._lock:
+            calls = len(self._outcomes)
+            return {
+                'name': self.name,
+                'state': self.state,
+                'window_calls': calls,
+                'window_failures': self._failures,
+                'failure_rate': self._failures / calls if calls else 0.0,
+                'rejected': self.rejected,
+                'open_for_seconds': max(0.0, self.open_seconds - (self.clock() - self.opened_at)) if self.state == OPEN else 0.0,
+                'transitions': list(self.transitions),
+            }
+
+def create_circuit_breaker(name='azure_openai'):
+    """Create the breaker configured by the LLM_BREAKER_* environment variables"""
+    return CircuitBreaker(
+        name=name,
+        failure_rate=float(os.environ.get('LLM_BREAKER_FAILURE_RATE', '0.5')),
+        min_calls=int(os.environ.get('LLM_BREAKER_MIN_CALLS', '5')),
+        window_seconds=float(os.environ.get('LLM_BREAKER_WINDOW', '30')),
+        open_seconds=float(os.environ.get('LLM_BREAKER_OPEN_SECONDS', '15')),
+        half_open_probes=int(os.environ.get('LLM_BREAKER_HALF_OPEN_PROBES', '1'))
+    )
@@ -0,0 +1,122 @@
+import os
+import logging
+from functools import lru_cache
+
+from chat_history import Sender
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    # tiktoken not installed (or encoding unavailable), estimate from UTF-8 length
+    _encoding = None
+
+logger = logging.getLogger(__name__)
+
+# Tokens the chat format adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Smallest useful remainder when a turn has to be cut to fit the budget
+MIN_PARTIAL_TURN_TOKENS = 32
+
+@lru_cache(maxsize=8192)
+def count_tokens(text):
+    """Number of tokens in a text, cached per distinct string"""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text.encode('utf-8')) + 3) // 4
+
+@lru_cache(maxsize=4096)
+def truncate_tokens(text, max_tokens):
+    """Cut a text to at most max_tokens tokens"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text)[:max_tokens]).rstrip() + " …"
+    return text[:max_tokens * 4].rstrip() + " …"
+
+def history_role(entry):
+    """Map the Sender of a ChatMessage to a chat completion role"""
+    return "user" if entry.sender is Sender.USER else "assistant"
+
+class ContextBuilder:
+    """
+    Fits the chat history into a fixed prompt token budget
+
+    Walks the history from the newest turn backwards. The latest exchange is
+    kept verbatim; older turns are truncated to max_turn_tokens, which mostly
+    shortens long bot answers. Turns that no longer fit are condensed into a
+    short summary of the user's earlier questions. Token counts are cached
+    per message text, so each turn is only counted once.
+    """
+
+    def __init__(self, budget_tokens=1200, max_turn_tokens=150, full_turns=2, summary_tokens=120):
+        self.budget_tokens = budget_tokens
+        self.max_turn_tokens = max_turn_tokens
+        self.full_turns = full_turns
+        self.summary_tokens = summary_tokens
+
+    def build(self, chat_history):
+        """Return chat completion messages for the history that fits the budget"""
+        if not chat_history:
+            return []
+
+        selected = []
+        available = self.budget_tokens - self.summary_tokens
+        dropped = 0
+        for index, entry in enumerate(reversed(chat_history)):
+            text = entry.message
+            if index >= self.full_turns:
+                text = truncate_tokens(text, self.max_turn_tokens)
+            tokens = count_tokens(text) + MESSAGE_OVERHEAD_TOKENS
+            if tokens > available:
+                # Keep the start of a turn that only partly fits, drop everything older
+                remaining = available - MESSAGE_OVERHEAD_TOKENS
+                if remaining >= MIN_PARTIAL_TURN_TOKENS:
+                    selected.append({
+                        "role": history_role(entry),
+                        "content": [{"type": "text", "text": truncate_tokens(text, remaining)}]
+                    })
+                    index += 1
+                dropped = len(chat_history) - index
+                break
+            selected.append({
+                "role": history_role(entry),
+                "content": [{"type": "text", "text": text}]
+            })
+            available -= tokens
+        selected.reverse()
+
+        if dropped:
+            summary = self.summarize(chat_history[:dropped])
+            if summary:
+                selected.insert(0, {
+                    "role": "system",
+                    "content": [{"type": "text", "text": summary}]
+                })
+        return selected
+
+    def summarize(self, older_turns):
+        """Condense turns outside the budget into the user's most recent earlier questions"""
+        questions = []
+        used = 0
+        for entry in reversed(older_turns):
+            if history_role(entry) != "user":
+                continue
+            question = truncate_tokens(entry.message, 40)
+            tokens = count_tokens(question) + 2
+            if used + tokens > self.summary_tokens:
+                break
+            questions.append(question)
+            used += tokens
+        if not questions:
+            return None
+        questions.reverse()
+        return "Frühere Fragen des Benutzers in diesem Gespräch: " + "; ".join(questions)
+
+def create_context_builder():
+    """Create the context builder configured by the CONTEXT_* environment variables"""
+    return ContextBuilder(
+        budget_tokens=int(os.environ.get('CONTEXT_TOKEN_BUDGET', '1200')),
+        max_turn_tokens=int(os.environ.get('CONTEXT_MAX_TURN_TOKENS', '150'))
+    )
@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import queue
+import atexit
+import sqlite3
+import threading
+import logging
+
+from chat_history import pack_history, unpack_history
+
+logger = logging.getLogger(__name__)
+
+class ConversationArchive:
+    """
+    Append-only SQLite archive of ended chat sessions with full-text search
+
+    Conversations are queued on /end_session and written in batches by one
+    background thread, so ending a session never waits for the disk.
+    Transcripts are stored in the packed binary chat history format; each
+    one is indexed in a contentless FTS5 table; filters on email,
+    category and date use ordinary indexes. Searches page by keyset cursor
+    (the last conversation id seen), so deep pages cost the same as the first.
+    """
+
+    def __init__(self, path='archive.db', max_queue=1000, batch_size=50):
+        self.path = path
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._local = threading.local()
+        self._writer = None
+        self._start_lock = threading.Lock()
+        self._init_schema()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # The writer thread and SQLite connections of the parent do not exist in a forked worker
+        self._local = threading.local()
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._writer = None
+        self._start_lock = threading.Lock()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS conversations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    user_name TEXT,
+                    user_email TEXT COLLATE NOCASE,
+                    main_issue TEXT,
+                    category TEXT,
+                    ended_at REAL NOT NULL,
+                    message_count INTEGER NOT NULL,
+                    transcript BLOB NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_conversations_email ON conversations(user_email, id)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_conversations_category ON conversations(category, id)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_conversations_ended ON conversations(ended_at)')
+            conn.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts USING fts5(
+                    main_issue, body, content='', tokenize='unicode61 remove_diacritics 2'
+                )
+            ''')
+
+    def start(self):
+        """Start the writer thread if it is not running yet"""
+        with self._start_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run_writer, name="conversation-archive", daemon=True)
+                self._writer.start()
+                atexit.register(self.shutdown)
+
+    def submit(self, chat_session, category=None):
+        """Queue an ended session for archiving, return False if the queue is full"""
+        self.start()
+        record = {
+            'session_id': chat_session['session_id'],
+            'user_name': chat_session.get('user_name'),
+            'user_email': chat_session.get('user_email'),
+            'main_issue': chat_session.get('main_issue'),
+            'category': category,
+            'ended_at': time.time(),
+            'chat_history': list(chat_session['chat_history']),
+        }
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            logger.error(f"❌ Archive queue is full, dropping conversation {record['session_id']}")
+            return False
+
+    def shutdown(self, timeout=10.0):
+        """Write the queued conversations and stop the writer"""
+        with self._start_lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._queue.put(None)
+            writer.join(timeout)
+
+    def flush(self):
+        """Block until every queued conversation has been written"""
+        self._queue.join()
+
+    def _run_writer(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size and batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [record for record in batch if record is not None]
+            try:
+                if records:
+                    self._write(records)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to archive {len(records)} conversations: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(records) < len(batch):
+                return
+
+    def _write(self, records):
+        conn = self._connect()
+        with conn:
+            for record in records:
+                history = record['chat_history']
+                cursor = conn.execute(
+                    'INSERT INTO conversations (session_id, user_name, user_email, main_issue, category, '
+                    'ended_at, message_count, transcript) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (record['session_id'], record['user_name'], record['user_email'], record['main_issue'],
+                     record['category'], record['ended_at'], len(history), pack_history(history))
+                )
+                conn.execute(
+                    'INSERT INTO conversations_fts (rowid, main_issue, body) VALUES (?, ?, ?)',
+                    (cursor.lastrowid, record['main_issue'] or '',
+                     '\n'.join(f"{entry.sender.label}: {entry.message}" for entry in history))
+                )
+        logger.info(f"🗄️ Archived {len(records)} conversation(s)")
+
+    @staticmethod
+    def fts_query(text):
+        """Turn free text into an FTS5 query matching all words (prefixes allowed with *)"""
+        terms = []
+        for word in text.split():
+            prefix = word.endswith('*')
+            word = word.rstrip('*').replace('"', '""')
+            if word:
+                terms.append(f'"{word}"*' if prefix else f'"{word}"')
+        return ' '.join(terms)
+
+    def search(self, user_email=None, since=None, until=None, category=None, text=None, limit=20, cursor=None):
+        """
+        Return one page of matching conversations, newest first
+
+        since/until are epoch seconds. Pass the returned next_cursor to get
+        the following page; it is None on the last page.
+        """
+        # LIMIT -1 means no limit to SQLite, and an empty page has no cursor
+        limit = max(1, limit)
+        source, id_column = 'conversations c', 'c.id'
+        clauses, params = [], []
+        query = self.fts_query(text) if text else ''
+        if query and user_email:
+            # A user has few conversations: check each of them against the full-text index
+            clauses.append('EXISTS (SELECT 1 FROM conversations_fts WHERE conversations_fts MATCH ? AND rowid = c.id)')
+            params.append(query)
+        elif query:
+            # Walk the full-text index newest first; FTS5 applies the rowid cursor and order itself
+            source = 'conversations_fts f JOIN conversations c ON c.id = f.rowid'
+            id_column = 'f.rowid'
+            clauses.append('conversations_fts MATCH ?')
+            params.append(query)
+        if user_email:
+            clauses.append('c.user_email = ?')
+            params.append(user_email)
+        if category:
+            clauses.append('c.category = ?')
+            params.append(category)
+        if since is not None:
+            clauses.append('c.ended_at >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('c.ended_at < ?')
+            params.append(until)
+        if cursor:
+            clauses.append(f'{id_column} < ?')
+            params.append(int(cursor))
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._connect().execute(
+            'SELECT c.id, c.session_id, c.user_name, c.user_email, c.main_issue, c.category, c.ended_at, '
+            f'c.message_count FROM {source} {where} ORDER BY {id_column} DESC LIMIT ?',
+            params + [limit + 1]
+        ).fetchall()
+
+        results = [dict(row) for row in rows[:limit]]
+        next_cursor = str(results[-1]['id']) if len(rows) > limit else None
+        return {'results': results, 'next_cursor': next_cursor}
+
+    def get(self, conversation_id):
+        """Return one archived conversation with its transcript, or None"""
+        row = self._connect().execute('SELECT * FROM conversations WHERE id = ?', (conversation_id,)).fetchone()
+        if row is None:
+            return None
+        conversation = dict(row)
+        transcript = conversation.pop('transcript')
+        if isinstance(transcript, bytes):
+            conversation['chat_history'] = unpack_history(transcript).to_dicts()
+        else:
+            # Archived before transcripts were packed
+            conversation['chat_history'] = json.loads(transcript)
+        return conversation
+
+def read_labeled_issues(path, limit=2000):
+    """
+    Return (main issue, category) pairs of the newest archived conversations, oldest first
+
+    Opens the archive read-only and returns [] if it does not exist, so
+    training code can use it without creating or locking the database.
+    """
+    if not os.path.exists(path):
+        return []
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=10)
+    try:
+        rows = conn.execute(
+            'SELECT main_issue, category FROM conversations '
+            'WHERE main_issue IS NOT NULL AND category IS NOT NULL ORDER BY id DESC LIMIT ?',
+            (limit,)
+        ).fetchall()
+    except sqlite3.Error as e:
+        logger.warning(f"Could not read archived issues from {path}: {e}")
+        return []
+    finally:
+        conn.close()
+    return rows[::-1]
+
+def create_conversation_archive():
+    """Create the archive configured by the ARCHIVE_* environment variables, or None if disabled"""
+    if os.environ.get('ARCHIVE_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+    return ConversationArchive(
+        path=os.environ.get('ARCHIVE_DB_PATH', 'archive.db'),
+        max_queue=int(os.environ.get('ARCHIVE_QUEUE_SIZE', '1000'))
+    )
@@ -0,0 +1,266 @@
+import os
+import time
+import uuid
+import queue
+import atexit
+import threading
+import logging
+import metrics
+from job_store import MemoryJobStore
+
+logger = logging.getLogger(__name__)
+
+EMAILS = metrics.counter('it_support_emails_total', 'Summary emails by final delivery status', ['status'])
+
+PLACEHOLDER_EMAILS = ['test@example.com', 'your-gmail@gmail.com', 'your-email@company.com']
+PLACEHOLDER_PASSWORDS = ['test-password', 'your-app-password', 'your-16-digit-app-password']
+
+class SMTPConfig:
+    """SMTP settings read from the environment"""
+
+    def __init__(self):
+        self.server = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
+        self.port = int(os.environ.get('SMTP_PORT', '587'))
+        self.sender_email = os.environ.get('SENDER_EMAIL', 'your-email@company.com')
+        self.sender_password = os.environ.get('SENDER_PASSWORD', 'your-app-password')
+        self.use_tls = os.environ.get('SMTP_USE_TLS', 'true').lower() in ('1', 'true', 'yes')
+        self.timeout = float(os.environ.get('SMTP_TIMEOUT', '30'))
+        # Dry run: write rendered messages to the spool directory instead of sending them
+        self.dry_run = os.environ.get('EMAIL_DRY_RUN', 'false').lower() in ('1', 'true', 'yes')
+        self.spool_dir = os.environ.get('EMAIL_SPOOL_DIR', 'mail_spool')
+
+    @property
+    def is_placeholder(self):
+        """True when the configured credentials are the example values"""
+        return (self.sender_email in PLACEHOLDER_EMAILS or
+                self.sender_password in PLACEHOLDER_PASSWORDS or
+                'your-' in self.sender_email or 'your-' in self.sender_password)
+
+    @property
+    def spool_only(self):
+        """True when messages go to the spool directory instead of the SMTP server"""
+        return self.dry_run or self.is_placeholder
+
+class EmailDispatcher:
+    """
+    Bounded outbound mail queue drained by background worker threads
+
+    Each worker keeps one authenticated SMTP connection open and reuses it for
+    every message it sends until the connection has been idle for
+    idle_timeout seconds. When several jobs are waiting, a worker takes up to
+    batch_size of them and sends them over the same connection. Failed sends
+    are retried with exponential backoff on a fresh connection. Job status
+    is written to the job store, where every worker process can read it.
+    """
+
+    def __init__(self, config=None, num_workers=2, max_queue=1000, max_attempts=3,
+                 backoff_seconds=1.0, batch_size=10, idle_timeout=60.0, max_tracked_jobs=10000, jobs=None):
+        self.config = config or SMTPConfig()
+        self.num_workers = num_workers
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.batch_size = batch_size
+        self.idle_timeout = idle_timeout
+        self.max_queue = max_queue
+        self.jobs = jobs or MemoryJobStore(max_tracked_jobs)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._workers = []
+        self._start_lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # Worker threads are not copied into a forked process; start fresh ones on first submit
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._workers = []
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Start the worker threads if they are not running yet"""
+        with self._start_lock:
+            if self._workers:
+                return
+            for index in range(self.num_workers):
+                worker = threading.Thread(target=self._run_worker, name=f"email-worker-{index}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            atexit.register(self.shutdown)
+
+    def submit(self, msg, recipients):
+        """
+        Queue a MIME message for delivery and return its job id
+
+        Returns None when the queue is full.
+        """
+        self.start()
+        job_id = str(uuid.uuid4())
+        job = {
+            'job_id': job_id,
+            'status': 'queued',
+            'attempts': 0,
+            'error': None,
+            'created_at': time.time(),
+            'sent_at': None,
+        }
+        self.jobs.put('email', job)
+
+        try:
+            self._queue.put_nowait((job, msg, recipients))
+        except queue.Full:
+            logger.error("❌ Email queue is full, dropping summary")
+            self._set_status(job, 'failed', error='queue full')
+            return None
+        return job_id
+
+    def get_status(self, job_id):
+        """Return a copy of the job's delivery status, or None if unknown"""
+        return self.jobs.get('email', job_id)
+
+    def queue_size(self):
+        """Number of messages waiting for a worker"""
+        return self._queue.qsize()
+
+    def shutdown(self, timeout=10.0):
+        """Stop the workers after the queued messages have been sent"""
+        with self._start_lock:
+            workers, self._workers = self._workers, []
+        for _ in workers:
+            self._queue.put((None, None, None))
+        deadline = time.time() + timeout
+        for worker in workers:
+            worker.join(max(0.0, deadline - time.time()))
+
+    def _set_status(self, job, status, error=None):
+        job['status'] = status
+        job['error'] = error
+        if status in ('sent', 'spooled'):
+            job['sent_at'] = time.time()
+        self.jobs.put('email', job)
+        if status in ('sent', 'spooled', 'failed'):
+            EMAILS.inc(status=status)
+
+    def _connect(self):
+        import smtplib
+
+        config = self.config
+        logger.info(f"🔄 Connecting to SMTP server {config.server}:{config.port}")
+        with metrics.span('smtp_connect'):
+            server = smtplib.SMTP(config.server, config.port, timeout=config.timeout)
+        if config.use_tls:
+            with metrics.span('smtp_tls'):
+                server.starttls()
+        if config.sender_password:
+            logger.info("🔐 Authenticating...")
+            with metrics.span('smtp_login'):
+                server.login(config.sender_email, config.sender_password)
+        return server
+
+    def _spool(self, job, msg):
+        """Write the message as an .eml file to the spool directory, return its path"""
+        os.makedirs(self.config.spool_dir, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{job['job_id']}.eml"
+        path = os.path.join(self.config.spool_dir, name)
+        with open(path, 'wb') as f:
+            f.write(msg.as_bytes())
+        return path
+
+    def _close(self, server):
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def _next_batch(self):
+        """Block for the next job, then take any others already waiting"""
+        batch = [self._queue.get(timeout=self.idle_timeout)]
+        while len(batch) < self.batch_size and batch[-1][0] is not None:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_worker(self):
+        server = None
+        while True:
+            try:
+                batch = self._next_batch()
+            except queue.Empty:
+                # Idle for a while, release the connection
+                self._close(server)
+                server = None
+                continue
+
+            stop = False
+            for job, msg, recipients in batch:
+                if job is None:
+                    stop = True
+                    continue
+                try:
+                    server = self._deliver(server, job, msg, recipients)
+                except Exception as e:
+                    # e.g. a header that cannot be encoded; the worker must keep serving the queue
+                    logger.error(f"Failed to send email {job['job_id']}: {e!r}")
+                    self._set_status(job, 'failed', error=str(e))
+                    self._close(server)
+                    server = None
+
+            if stop:
+                self._close(server)
+                return
+
+    def _deliver(self, server, job, msg, recipients):
+        """Send one message, retrying on a fresh connection; returns the connection to reuse"""
+        if self.config.spool_only:
+            job['attempts'] += 1
+            try:
+                path = self._spool(job, msg)
+            except OSError as e:
+                logger.error(f"Failed to spool email {job['job_id']}: {e}")
+                self._set_status(job, 'failed', error=str(e))
+                return server
+            logger.info(f"📝 DRY RUN: Email to {', '.join(recipients)} written to {path}")
+            if self.config.is_placeholder:
+                logger.warning("⚠️  To send real emails, update SENDER_EMAIL and SENDER_PASSWORD in .env file")
+            self._set_status(job, 'spooled')
+            return server
+
+        # Only imported by deployments that really send mail
+        import smtplib
+
+        while True:
+            job['attempts'] += 1
+            self._set_status(job, 'sending')
+            try:
+                if server is None:
+                    server = self._connect()
+                with metrics.span('smtp_send'):
+                    server.send_message(msg, self.config.sender_email, recipients)
+                self._set_status(job, 'sent')
+                logger.info(f"✅ Email {job['job_id']} sent to {', '.join(recipients)}")
+                return server
+
+            except (smtplib.SMTPException, OSError) as e:
+                self._close(server)
+                server = None
+                if job['attempts'] >= self.max_attempts:
+                    logger.error(f"Failed to send email {job['job_id']}: {e}")
+                    self._set_status(job, 'failed', error=str(e))
+                    return server
+
+                delay = self.backoff_seconds * 2 ** (job['attempts'] - 1)
+                logger.warning(f"Email {job['job_id']} attempt {job['attempts']} failed ({e}), retrying in {delay:.1f}s")
+                self._set_status(job, 'retrying', error=str(e))
+                time.sleep(delay)
+
+def create_email_dispatcher(jobs=None):
+    """Create the dispatcher configured by the EMAIL_* environment variables"""
+    return EmailDispatcher(
+        jobs=jobs,
+        num_workers=int(os.environ.get('EMAIL_WORKERS', '2')),
+        max_queue=int(os.environ.get('EMAIL_QUEUE_SIZE', '1000')),
+        max_attempts=int(os.environ.get('EMAIL_MAX_ATTEMPTS', '3')),
+        batch_size=int(os.environ.get('EMAIL_BATCH_SIZE', '10'))
+    )
@@ -0,0 +1,95 @@
+import os
+import base64
+import threading
+from datetime import datetime
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+EMAIL_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'email')
+
+def text_part(body, subtype):
+    """UTF-8 text part, base64-encoded in one C call instead of line by line like MIMEText"""
+    from email.mime.nonmultipart import MIMENonMultipart
+
+    part = MIMENonMultipart('text', subtype, charset='utf-8')
+    part['Content-Transfer-Encoding'] = 'base64'
+    part.set_payload(base64.encodebytes(body.encode('utf-8')).decode('ascii'))
+    return part
+
+class SummaryRenderer:
+    """
+    Renders the session summary and digest emails from templates/email/
+
+    The templates are compiled once when the renderer is created. Both the
+    plain text and the HTML alternative are rendered from the same context.
+    A summary is a list of short points (see session_summary), so the mail
+    size no longer grows with the length of the chat.
+    """
+
+    def __init__(self, template_dir=EMAIL_TEMPLATE_DIR):
+        self.environment = Environment(
+            loader=FileSystemLoader(template_dir),
+            autoescape=select_autoescape(enabled_extensions=('html',), default_for_string=False),
+            trim_blocks=True,
+            keep_trailing_newline=True,
+        )
+        self.text_template = self.environment.get_template('summary.txt')
+        self.html_template = self.environment.get_template('summary.html')
+        self.digest_text_template = self.environment.get_template('digest.txt')
+        self.digest_html_template = self.environment.get_template('digest.html')
+
+    def render(self, user_name, user_email, summary, main_issue, session_date=None):
+        """Return the (plain text, HTML) bodies of the summary"""
+        context = {
+            'user_name': user_name,
+            'user_email': user_email,
+            'summary': summary,
+            'main_issue': main_issue,
+            'session_date': session_date or datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        return self.text_template.render(context), self.html_template.render(context)
+
+    def render_digest(self, sessions):
+        """Return the (plain text, HTML) bodies of a digest of several sessions"""
+        context = {'sessions': sessions, 'digest_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+        return self.digest_text_template.render(context), self.digest_html_template.render(context)
+
+    def build_message(self, sender_email, recipient, user_name, user_email, summary, main_issue, session_date=None):
+        """Build the multipart/alternative MIME message for a chat session"""
+        text, html = self.render(user_name, user_email, summary, main_issue, session_date)
+        return alternative_message(sender_email, recipient, f'IT-Support Sitzung Zusammenfassung: {main_issue}',
+                                   text, html)
+
+    def build_digest(self, sender_email, recipient, sessions):
+        """
+        Build one MIME message for several ended sessions
+
+        Each session is a dict with user_name, user_email, main_issue,
+        session_date and summary.
+        """
+        text, html = self.render_digest(sessions)
+        return alternative_message(sender_email, recipient,
+                                   f'IT-Support Zusammenfassung: {len(sessions)} Sitzungen', text, html)
+
+def alternative_message(sender_email, recipient, subject, text, html):
+    """multipart/alternative message with a plain text and an HTML body"""
+    from email.mime.multipart import MIMEMultipart
+
+    msg = MIMEMultipart('alternative')
+    msg['From'] = sender_email
+    msg['To'] = recipient
+    msg['Subject'] = subject
+    msg.attach(text_part(text, 'plain'))
+    msg.attach(text_part(html, 'html'))
+    return msg
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+def get_summary_renderer():
+    """Return the process-wide SummaryRenderer, compiling the templates on first use"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = SummaryRenderer()
+        return _renderer
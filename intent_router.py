@@ -0,0 +1,287 @@
+import os
+import re
+import threading
+import logging
+
+try:
+    import numpy as np
+except ImportError:
+    # numpy not installed, every message goes to the LLM
+    np = None
+
+import metrics
+from retrieval import HashingEmbedder, STOPWORDS
+from conversation_archive import read_labeled_issues
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+INTENT_ROUTED = metrics.counter('it_support_intent_routed_total', 'Messages answered by the intent router', ['intent'])
+
+# Conversational intents answered without the knowledge base
+SMALL_TALK = {
+    'greeting': {
+        'examples': [
+            'hallo', 'hi', 'hey', 'guten morgen', 'guten tag', 'guten abend', 'moin', 'servus',
+            'hallo zusammen', 'hallo ist da jemand', 'grüß gott', 'hello', 'good morning',
+        ],
+        'response': "Hallo! Beschreiben Sie mir bitte Ihr IT-Problem, zum Beispiel mit Passwort, E-Mail, "
+                    "VPN, Drucker oder Software, dann helfe ich Ihnen gerne weiter.",
+    },
+    'thanks': {
+        'examples': [
+            'danke', 'vielen dank', 'danke schön', 'dankeschön', 'danke sehr', 'besten dank',
+            'super danke', 'danke für die hilfe', 'vielen dank für ihre hilfe', 'hat geklappt danke',
+            'hat funktioniert danke', 'danke für die schnelle hilfe', 'perfekt danke', 'thanks', 'thank you',
+        ],
+        'response': "Gern geschehen! Freut mich, dass ich helfen konnte.",
+    },
+}
+
+# Words of each small talk intent; a small talk message may not contain anything else
+SMALL_TALK_WORDS = {
+    intent: frozenset(word for text in small_talk['examples'] for word in _WORD.findall(text))
+    for intent, small_talk in SMALL_TALK.items()
+}
+
+# "Danke, aber das hat nicht geklappt" is a problem report, not thanks
+SMALL_TALK_BLOCKERS = frozenset((
+    'nicht', 'nichts', 'kein', 'keine', 'keinen', 'keiner', 'nie', 'aber', 'leider', 'jedoch', 'trotzdem',
+    'noch', 'problem', 'probleme', 'fehler', 'kaputt', 'not', 'no', 'but', 'still', 'problem', 'error',
+))
+
+# Phrasings a keyword is combined with to train its article
+KEYWORD_TEMPLATES = (
+    '{}', '{} funktioniert nicht', '{} geht nicht', 'problem mit {}', 'ich habe ein problem mit {}',
+    'hilfe bei {}', '{} kaputt', 'fehler bei {}',
+)
+
+class NgramHasher(HashingEmbedder):
+    """HashingEmbedder features plus word bigrams, which keep phrases like 'geht nicht' together"""
+
+    def features(self, text):
+        yield from super().features(text)
+        words = _WORD.findall(text.lower())
+        for first, second in zip(words, words[1:]):
+            yield f"{first}_{second}"
+
+def topic_words(text):
+    """Lowercased words of a text without stopwords and numbers"""
+    return [word for word in _WORD.findall(text.lower()) if word not in STOPWORDS and not word.isdigit()]
+
+class Route:
+    """An answer decided by the router: intent, its probability and the answer text"""
+
+    __slots__ = ('intent', 'confidence', 'answer')
+
+    def __init__(self, intent, confidence, answer):
+        self.intent = intent
+        self.confidence = confidence
+        self.answer = answer
+
+def training_examples(knowledge_base, archived=()):
+    """
+    Labeled (text, intent) pairs for a knowledge base snapshot
+
+    Article titles and keywords (alone and in common phrasings), the small
+    talk examples and archived (main issue, category) pairs whose category
+    is still an article.
+    """
+    examples = []
+    for category, article in knowledge_base.articles.items():
+        examples.append((article['title'], category))
+        for keyword in article['keywords']:
+            examples.extend((template.format(keyword), category) for template in KEYWORD_TEMPLATES)
+    for intent, small_talk in SMALL_TALK.items():
+        examples.extend((text, intent) for text in small_talk['examples'])
+    examples.extend((text, category) for text, category in archived if category in knowledge_base.articles)
+    return examples
+
+class IntentModel:
+    """
+    Softmax regression over hashed n-gram features
+
+    predict() scores any number of messages with one matrix product;
+    feature vectors are L2-normalized, so words the model has never seen
+    dilute the confidence instead of being ignored. coverage() tells how
+    much of a message the training data knows at all.
+    """
+
+    def __init__(self, intents, weights, bias, hasher, vocabulary=frozenset()):
+        self.intents = intents
+        self.weights = weights
+        self.bias = bias
+        self.hasher = hasher
+        self.vocabulary = vocabulary
+
+    @classmethod
+    def train(cls, examples, hasher, epochs=300, learning_rate=10.0, l2=1e-4):
+        """Fit on (text, intent) pairs with full-batch gradient descent, every intent weighted equally"""
+        intents = sorted({intent for _, intent in examples})
+        index = {intent: i for i, intent in enumerate(intents)}
+        features = hasher([text for text, _ in examples])
+        labels = np.array([index[intent] for _, intent in examples])
+        targets = np.eye(len(intents), dtype=np.float32)[labels]
+        counts = np.bincount(labels, minlength=len(intents))
+        sample_weights = (len(labels) / (len(intents) * counts[labels]))[:, None].astype(np.float32)
+
+        weights = np.zeros((hasher.dim, len(intents)), dtype=np.float32)
+        bias = np.zeros(len(intents), dtype=np.float32)
+        for _ in range(epochs):
+            gradient = sample_weights * (_softmax(features @ weights + bias) - targets) / len(labels)
+            weights -= learning_rate * (features.T @ gradient + l2 * weights)
+            bias -= learning_rate * gradient.sum(axis=0)
+        vocabulary = frozenset(word for text, _ in examples for word in topic_words(text))
+        return cls(intents, weights, bias, hasher, vocabulary)
+
+    def predict(self, texts):
+        """Return (intent per text, probability per text)"""
+        probabilities = _softmax(self.hasher(texts) @ self.weights + self.bias)
+        best = probabilities.argmax(axis=1)
+        return [self.intents[i] for i in best], probabilities[np.arange(len(texts)), best]
+
+    def coverage(self, text):
+        """Share of the topic words of a text that occur in the training examples"""
+        words = topic_words(text)
+        return sum(word in self.vocabulary for word in words) / len(words) if words else 0.0
+
+def _softmax(logits):
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+def small_talk_match(intent, message, max_words=6):
+    """True if a message is nothing but the small talk of an intent, like 'Vielen Dank!'"""
+    words = _WORD.findall(message.lower())
+    return (0 < len(words) <= max_words and not SMALL_TALK_BLOCKERS.intersection(words)
+            and SMALL_TALK_WORDS[intent].issuperset(words))
+
+class IntentRouter:
+    """
+    Answers well-covered messages from the knowledge base before the LLM
+
+    A message is routed when the model is at least `threshold` sure, at
+    least `min_coverage` of its words occur in the training data and it has
+    at most `max_words` words; longer questions and unknown words carry
+    details a standard answer would ignore. Small talk is only answered when
+    the message consists of small talk words alone, without negations or
+    problem words. An article is not given twice in one chat, so a follow-up
+    about the same problem reaches the LLM. The model is retrained in the
+    background when the knowledge base snapshot changes; until then
+    messages go to the LLM.
+    """
+
+    def __init__(self, threshold=0.8, min_coverage=0.5, max_words=12, dim=1024, archive_path=None,
+                 archive_limit=2000, small_talk_max_words=6):
+        self.threshold = threshold
+        self.min_coverage = min_coverage
+        self.max_words = max_words
+        self.small_talk_max_words = small_talk_max_words
+        self.hasher = NgramHasher(dim=dim)
+        self.archive_path = archive_path
+        self.archive_limit = archive_limit
+        # (knowledge base fingerprint, model), replaced as a whole so readers need no lock
+        self._trained = (None, None)
+        self._training = False
+        self._lock = threading.Lock()
+        self._training_lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # A training thread of the parent does not exist in a forked worker
+        self._training = False
+        self._lock = threading.Lock()
+        self._training_lock = threading.Lock()
+
+    def model_for(self, knowledge_base):
+        """The model for a knowledge base snapshot, training it first if needed (blocks)"""
+        with self._lock:
+            fingerprint, model = self._trained
+            if model is None or fingerprint != knowledge_base.fingerprint:
+                archived = read_labeled_issues(self.archive_path, self.archive_limit) if self.archive_path else []
+                model = self._train(knowledge_base, archived)
+            return model
+
+    def ready_model(self, knowledge_base):
+        """
+        The model for a knowledge base snapshot, or None while it is trained in the background
+
+        Never reads the archive or trains on the calling thread, so no chat
+        waits for a retrain.
+        """
+        fingerprint, model = self._trained
+        if model is not None and fingerprint == knowledge_base.fingerprint:
+            return model
+        # Not self._lock, which the training thread holds until it is done
+        with self._training_lock:
+            if self._training:
+                return None
+            self._training = True
+        threading.Thread(target=self._train_in_background, args=(knowledge_base,), name="intent-router-training",
+                         daemon=True).start()
+        return None
+
+    def _train_in_background(self, knowledge_base):
+        try:
+            self.model_for(knowledge_base)
+        except Exception as e:
+            logger.error(f"Failed to train intent router: {e}")
+        finally:
+            with self._training_lock:
+                self._training = False
+
+    def train(self, knowledge_base, archived=()):
+        """Replace the model with one trained on the knowledge base and (main issue, category) pairs"""
+        with self._lock:
+            return self._train(knowledge_base, archived)
+
+    def _train(self, knowledge_base, archived):
+        examples = training_examples(knowledge_base, archived)
+        model = IntentModel.train(examples, self.hasher)
+        self._trained = (knowledge_base.fingerprint, model)
+        logger.info(f"Trained intent router on {len(examples)} examples ({len(archived)} archived)")
+        return model
+
+    def answer_for(self, knowledge_base, intent):
+        if intent in SMALL_TALK:
+            return SMALL_TALK[intent]['response']
+        return knowledge_base.articles[intent]['response']
+
+    def route(self, knowledge_base, message, chat_history=()):
+        """Return a Route for a message the knowledge base answers well, or None for the LLM"""
+        if len(_WORD.findall(message)) > self.max_words:
+            return None
+        model = self.ready_model(knowledge_base)
+        if model is None:
+            return None
+        intents, confidences = model.predict([message])
+        intent, confidence = intents[0], float(confidences[0])
+        if confidence < self.threshold or model.coverage(message) < self.min_coverage:
+            return None
+        if intent in SMALL_TALK and not small_talk_match(intent, message, self.small_talk_max_words):
+            return None
+        answer = self.answer_for(knowledge_base, intent)
+        if intent not in SMALL_TALK and any(entry.message.startswith(answer) for entry in chat_history):
+            return None
+        INTENT_ROUTED.inc(intent=intent)
+        return Route(intent, confidence, answer)
+
+def create_intent_router():
+    """Create the router configured by the INTENT_* environment variables, or None if disabled"""
+    if os.environ.get('INTENT_ROUTER_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+    if np is None:
+        logger.warning("numpy not installed. Intent routing is disabled.")
+        return None
+    archive_path = None
+    if os.environ.get('ARCHIVE_ENABLED', 'true').lower() in ('1', 'true', 'yes'):
+        archive_path = os.environ.get('ARCHIVE_DB_PATH', 'archive.db')
+    return IntentRouter(
+        threshold=float(os.environ.get('INTENT_THRESHOLD', '0.8')),
+        min_coverage=float(os.environ.get('INTENT_MIN_COVERAGE', '0.5')),
+        max_words=int(os.environ.get('INTENT_MAX_WORDS', '12')),
+        dim=int(os.environ.get('INTENT_FEATURE_DIM', '1024')),
+        archive_path=archive_path,
+        archive_limit=int(os.environ.get('INTENT_ARCHIVE_LIMIT', '2000'))
+    )
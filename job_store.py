@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class MemoryJobStore:
+    """Status of background jobs in this process, oldest jobs dropped beyond max_jobs"""
+
+    def __init__(self, max_jobs=10000):
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+    def put(self, kind, job):
+        """Save a copy of a job dict under its kind (e.g. 'email') and job_id"""
+        with self._lock:
+            self._jobs[(kind, job['job_id'])] = dict(job)
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+
+    def get(self, kind, job_id):
+        """Return a copy of the job, or None if unknown"""
+        with self._lock:
+            job = self._jobs.get((kind, job_id))
+            return dict(job) if job else None
+
+class SQLiteJobStore:
+    """
+    Status of background jobs in SQLite, readable by every worker process
+
+    A job is worked on by the process that created it, but its status can be
+    polled through any worker. Jobs not updated for max_age_seconds are
+    deleted.
+    """
+
+    def __init__(self, path='sessions.db', max_age_seconds=86400, sweep_interval=300):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self._local = threading.local()
+        conn = self._connect()
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    kind TEXT NOT NULL,
+                    job_id TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    updated REAL NOT NULL,
+                    PRIMARY KEY (kind, job_id)
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_updated ON jobs(updated)')
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # SQLite connections must not be shared with the parent process
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def put(self, kind, job):
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO jobs (kind, job_id, data, updated) VALUES (?, ?, ?, ?)',
+                         (kind, job['job_id'], json.dumps(job), now))
+            if now - self._last_sweep > self.sweep_interval:
+                self._last_sweep = now
+                conn.execute('DELETE FROM jobs WHERE updated < ?', (now - self.max_age_seconds,))
+
+    def get(self, kind, job_id):
+        row = self._connect().execute('SELECT data FROM jobs WHERE kind = ? AND job_id = ?', (kind, job_id)).fetchone()
+        return json.loads(row[0]) if row else None
+
+def create_job_store():
+    """
+    Create the job status store: SQLite next to the sessions when SESSION_STORE=sqlite
+
+    With several workers only a shared store lets any of them answer a
+    status poll.
+    """
+    if os.environ.get('SESSION_STORE', 'memory').lower() == 'sqlite':
+        return SQLiteJobStore(os.environ.get('SESSION_DB_PATH', 'sessions.db'))
+    return MemoryJobStore()
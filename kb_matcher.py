@@ -0,0 +1,77 @@
+from collections import deque
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over the keywords of all knowledge base categories
+
+    Built once, it finds every keyword occurring anywhere in a message (the
+    same substring semantics as `keyword in message.lower()`) in a single pass,
+    independent of how many categories and keywords there are. Categories are
+    ranked by the number of distinct keywords found; ties keep the order in
+    which the categories were given.
+    """
+
+    def __init__(self, keyword_map):
+        self.categories = list(keyword_map)
+        self._order = {category: index for index, category in enumerate(self.categories)}
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+
+        for category, keywords in keyword_map.items():
+            for keyword in keywords:
+                self._add(keyword.lower(), category)
+        self._link()
+
+    def _add(self, keyword, category):
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+                self._goto[node][char] = next_node
+            node = next_node
+        self._output[node] += ((category, keyword),)
+
+    def _link(self):
+        """Compute failure links breadth-first and merge outputs along them"""
+        goto, fail, output = self._goto, self._fail, self._output
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, next_node in goto[node].items():
+                queue.append(next_node)
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                fail[next_node] = goto[state].get(char, 0)
+                output[next_node] += output[fail[next_node]]
+
+    def find(self, text):
+        """Return {category: set of matched keywords} for a message"""
+        goto, fail, output = self._goto, self._fail, self._output
+        matches = {}
+        node = 0
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for category, keyword in output[node]:
+                matches.setdefault(category, set()).add(keyword)
+        return matches
+
+    def rank(self, text):
+        """Return [(category, score), ...] for all matching categories, best first"""
+        matches = self.find(text)
+        return sorted(
+            ((category, len(keywords)) for category, keywords in matches.items()),
+            key=lambda item: (-item[1], self._order[item[0]])
+        )
+
+    def best(self, text):
+        """Return the best matching category, or None"""
+        ranked = self.rank(text)
+        return ranked[0][0] if ranked else None
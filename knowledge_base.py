@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import pickle
+import threading
+import logging
+
+from kb_matcher import KeywordMatcher
+
+logger = logging.getLogger(__name__)
+
+KB_DIR = os.environ.get('KB_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kb'))
+
+# Bump when the compiled KnowledgeBase layout changes
+CACHE_FORMAT = 2
+
+# Appended to every bot answer in the chat
+FOLLOW_UP_PROMPT = "\n\nGibt es noch etwas anderes, womit ich Ihnen helfen kann? Schreiben Sie 'ende', wenn Sie fertig sind."
+
+def render_article_response(article):
+    """Render the keyword-fallback answer for a knowledge base article"""
+    return (f"Ich kann Ihnen bei {article['title']} helfen. Hier sind die empfohlenen Schritte:\n\n"
+            + "\n".join(article['steps']))
+
+def render_reply(answer):
+    """Return the chat message for an answer and its JSON body for /send_message"""
+    message = answer + FOLLOW_UP_PROMPT
+    return message, json.dumps({'status': 'success', 'message': message}).encode('utf-8')
+
+def parse_markdown(text):
+    """Split a Markdown document into its simple `key: value` front matter and body"""
+    meta = {}
+    if text.startswith('---\n'):
+        header, _, text = text[4:].partition('\n---\n')
+        for line in header.splitlines():
+            key, sep, value = line.partition(':')
+            if sep:
+                meta[key.strip()] = value.strip()
+    if 'keywords' in meta:
+        meta['keywords'] = [keyword.strip() for keyword in meta['keywords'].split(',') if keyword.strip()]
+    if 'order' in meta:
+        meta['order'] = int(meta['order'])
+    if 'default' in meta:
+        meta['default'] = meta['default'].lower() in ('1', 'true', 'yes')
+    return meta, text.strip('\n')
+
+class KnowledgeBase:
+    """
+    Immutable, compiled snapshot of the knowledge base directory
+
+    articles: step-by-step solutions (kb/articles/*.json or *.md)
+    fallbacks: structured answers used when the LLM is unavailable (kb/fallbacks/*.md or *.json)
+    replies: every article and fallback answer -> (chat message, JSON response body),
+             rendered once so keyword answers are served without formatting or encoding
+    """
+
+    def __init__(self, articles, fallbacks, fingerprint=None):
+        self.fingerprint = fingerprint
+        self.default_article = None
+        self.articles = {}
+        for category, article in articles.items():
+            article = dict(article, category=category)
+            article['response'] = render_article_response(article)
+            if article.get('default'):
+                self.default_article = article
+            else:
+                self.articles[category] = article
+
+        self.default_fallback = None
+        self.fallbacks = {}
+        for category, fallback in fallbacks.items():
+            if fallback.get('default'):
+                self.default_fallback = fallback['response']
+            else:
+                self.fallbacks[category] = fallback
+
+        self.article_matcher = KeywordMatcher(
+            {category: article['keywords'] for category, article in self.articles.items()}
+        )
+        self.fallback_matcher = KeywordMatcher(
+            {category: fallback['keywords'] for category, fallback in self.fallbacks.items()}
+        )
+
+        answers = [article['response'] for article in self.articles.values()]
+        answers += [fallback['response'] for fallback in self.fallbacks.values()]
+        if self.default_article:
+            answers.append(self.default_article['response'])
+        if self.default_fallback:
+            answers.append(self.default_fallback)
+        self.replies = {answer: render_reply(answer) for answer in answers}
+
+    def find_article(self, message):
+        """Return the best matching article for a message, or the default article"""
+        category = self.article_matcher.best(message)
+        return self.articles[category] if category else self.default_article
+
+    def fallback_response(self, message):
+        """Return the structured fallback answer for a message"""
+        category = self.fallback_matcher.best(message)
+        return self.fallbacks[category]['response'] if category else self.default_fallback
+
+def _source_files(kb_dir):
+    files = []
+    for section in ('articles', 'fallbacks'):
+        section_dir = os.path.join(kb_dir, section)
+        if not os.path.isdir(section_dir):
+            continue
+        for name in sorted(os.listdir(section_dir)):
+            if name.endswith(('.json', '.md')):
+                files.append(os.path.join(section_dir, name))
+    return files
+
+def fingerprint(kb_dir):
+    """Cheap change detector: (path, mtime, size) of every source file"""
+    entries = []
+    for path in _source_files(kb_dir):
+        stat = os.stat(path)
+        entries.append((os.path.relpath(path, kb_dir), stat.st_mtime_ns, stat.st_size))
+    return (CACHE_FORMAT, tuple(entries))
+
+def _load_entry(path):
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    if path.endswith('.json'):
+        return json.loads(text)
+    meta, body = parse_markdown(text)
+    meta['response'] = body
+    return meta
+
+def compile_knowledge_base(kb_dir):
+    """Parse every source file under kb_dir into a KnowledgeBase"""
+    current_fingerprint = fingerprint(kb_dir)
+    sections = {'articles': [], 'fallbacks': []}
+    for path in _source_files(kb_dir):
+        section = os.path.basename(os.path.dirname(path))
+        category = os.path.splitext(os.path.basename(path))[0]
+        entry = _load_entry(path)
+        entry.setdefault('keywords', [])
+        sections[section].append((entry.get('order', 0), category, entry))
+
+    articles = {category: entry for _, category, entry in sorted(sections['articles'], key=lambda item: item[:2])}
+    fallbacks = {category: entry for _, category, entry in sorted(sections['fallbacks'], key=lambda item: item[:2])}
+    return KnowledgeBase(articles, fallbacks, fingerprint=current_fingerprint)
+
+class KnowledgeBaseLoader:
+    """
+    Loads the knowledge base and swaps in a new snapshot when its files change
+
+    The compiled snapshot is pickled next to the sources, so workers starting
+    against unchanged content skip parsing and index building entirely. A
+    background thread polls file mtimes; readers always get a complete
+    snapshot because the reference is replaced in one assignment.
+    """
+
+    def __init__(self, kb_dir=KB_DIR, cache_path=None, reload_interval=5.0):
+        self.kb_dir = kb_dir
+        self.cache_path = cache_path or os.path.join(kb_dir, '.cache', 'compiled.pickle')
+        self.reload_interval = reload_interval
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._watcher_pid = None
+        if hasattr(os, 'register_at_fork'):
+            # The watcher thread may have held the lock when the process forked
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+    def current(self):
+        """Return the current KnowledgeBase snapshot"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._load()
+                snapshot = self._snapshot
+        if self.reload_interval and self._watcher_pid != os.getpid():
+            self._start_watcher()
+        return snapshot
+
+    def reload(self):
+        """Rebuild the snapshot if the source files changed; returns True on swap"""
+        current_fingerprint = fingerprint(self.kb_dir)
+        if self._snapshot is not None and self._snapshot.fingerprint == current_fingerprint:
+            return False
+        with self._lock:
+            self._snapshot = self._load()
+        logger.info(f"Knowledge base reloaded from {self.kb_dir}")
+        return True
+
+    def _load(self):
+        current_fingerprint = fingerprint(self.kb_dir)
+        try:
+            with open(self.cache_path, 'rb') as f:
+                cached = pickle.load(f)
+            if cached.fingerprint == current_fingerprint:
+                return cached
+        except (OSError, pickle.PickleError, EOFError, AttributeError):
+            pass
+
+        knowledge_base = compile_knowledge_base(self.kb_dir)
+        self._write_cache(knowledge_base)
+        return knowledge_base
+
+    def _write_cache(self, knowledge_base):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(knowledge_base, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write knowledge base cache {self.cache_path}: {e}")
+
+    def _start_watcher(self):
+        with self._lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+        threading.Thread(target=self._watch, name="kb-watcher", daemon=True).start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.reload_interval)
+            try:
+                self.reload()
+            except Exception as e:
+                # Keep serving the previous snapshot until the files are fixed
+                logger.error(f"Failed to reload knowledge base: {e}")
+
+_loader = None
+_loader_lock = threading.Lock()
+
+def get_knowledge_base_loader():
+    """Return the process-wide KnowledgeBaseLoader"""
+    global _loader
+    with _loader_lock:
+        if _loader is None:
+            _loader = KnowledgeBaseLoader(reload_interval=float(os.environ.get('KB_RELOAD_INTERVAL', '5')))
+        return _loader
+
+def get_knowledge_base():
+    """Return the current knowledge base snapshot"""
+    return get_knowledge_base_loader().current()
@@ -0,0 +1,347 @@
+import os
+import time
+import threading
+import logging
+
+import metrics
+from context_builder import count_tokens
+from knowledge_base import get_knowledge_base
+
+logger = logging.getLogger(__name__)
+
+API_VERSION = "2025-01-01-preview"
+
+PROVIDER_CALLS = metrics.counter('it_support_provider_calls_total', 'Completion calls by provider and outcome', ['provider', 'outcome'])
+PROVIDER_SECONDS = metrics.histogram('it_support_provider_latency_seconds', 'Duration of successful completion calls', ['provider'])
+
+class Usage:
+    """Tokens a completion used, as reported by the model (or estimated by a mock)"""
+
+    __slots__ = ('prompt_tokens', 'completion_tokens')
+
+    def __init__(self, prompt_tokens, completion_tokens):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+    @property
+    def total_tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+class CompletionRequest:
+    """
+    What the service asks a provider for
+
+    messages: chat completion messages (system prompt, knowledge context, history, user message)
+    max_tokens: completion budget
+    user_message: the raw question, for providers that answer without the prompt
+    """
+
+    __slots__ = ('messages', 'max_tokens', 'user_message')
+
+    def __init__(self, messages, max_tokens, user_message):
+        self.messages = messages
+        self.max_tokens = max_tokens
+        self.user_message = user_message
+
+class CompletionResponse:
+    """A finished answer: text, the provider that wrote it, its Usage (or None) and the call duration"""
+
+    __slots__ = ('text', 'provider', 'usage', 'seconds')
+
+    def __init__(self, text, provider, usage=None, seconds=0.0):
+        self.text = text
+        self.provider = provider
+        self.usage = usage
+        self.seconds = seconds
+
+class CompletionChunk:
+    """One piece of a streamed answer; the last chunk of a stream may carry only the Usage"""
+
+    __slots__ = ('text', 'usage')
+
+    def __init__(self, text='', usage=None):
+        self.text = text
+        self.usage = usage
+
+class LLMProvider:
+    """
+    Source of completions behind AzureOpenAIService
+
+    Subclasses implement _complete and _stream and raise TimeoutError when
+    the answer (for streams: the first or any further chunk) takes longer
+    than the timeout they are given. complete() and stream() count every
+    call by outcome (ok, error, timeout, cancelled) with its latency, so all
+    providers are measured the same way.
+    """
+
+    name = None
+    model = None
+    # Seconds; None waits as long as the provider takes
+    timeout = None
+    # False for providers that answer without a language model
+    uses_llm = True
+
+    def prepare(self):
+        """Create clients ahead of the first call"""
+
+    def _account(self, outcome, started):
+        PROVIDER_CALLS.inc(provider=self.name, outcome=outcome)
+        seconds = time.perf_counter() - started
+        if outcome == 'ok':
+            PROVIDER_SECONDS.observe(seconds, provider=self.name)
+        return seconds
+
+    def complete(self, request, timeout=None):
+        """Return a CompletionResponse; raises TimeoutError after timeout (default self.timeout)"""
+        started = time.perf_counter()
+        try:
+            response = self._complete(request, timeout or self.timeout)
+        except TimeoutError:
+            self._account('timeout', started)
+            raise
+        except Exception:
+            self._account('error', started)
+            raise
+        response.seconds = self._account('ok', started)
+        return response
+
+    def stream(self, request):
+        """Yield CompletionChunks; raises TimeoutError when a chunk takes longer than self.timeout"""
+        started = time.perf_counter()
+        outcome = 'cancelled'
+        chunks = self._stream(request, self.timeout)
+        try:
+            yield from chunks
+            outcome = 'ok'
+        except TimeoutError:
+            outcome = 'timeout'
+            raise
+        except Exception:
+            outcome = 'error'
+            raise
+        finally:
+            chunks.close()
+            self._account(outcome, started)
+
+    def _complete(self, request, timeout):
+        raise NotImplementedError
+
+    def _stream(self, request, timeout):
+        raise NotImplementedError
+        yield
+
+class AzureOpenAIProvider(LLMProvider):
+    """Chat completions from an Azure OpenAI deployment over one pooled, lazily created client"""
+
+    name = 'azure'
+
+    def __init__(self, endpoint, deployment, api_key, timeout=20.0, max_retries=1,
+                 max_connections=100, max_keepalive=20, http_timeout=60.0):
+        self.endpoint = endpoint
+        self.model = deployment
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.http_timeout = http_timeout
+        self._client = None
+        self._client_lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # Pooled connections must not be shared with the parent process
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """The shared AzureOpenAI client (the openai SDK is imported on first use)"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    def prepare(self):
+        try:
+            self.client
+        except Exception as e:
+            # Every call fails the same way and is answered by the fallback tier
+            logger.error(f"Failed to initialize Azure OpenAI client: {e}")
+
+    def _create_client(self):
+        import httpx
+        from openai import AzureOpenAI
+
+        # One pooled, thread-safe HTTP client shared by all request threads of the process
+        http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_keepalive),
+            timeout=self.http_timeout,
+        )
+        client = AzureOpenAI(
+            azure_endpoint=self.endpoint,
+            api_key=self.api_key,
+            api_version=API_VERSION,
+            http_client=http_client,
+            max_retries=self.max_retries,
+        )
+        logger.info("Azure OpenAI client initialized successfully")
+        return client
+
+    def _create(self, request, timeout, stream=False):
+        from openai import APITimeoutError
+
+        options = {}
+        if stream:
+            # Ask for a final usage chunk so streamed answers are counted too
+            options['stream_options'] = {"include_usage": True}
+        if timeout:
+            # The read timeout bounds the answer, and the wait for every further chunk of a stream
+            options['timeout'] = timeout
+        try:
+            return self.client.chat.completions.create(
+                model=self.model,
+                messages=request.messages,
+                max_tokens=request.max_tokens,
+                temperature=0.3,  # Lower temperature for more consistent IT support
+                top_p=0.95,
+                frequency_penalty=0,
+                presence_penalty=0,
+                stop=None,
+                stream=stream,
+                **options
+            )
+        except APITimeoutError as e:
+            raise TimeoutError(str(e)) from e
+
+    @staticmethod
+    def _usage(usage):
+        return Usage(usage.prompt_tokens, usage.completion_tokens) if usage is not None else None
+
+    def _complete(self, request, timeout):
+        completion = self._create(request, timeout)
+        return CompletionResponse(completion.choices[0].message.content, self.name, self._usage(completion.usage))
+
+    def _stream(self, request, timeout):
+        import httpx
+
+        completion = self._create(request, timeout, stream=True)
+        try:
+            for chunk in completion:
+                # Azure sends a leading chunk with content filter results and no choices,
+                # and the final chunk carries the token usage and no choices
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                usage = self._usage(chunk.usage)
+                if text or usage:
+                    yield CompletionChunk(text or '', usage)
+        except httpx.TimeoutException as e:
+            raise TimeoutError(str(e)) from e
+        finally:
+            completion.close()
+
+class MockProvider(LLMProvider):
+    """
+    Local stand-in for the LLM, for development and demos without Azure
+
+    Answers with the matching knowledge base article after a configurable
+    delay, streamed word by word, with estimated token usage.
+    """
+
+    name = 'mock'
+    model = 'mock'
+
+    def __init__(self, latency=0.3, token_delay=0.02, timeout=20.0):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.timeout = timeout
+
+    def _answer(self, request):
+        text = get_knowledge_base().find_article(request.user_message)['response']
+        prompt_tokens = sum(count_tokens(part['text']) for message in request.messages for part in message['content'])
+        return text, Usage(prompt_tokens, count_tokens(text))
+
+    @staticmethod
+    def _sleep(seconds, timeout):
+        if timeout and seconds > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"mock answer takes {seconds:.1f}s")
+        time.sleep(seconds)
+
+    def _complete(self, request, timeout):
+        text, usage = self._answer(request)
+        self._sleep(self.latency + self.token_delay * usage.completion_tokens, timeout)
+        return CompletionResponse(text, self.name, usage)
+
+    def _stream(self, request, timeout):
+        text, usage = self._answer(request)
+        self._sleep(self.latency, timeout)
+        for index, word in enumerate(text.split(' ')):
+            yield CompletionChunk(word if index == 0 else ' ' + word)
+            self._sleep(self.token_delay, timeout)
+        yield CompletionChunk(usage=usage)
+
+class KeywordProvider(LLMProvider):
+    """
+    Keyword-matched structured answers from the knowledge base, no LLM
+
+    The fallback tier: it serves every answer when no LLM is configured and
+    steps in whenever the LLM is skipped or fails. answer() is synchronous
+    and accounted like every other provider call.
+    """
+
+    name = 'keyword'
+    model = 'keyword'
+    uses_llm = False
+
+    def answer(self, user_message):
+        started = time.perf_counter()
+        try:
+            text = get_knowledge_base().fallback_response(user_message)
+        except Exception:
+            self._account('error', started)
+            raise
+        self._account('ok', started)
+        return text
+
+    def _complete(self, request, timeout):
+        return CompletionResponse(self.answer(request.user_message), self.name)
+
+    def _stream(self, request, timeout):
+        yield CompletionChunk(self.answer(request.user_message))
+
+def create_llm_provider():
+    """
+    Create the provider selected by LLM_PROVIDER (azure, mock or keyword)
+
+    Azure falls back to the keyword provider when no API key is configured.
+    """
+    name = os.getenv("LLM_PROVIDER", "azure").lower()
+    if name == 'mock':
+        logger.info("Using the local mock LLM provider")
+        return MockProvider(
+            latency=float(os.getenv("MOCK_LLM_LATENCY", "0.3")),
+            token_delay=float(os.getenv("MOCK_LLM_TOKEN_DELAY", "0.02")),
+        )
+    if name == 'keyword':
+        logger.info("Using keyword answers from the knowledge base only")
+        return KeywordProvider()
+    if name != 'azure':
+        logger.warning(f"Unknown LLM_PROVIDER '{name}', using Azure OpenAI")
+
+    api_key = os.getenv("AZURE_OPENAI_API_KEY", "")
+    if not api_key or api_key == "REPLACE_WITH_YOUR_KEY_VALUE_HERE":
+        logger.warning("Azure OpenAI API key not configured. Using fallback responses.")
+        return KeywordProvider()
+    return AzureOpenAIProvider(
+        endpoint=os.getenv("ENDPOINT_URL", "https://aifoundry-bundai-101.cognitiveservices.azure.com/"),
+        deployment=os.getenv("DEPLOYMENT_NAME", "gpt-4.1-mini"),
+        api_key=api_key,
+        # Upper bound for one completion (streams: for the first and every further chunk)
+        timeout=float(os.getenv("AZURE_OPENAI_DEADLINE", "20")),
+        max_retries=int(os.getenv("AZURE_OPENAI_MAX_RETRIES", "1")),
+        max_connections=int(os.getenv("AZURE_OPENAI_MAX_CONNECTIONS", "100")),
+        max_keepalive=int(os.getenv("AZURE_OPENAI_MAX_KEEPALIVE", "20")),
+        http_timeout=float(os.getenv("AZURE_OPENAI_TIMEOUT", "60")),
+    )
@@ -0,0 +1,223 @@
+import os
+import time
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = metrics.counter('it_support_rate_limited_total', 'Requests answered without the LLM because of a limit', ['scope'])
+AZURE_BUDGET = metrics.gauge('it_support_azure_budget_remaining', 'Remaining Azure OpenAI budget in the current minute', ['unit'])
+
+def parse_rate(value):
+    """Parse 'N/SECONDS' (e.g. '10/60') into (capacity, refill per second); None when 0 or empty"""
+    if not value:
+        return None
+    count, _, seconds = value.partition('/')
+    count, seconds = float(count), float(seconds or 60)
+    if count <= 0 or seconds <= 0:
+        return None
+    return count, count / seconds
+
+def _refill(tokens, updated, capacity, rate, now):
+    return min(capacity, tokens + (now - updated) * rate)
+
+class MemoryBucketStore:
+    """Token buckets in this process, least recently used keys dropped beyond max_keys"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+    def take(self, key, cost, capacity, rate, force=False):
+        """
+        Take cost tokens from a bucket; returns (allowed, tokens left)
+
+        With force the tokens are taken even if that leaves the bucket in
+        debt (down to -capacity); a negative cost refunds tokens.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = _refill(tokens, updated, capacity, rate, now)
+            allowed = force or tokens >= cost
+            if allowed:
+                tokens = max(-capacity, min(capacity, tokens - cost))
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed, tokens
+
+class SQLiteBucketStore:
+    """
+    Token buckets in a SQLite file shared by all worker processes on a host
+
+    Every take runs in a BEGIN IMMEDIATE transaction, so concurrent workers
+    never both spend the same tokens. A take waits at most lock_timeout
+    seconds for another worker's transaction (the chat request is waiting
+    on it) and then allows the call without counting it.
+    """
+
+    def __init__(self, path='ratelimit.db', max_idle_seconds=3600, lock_timeout=0.05):
+        self.path = path
+        self.max_idle_seconds = max_idle_seconds
+        self.lock_timeout = lock_timeout
+        self._local = threading.local()
+        self._last_sweep = time.time()
+        conn = self._connect()
+        conn.execute('CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(f'PRAGMA busy_timeout = {int(self.lock_timeout * 1000)}')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, cost, capacity, rate, force=False):
+        """Same contract as MemoryBucketStore.take; (True, None) if the database stayed locked"""
+        # Wall clock, shared by all processes
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+        except sqlite3.OperationalError as e:
+            # Fail open: a busy limiter must not hold up requests
+            logger.warning(f"Rate limit bucket {key} not checked: {e}")
+            return True, None
+        try:
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens = _refill(*(row or (capacity, now)), capacity, rate, now)
+            allowed = force or tokens >= cost
+            if allowed:
+                tokens = max(-capacity, min(capacity, tokens - cost))
+            conn.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)', (key, tokens, now))
+            if now - self._last_sweep > self.max_idle_seconds:
+                self._last_sweep = now
+                conn.execute('DELETE FROM buckets WHERE updated < ?', (now - self.max_idle_seconds,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, tokens
+
+class RateLimiter:
+    """
+    Message limits per session, per user email and for the whole deployment
+
+    Each limit is a token bucket given as (capacity, refill per second);
+    None disables it. check() returns the scope of the first exhausted
+    bucket, or None when the message may use the LLM.
+    """
+
+    def __init__(self, store, session_rate=None, user_rate=None, global_rate=None):
+        self.store = store
+        self.limits = (('session', session_rate), ('user', user_rate), ('global', global_rate))
+
+    def check(self, session_id, user_email=None):
+        keys = {'session': session_id, 'user': (user_email or '').lower(), 'global': 'all'}
+        taken = []
+        for scope, rate in self.limits:
+            if rate is None or not keys[scope]:
+                continue
+            key = f"{scope}:{keys[scope]}"
+            allowed, _ = self.store.take(key, 1, *rate)
+            if allowed:
+                taken.append((key, rate))
+            else:
+                # A rejected message does not count against the buckets it already passed
+                for taken_key, taken_rate in taken:
+                    self.store.take(taken_key, -1, *taken_rate, force=True)
+                RATE_LIMITED.inc(scope=scope)
+                logger.warning(f"🚦 {scope} rate limit reached ({keys[scope]}), answering without the LLM")
+                return scope
+        return None
+
+class AzureQuota:
+    """
+    Requests-per-minute and tokens-per-minute budget of the Azure OpenAI deployment
+
+    acquire() reserves one request and an estimate of the tokens before a
+    call; settle() corrects the reservation with the usage Azure reports,
+    so the budget follows real consumption.
+    """
+
+    def __init__(self, store, rpm=0, tpm=0):
+        self.store = store
+        self.rpm = rpm
+        self.tpm = tpm
+
+    def acquire(self, estimated_tokens):
+        """Reserve budget for one call; False if the deployment quota is used up"""
+        if self.rpm:
+            allowed, left = self.store.take('azure:rpm', 1, self.rpm, self.rpm / 60)
+            if left is not None:
+                AZURE_BUDGET.set(left, unit='requests')
+            if not allowed:
+                RATE_LIMITED.inc(scope='azure_rpm')
+                return False
+        if self.tpm:
+            allowed, left = self.store.take('azure:tpm', estimated_tokens, self.tpm, self.tpm / 60)
+            if left is not None:
+                AZURE_BUDGET.set(left, unit='tokens')
+            if not allowed:
+                if self.rpm:
+                    self.store.take('azure:rpm', -1, self.rpm, self.rpm / 60)
+                RATE_LIMITED.inc(scope='azure_tpm')
+                return False
+        return True
+
+    def settle(self, estimated_tokens, used_tokens):
+        """Replace the token estimate of a finished call with its reported usage"""
+        if self.tpm and used_tokens != estimated_tokens:
+            _, left = self.store.take('azure:tpm', used_tokens - estimated_tokens, self.tpm, self.tpm / 60, force=True)
+            if left is not None:
+                AZURE_BUDGET.set(left, unit='tokens')
+
+def create_bucket_store():
+    """Create the bucket store configured by RATE_LIMIT_BACKEND (memory or sqlite)"""
+    backend = os.environ.get('RATE_LIMIT_BACKEND', 'memory').lower()
+    if backend == 'sqlite':
+        return SQLiteBucketStore(
+            os.environ.get('RATE_LIMIT_DB_PATH', 'ratelimit.db'),
+            lock_timeout=float(os.environ.get('RATE_LIMIT_DB_TIMEOUT', '0.05'))
+        )
+    if backend != 'memory':
+        logger.warning(f"Unknown RATE_LIMIT_BACKEND '{backend}', using in-memory rate limits")
+    return MemoryBucketStore()
+
+def create_rate_limiter(store=None):
+    """Create the message limiter configured by the RATE_LIMIT_* environment variables, or None if disabled"""
+    if os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+    return RateLimiter(
+        store or create_bucket_store(),
+        session_rate=parse_rate(os.environ.get('RATE_LIMIT_SESSION', '10/60')),
+        user_rate=parse_rate(os.environ.get('RATE_LIMIT_USER', '30/300')),
+        global_rate=parse_rate(os.environ.get('RATE_LIMIT_GLOBAL', '600/60'))
+    )
+
+def create_azure_quota(store=None):
+    """Create the deployment budget from AZURE_OPENAI_RPM / AZURE_OPENAI_TPM, or None if neither is set"""
+    rpm = int(os.environ.get('AZURE_OPENAI_RPM', '0'))
+    tpm = int(os.environ.get('AZURE_OPENAI_TPM', '0'))
+    if not rpm and not tpm:
+        return None
+    return AzureQuota(store or create_bucket_store(), rpm=rpm, tpm=tpm)
@@ -0,0 +1,244 @@
+import os
+import re
+import time
+import zlib
+import random
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r'[^\w]+', re.UNICODE)
+
+# Parameters of the MinHash permutations h(x) = (a * x + b) mod p
+_MERSENNE_PRIME = (1 << 61) - 1
+
+# Words and prefixes that turn a question into its opposite
+NEGATIONS = frozenset(('nicht', 'kein', 'keine', 'keinen', 'keiner', 'nie', 'ohne', 'not', 'no', 'without'))
+NEGATING_PREFIXES = ('de', 'des', 'dis', 'ent', 'un', 'ab', 'aus')
+
+def normalize_text(text):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return ' '.join(_NON_WORD.sub(' ', text.lower()).split())
+
+def same_intent(words, other_words):
+    """
+    False if two similar messages differ in a way that changes the answer
+
+    Character shingles see "installiere" in "deinstalliere" and "fehler 691"
+    next to "fehler 809"; a near-duplicate may differ in spelling, but not in
+    numbers, negations or a negating prefix.
+    """
+    only_left, only_right = words - other_words, other_words - words
+    for word in only_left | only_right:
+        if word in NEGATIONS or any(char.isdigit() for char in word):
+            return False
+    for left in only_left:
+        for right in only_right:
+            longer, shorter = (left, right) if len(left) > len(right) else (right, left)
+            if longer.endswith(shorter) and longer[:-len(shorter)] in NEGATING_PREFIXES:
+                return False
+    return True
+
+class MinHasher:
+    """
+    MinHash signatures over character shingles with LSH banding
+
+    Two texts share at least one band key with high probability when their
+    shingle sets have a Jaccard similarity well above (1 / bands) ** (1 / rows).
+    """
+
+    def __init__(self, num_perm=64, bands=16, shingle_size=3, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = random.Random(seed)
+        self._perms = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def shingles(self, text):
+        size = self.shingle_size
+        if len(text) <= size:
+            return {text}
+        return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+    def signature(self, text):
+        hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in self.shingles(text)]
+        return tuple(
+            min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+            for a, b in self._perms
+        )
+
+    def band_keys(self, signature):
+        rows = self.rows
+        return [(band, signature[band * rows:(band + 1) * rows]) for band in range(self.bands)]
+
+    @staticmethod
+    def similarity(left, right):
+        """Estimated Jaccard similarity of two signatures"""
+        return sum(1 for a, b in zip(left, right) if a == b) / len(left)
+
+class ResponseCache:
+    """
+    LLM response cache keyed on the normalized message and its context window
+
+    Lookups try an exact hash of the normalized text first, then (optionally,
+    off by default) a MinHash near-duplicate match among entries with the
+    same context that differs in no number, negation or negating prefix.
+    The near-duplicate tier costs a signature per miss.
+    Entries are evicted least-recently-used beyond max_entries and expire
+    after ttl_seconds. The namespace (system prompt and deployment) is part
+    of every key; changing it drops all cached responses.
+    """
+
+    def __init__(self, max_entries=1000, ttl_seconds=3600, near_duplicates=False, similarity_threshold=0.85):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.minhasher = MinHasher() if near_duplicates else None
+        self.namespace = ''
+        self._entries = OrderedDict()
+        self._bands = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def set_namespace(self, *parts):
+        """Scope the cache to a system prompt / deployment, clearing it when they change"""
+        namespace = hashlib.sha256('\x00'.join(parts).encode('utf-8')).hexdigest()
+        with self._lock:
+            if namespace != self.namespace:
+                if self._entries:
+                    logger.info("Response cache invalidated (system prompt or deployment changed)")
+                self._entries.clear()
+                self._bands.clear()
+                self.namespace = namespace
+
+    def _keys(self, message, context):
+        message = normalize_text(message)
+        context_key = hashlib.sha256(
+            (self.namespace + '\x00' + '\x00'.join(normalize_text(part) for part in context)).encode('utf-8')
+        ).hexdigest()
+        exact_key = hashlib.sha256((context_key + '\x00' + message).encode('utf-8')).hexdigest()
+        return message, context_key, exact_key
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        for band_key in entry['band_keys']:
+            bucket = self._bands.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._bands[band_key]
+
+    def _live(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry['stored_at'] > self.ttl_seconds:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, message, context=()):
+        """Return the cached response for a message in the given context, or None"""
+        if not self.enabled:
+            return None
+        normalized, context_key, exact_key = self._keys(message, context)
+
+        with self._lock:
+            entry = self._live(exact_key)
+            if entry is not None:
+                self.hits += 1
+                return entry['response']
+
+            if self.minhasher is not None:
+                signature = self.minhasher.signature(normalized)
+                words = frozenset(normalized.split())
+                candidates = set()
+                for band, rows in self.minhasher.band_keys(signature):
+                    candidates.update(self._bands.get((context_key, band, rows), ()))
+
+                best_key, best_score = None, self.similarity_threshold
+                for key in candidates:
+                    candidate = self._entries[key]
+                    score = MinHasher.similarity(signature, candidate['signature'])
+                    if score >= best_score and same_intent(words, candidate['words']):
+                        best_key, best_score = key, score
+
+                if best_key is not None:
+                    entry = self._live(best_key)
+                    if entry is not None:
+                        self.hits += 1
+                        self.near_hits += 1
+                        return entry['response']
+
+            self.misses += 1
+            return None
+
+    def put(self, message, response, context=()):
+        """Cache the response for a message in the given context"""
+        if not self.enabled:
+            return
+        normalized, context_key, exact_key = self._keys(message, context)
+        signature = self.minhasher.signature(normalized) if self.minhasher else None
+        band_keys = []
+        if signature is not None:
+            band_keys = [(context_key, band, rows) for band, rows in self.minhasher.band_keys(signature)]
+
+        with self._lock:
+            if exact_key in self._entries:
+                self._remove(exact_key)
+            self._entries[exact_key] = {
+                'response': response,
+                'signature': signature,
+                'words': frozenset(normalized.split()),
+                'band_keys': band_keys,
+                'stored_at': time.time(),
+            }
+            for band_key in band_keys:
+                self._bands.setdefault(band_key, set()).add(exact_key)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bands.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'near_duplicate_hits': self.near_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+def create_response_cache():
+    """Create the response cache configured by the RESPONSE_CACHE_* environment variables"""
+    return ResponseCache(
+        max_entries=int(os.environ.get('RESPONSE_CACHE_SIZE', '1000')),
+        ttl_seconds=int(os.environ.get('RESPONSE_CACHE_TTL', '3600')),
+        near_duplicates=os.environ.get('RESPONSE_CACHE_NEAR_DUPLICATES', 'false').lower() in ('1', 'true', 'yes'),
+        similarity_threshold=float(os.environ.get('RESPONSE_CACHE_SIMILARITY', '0.85'))
+    )
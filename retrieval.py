@@ -0,0 +1,207 @@
+import os
+import re
+import zlib
+import threading
+import logging
+
+try:
+    import numpy as np
+except ImportError:
+    # numpy not installed, retrieval-augmented prompts are disabled
+    np = None
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+# Frequent German/English function words that carry no topic
+STOPWORDS = frozenset('''
+    der die das den dem des ein eine einen einem einer eines und oder aber nicht kein keine ist sind
+    war hat habe haben wird werden kann können mit mich mir mein meine meinen ich sie ihr ihre ihren
+    es er wir uns zu zum zur im in an am auf aus bei für von vor nach bis über unter wie was wo wenn
+    dass ob auch noch schon sehr immer nur so da dann hier sich falls the a an and or not is are to of
+    for on in it my i you with
+'''.split())
+
+class HashingEmbedder:
+    """
+    Deterministic local embedder using the hashing trick
+
+    Word unigrams and character trigrams of each word are hashed into a fixed
+    number of signed buckets and L2-normalized. Needs no model or network, so
+    it also works offline and in tests. Any callable mapping a list of texts
+    to a (n, dim) float32 array can be used instead.
+    """
+
+    def __init__(self, dim=512):
+        self.dim = dim
+
+    def features(self, text):
+        for word in _WORD.findall(text.lower()):
+            if word in STOPWORDS or word.isdigit():
+                continue
+            yield word
+            padded = f"<{word}>"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3]
+
+    def __call__(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self.features(text):
+                h = zlib.crc32(feature.encode('utf-8'))
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+class VectorIndex:
+    """Dense in-memory index with batched cosine top-k search"""
+
+    def __init__(self, documents, embedder):
+        self.documents = documents
+        self.embedder = embedder
+        self.matrix = embedder([document['text'] for document in documents]) if documents else None
+
+    def search(self, queries, k=3, min_score=0.0):
+        """
+        Return the top-k (document, score) pairs for each query text
+
+        All queries are scored against the whole index in one matrix product.
+        """
+        if self.matrix is None or not queries:
+            return [[] for _ in queries]
+        scores = self.embedder(queries) @ self.matrix.T
+        k = min(k, len(self.documents))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+        results = []
+        for row, candidates in enumerate(top):
+            ranked = candidates[np.argsort(-scores[row, candidates])]
+            results.append([
+                (self.documents[index], float(scores[row, index]))
+                for index in ranked if scores[row, index] >= min_score
+            ])
+        return results
+
+def knowledge_base_documents(knowledge_base):
+    """Turn knowledge base articles into retrievable documents"""
+    documents = []
+    for category, article in knowledge_base.articles.items():
+        documents.append({
+            'id': category,
+            'title': article['title'],
+            'text': "\n".join([article['title'], ' '.join(article['keywords'])] + article['steps']),
+            'content': "\n".join(article['steps']),
+        })
+    return documents
+
+def corpus_documents(corpus_dir):
+    """Load additional Markdown/text articles, one document per file"""
+    documents = []
+    if not corpus_dir or not os.path.isdir(corpus_dir):
+        return documents
+    for name in sorted(os.listdir(corpus_dir)):
+        if not name.endswith(('.md', '.txt')):
+            continue
+        with open(os.path.join(corpus_dir, name), encoding='utf-8') as f:
+            text = f.read().strip()
+        title = text.splitlines()[0].lstrip('# ').strip() if text else name
+        documents.append({'id': name, 'title': title, 'text': text, 'content': text})
+    return documents
+
+class Retriever:
+    """
+    Top-k article retrieval over the knowledge base and an optional corpus
+
+    The index is rebuilt only when the knowledge base snapshot changes.
+    """
+
+    def __init__(self, embedder=None, corpus_dir=None, k=2, min_score=0.15):
+        self.embedder = embedder or HashingEmbedder()
+        self.corpus_dir = corpus_dir
+        self.k = k
+        self.min_score = min_score
+        # (knowledge base fingerprint, index), replaced as a whole so readers need no lock
+        self._built = (None, None)
+        self._building = False
+        self._lock = threading.Lock()
+        self._building_lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # A build thread of the parent does not exist in a forked worker
+        self._building = False
+        self._lock = threading.Lock()
+        self._building_lock = threading.Lock()
+
+    @property
+    def fingerprint(self):
+        """Knowledge base fingerprint of the index that is currently served"""
+        return self._built[0]
+
+    def index_for(self, knowledge_base):
+        """The index for a knowledge base snapshot, building it first if needed (blocks)"""
+        with self._lock:
+            fingerprint, index = self._built
+            if index is None or fingerprint != knowledge_base.fingerprint:
+                documents = knowledge_base_documents(knowledge_base) + corpus_documents(self.corpus_dir)
+                index = VectorIndex(documents, self.embedder)
+                self._built = (knowledge_base.fingerprint, index)
+                logger.info(f"Built retrieval index with {len(documents)} documents")
+            return index
+
+    def ready_index(self, knowledge_base):
+        """
+        The newest built index, rebuilding it in the background if the snapshot changed
+
+        Never embeds articles or reads the corpus on the calling thread, so no
+        chat waits for a rebuild. After a reload the previous index answers
+        until the new one is swapped in; None before the first build.
+        """
+        fingerprint, index = self._built
+        if index is not None and fingerprint == knowledge_base.fingerprint:
+            return index
+        with self._building_lock:
+            if self._building:
+                return index
+            self._building = True
+        threading.Thread(target=self._build_in_background, args=(knowledge_base,), name="retrieval-index",
+                         daemon=True).start()
+        return index
+
+    def _build_in_background(self, knowledge_base):
+        try:
+            self.index_for(knowledge_base)
+        except Exception as e:
+            logger.error(f"Failed to build retrieval index: {e}")
+        finally:
+            with self._building_lock:
+                self._building = False
+
+    def retrieve(self, knowledge_base, query):
+        """Return the relevant documents for a single query, none while the first index is built"""
+        index = self.ready_index(knowledge_base)
+        if index is None:
+            return []
+        return index.search([query], k=self.k, min_score=self.min_score)[0]
+
+def format_context(results):
+    """Render retrieved documents for the prompt"""
+    sections = [f"### {document['title']}\n{document['content']}" for document, _ in results]
+    return "Relevante Artikel aus unserer Wissensdatenbank:\n\n" + "\n\n".join(sections)
+
+def create_retriever():
+    """Create the retriever configured by the RAG_* environment variables, or None if disabled"""
+    if os.environ.get('RAG_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+    if np is None:
+        logger.warning("numpy not installed. Knowledge base retrieval is disabled.")
+        return None
+    return Retriever(
+        embedder=HashingEmbedder(dim=int(os.environ.get('RAG_EMBEDDING_DIM', '512'))),
+        corpus_dir=os.environ.get('RAG_CORPUS_DIR'),
+        k=int(os.environ.get('RAG_TOP_K', '2')),
+        min_score=float(os.environ.get('RAG_MIN_SCORE', '0.15'))
+    )
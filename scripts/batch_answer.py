@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Batch Ticket Answering for IT Support Chatbot
+
+Drafts a first response for every ticket in a CSV or JSONL export with the
+same prompt, cache and fallback logic as the chat (AzureOpenAIService), and
+categorizes each ticket with the knowledge base matcher.
+
+The input is read as a stream and at most --concurrency tickets are in
+flight. Every result is appended to the output JSONL file as soon as it is
+ready; that file is also the checkpoint: running the same command again
+skips the tickets already in it, so an interrupted run simply resumes.
+
+Examples:
+    python scripts/batch_answer.py tickets.csv drafts.jsonl --text-field Beschreibung
+    python scripts/batch_answer.py tickets.jsonl drafts.jsonl --concurrency 16
+    python scripts/batch_answer.py tickets.csv categories.jsonl --categorize-only
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Token counts for the cost estimate come from the metrics counters
+os.environ.setdefault('METRICS_ENABLED', 'true')
+os.environ.setdefault('KB_RELOAD_INTERVAL', '0')
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(ROOT, '.env'))
+except ImportError:
+    # dotenv not installed, will use system environment variables
+    pass
+
+from knowledge_base import get_knowledge_base
+
+def read_tickets(path, input_format, id_field, text_field):
+    """Yield (ticket id, text) pairs one at a time; tickets without an id are numbered by position"""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if input_format == 'csv':
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for number, row in enumerate(rows, 1):
+            ticket_id = str(row.get(id_field) or number)
+            yield ticket_id, (row.get(text_field) or '').strip()
+
+def load_checkpoint(path):
+    """
+    Return the ids already in the output file
+
+    A line cut off by a crash is removed, so appending continues on a clean
+    line.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'rb+') as f:
+        data = f.read()
+        complete = data[:data.rfind(b'\n') + 1]
+        if len(complete) < len(data):
+            f.truncate(len(complete))
+    for line in complete.decode('utf-8').splitlines():
+        try:
+            done.add(json.loads(line)['id'])
+        except (ValueError, KeyError):
+            continue
+    return done
+
+def categorize(text):
+    article = get_knowledge_base().find_article(text)
+    return article['category'], article['title']
+
+def answer_ticket(service, ticket_id, text, categorize_only):
+    started = time.perf_counter()
+    category, title = categorize(text)
+    result = {'id': ticket_id, 'category': category, 'title': title}
+    if not categorize_only:
+        result['answer'] = service.get_it_support_response(text) if text else None
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    return result
+
+def token_counts():
+    from azure_openai_service import LLM_TOKENS
+    return LLM_TOKENS.value(direction='prompt'), LLM_TOKENS.value(direction='completion')
+
+def response_counts():
+    from azure_openai_service import RESPONSES
+    return {source: RESPONSES.value(source=source) for source in ('llm', 'cache', 'intent', 'fallback')}
+
+def run(args):
+    input_format = args.format or ('csv' if args.input.lower().endswith('.csv') else 'jsonl')
+    done = load_checkpoint(args.output)
+    if done:
+        print(f"↩️  {len(done)} Tickets aus {args.output} bereits bearbeitet, werden übersprungen")
+
+    service = None
+    if not args.categorize_only:
+        from azure_openai_service import get_azure_openai_service
+        service = get_azure_openai_service()
+        if not service.configured:
+            print("⚠️  Azure OpenAI ist nicht konfiguriert, alle Antworten kommen aus dem Fallback")
+
+    processed = failed = skipped = 0
+    started = time.perf_counter()
+    with open(args.output, 'a', encoding='utf-8') as out, ThreadPoolExecutor(args.concurrency) as pool:
+        pending = set()
+
+        def collect(futures):
+            nonlocal processed, failed
+            for future in futures:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # Not written, so the ticket is retried on the next run
+                    failed += 1
+                    logging.error(f"Ticket {future.ticket_id} failed: {e}")
+                    continue
+                out.write(json.dumps(result, ensure_ascii=False) + '\n')
+                out.flush()
+                processed += 1
+                if processed % args.progress == 0:
+                    elapsed = time.perf_counter() - started
+                    print(f"  {processed} Tickets, {processed / elapsed:.1f}/s")
+
+        for ticket_id, text in read_tickets(args.input, input_format, args.id_field, args.text_field):
+            if ticket_id in done:
+                skipped += 1
+                continue
+            if args.limit and processed + failed + len(pending) >= args.limit:
+                break
+            # Keep the input streaming: wait for a slot before reading the next ticket
+            if len(pending) >= args.concurrency * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+            future = pool.submit(answer_ticket, service, ticket_id, text, args.categorize_only)
+            future.ticket_id = ticket_id
+            pending.add(future)
+        collect(wait(pending).done)
+
+    return processed, failed, skipped, time.perf_counter() - started
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Draft first responses for a ticket export")
+    parser.add_argument('input', help="CSV or JSONL file with one ticket per row")
+    parser.add_argument('output', help="JSONL file the drafts are appended to (also the checkpoint)")
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help="input format (default: by file extension)")
+    parser.add_argument('--id-field', default='id')
+    parser.add_argument('--text-field', default='description')
+    parser.add_argument('--concurrency', type=int, default=8, help="tickets answered at the same time")
+    parser.add_argument('--categorize-only', action='store_true', help="only categorize with the knowledge base, no LLM")
+    parser.add_argument('--limit', type=int, default=0, help="stop after this many new tickets (0 = all)")
+    parser.add_argument('--progress', type=int, default=100, help="print progress every N tickets")
+    parser.add_argument('--prompt-price', type=float, default=float(os.environ.get('LLM_PROMPT_PRICE', '0.40')),
+                        help="USD per 1M prompt tokens")
+    parser.add_argument('--completion-price', type=float, default=float(os.environ.get('LLM_COMPLETION_PRICE', '1.60')),
+                        help="USD per 1M completion tokens")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    print(f"🛠️ IT-Support Chatbot - Ticket-Batch {args.input} -> {args.output}")
+    processed, failed, skipped, elapsed = run(args)
+
+    print(f"\n✅ {processed} Tickets in {elapsed:.1f}s ({processed / elapsed if elapsed else 0:.1f} Tickets/s)")
+    if skipped:
+        print(f"Übersprungen (bereits bearbeitet): {skipped}")
+    if failed:
+        print(f"❌ Fehlgeschlagen: {failed} (werden beim nächsten Lauf wiederholt)")
+    if not args.categorize_only:
+        sources = response_counts()
+        prompt_tokens, completion_tokens = token_counts()
+        cost = (prompt_tokens * args.prompt_price + completion_tokens * args.completion_price) / 1e6
+        print(f"Antworten: {sources['llm']} LLM, {sources['cache']} Cache, {sources['intent']} Intent, "
+              f"{sources['fallback']} Fallback")
+        print(f"Tokens: {prompt_tokens} Prompt + {completion_tokens} Completion, geschätzte Kosten ${cost:.4f}")
+    sys.exit(1 if failed else 0)
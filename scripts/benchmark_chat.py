@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Load Benchmark for IT Support Chatbot
+
+Drives complete chat flows (/start_session -> N x /send_message -> /end_session)
+at a configurable concurrency and reports latency percentiles, throughput and
+memory per session.
+
+By default the Flask app runs in-process against a local mock Azure OpenAI
+server and a local SMTP sink, so results are reproducible and need no
+credentials. Use --url to benchmark an already running deployment instead.
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import atexit
+import shutil
+import tempfile
+import random
+import logging
+import argparse
+import threading
+import tracemalloc
+import http.client
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(SCRIPTS_DIR))
+sys.path.insert(0, SCRIPTS_DIR)
+
+from mock_azure_openai import MockSettings, start_mock_server
+from smtp_sink import start_smtp_sink
+from circuit_breaker import CLOSED
+
+QUESTIONS = [
+    "Ich kann mich nicht mit dem VPN verbinden",
+    "Mein Passwort funktioniert nicht",
+    "Der Drucker hat einen Papierstau",
+    "Mein Computer läuft sehr langsam",
+    "Outlook synchronisiert meine E-Mails nicht",
+    "Die Software stürzt immer ab",
+    "Ich habe mein Passwort vergessen und mein Konto ist gesperrt",
+    "Der Laptop fährt nicht mehr hoch",
+]
+
+class ChatClient:
+    """One browser: a keep-alive connection plus the session cookie"""
+
+    def __init__(self, host, port):
+        self.conn = http.client.HTTPConnection(host, port, timeout=120)
+        self.cookie = None
+
+    def request(self, path, payload=None, method='POST'):
+        """Return (status, body, seconds until the first byte, total seconds)"""
+        headers = {'Content-Type': 'application/json'}
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+
+        started = time.perf_counter()
+        self.conn.request(method, path, body=body, headers=headers)
+        response = self.conn.getresponse()
+        first = response.read(1)
+        first_byte = time.perf_counter() - started
+        data = first + response.read()
+        total = time.perf_counter() - started
+
+        set_cookie = response.getheader('Set-Cookie')
+        if set_cookie:
+            self.cookie = set_cookie.split(';', 1)[0]
+        return response.status, data, first_byte, total
+
+    def close(self):
+        self.conn.close()
+
+class Recorder:
+    """Thread-safe latency samples per endpoint"""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self.lock:
+            self.samples.setdefault(name, []).append(seconds)
+
+    def error(self):
+        with self.lock:
+            self.errors += 1
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def run_flow(host, port, messages, stream, recorder, end=True):
+    client = ChatClient(host, port)
+    try:
+        status, _, _, total = client.request('/start_session', {'name': 'Benchmark', 'email': 'bench@example.com'})
+        recorder.add('/start_session', total)
+        if status != 200:
+            recorder.error()
+            return
+
+        endpoint = '/send_message_stream' if stream else '/send_message'
+        for _ in range(messages):
+            status, _, first_byte, total = client.request(endpoint, {'message': random.choice(QUESTIONS)})
+            recorder.add(endpoint, total)
+            if stream:
+                recorder.add(f'{endpoint} (TTFB)', first_byte)
+            if status != 200:
+                recorder.error()
+
+        if end:
+            status, _, _, total = client.request('/end_session', {})
+            recorder.add('/end_session', total)
+            if status != 200:
+                recorder.error()
+    except (OSError, http.client.HTTPException):
+        recorder.error()
+    finally:
+        client.close()
+
+def run_load(host, port, sessions, concurrency, messages, stream):
+    recorder = Recorder()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(sessions):
+            pool.submit(run_flow, host, port, messages, stream, recorder)
+    return recorder, time.perf_counter() - started
+
+def measure_memory_per_session(host, port, sessions, messages):
+    """Traced heap growth per live (not yet ended) session, in bytes"""
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    recorder = Recorder()
+    for _ in range(sessions):
+        run_flow(host, port, messages, False, recorder, end=False)
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (after - before) / sessions
+
+def start_local_app(args):
+    """Run the Flask app in-process against the mock LLM and SMTP sink"""
+    mock, mock_url = start_mock_server(settings=MockSettings(
+        latency=args.llm_latency, token_delay=args.token_delay, tokens=args.tokens, error_rate=args.error_rate
+    ))
+    sink, sink_port = start_smtp_sink()
+    # Synthetic sessions must not end up in the real archive (the intent router trains on it)
+    data_dir = tempfile.mkdtemp(prefix='chatbot-benchmark-')
+    atexit.register(shutil.rmtree, data_dir, True)
+
+    os.environ.update({
+        'ARCHIVE_DB_PATH': os.path.join(data_dir, 'archive.db'),
+        'RATE_LIMIT_DB_PATH': os.path.join(data_dir, 'ratelimit.db'),
+        'SESSION_DB_PATH': os.path.join(data_dir, 'sessions.db'),
+        'EMAIL_SPOOL_DIR': os.path.join(data_dir, 'mail_spool'),
+        'ENDPOINT_URL': mock_url,
+        'AZURE_OPENAI_API_KEY': 'benchmark-key',
+        'SMTP_SERVER': '127.0.0.1',
+        'SMTP_PORT': str(sink_port),
+        'SMTP_USE_TLS': 'false',
+        'SENDER_EMAIL': 'bench@localhost',
+        'SENDER_PASSWORD': '',
+        'KB_RELOAD_INTERVAL': '0',
+        'RESPONSE_CACHE_SIZE': os.environ.get('RESPONSE_CACHE_SIZE', '1000' if args.cache else '0'),
+        'INTENT_ROUTER_ENABLED': os.environ.get('INTENT_ROUTER_ENABLED', 'true' if args.intents else 'false'),
+        # Every simulated user shares one email; the per-user limit would turn the run into fallback answers
+        'RATE_LIMIT_ENABLED': os.environ.get('RATE_LIMIT_ENABLED', 'false'),
+        # One summary email per session, so the SMTP sink count matches the sessions
+        'SUMMARY_DIGEST_THRESHOLD': os.environ.get('SUMMARY_DIGEST_THRESHOLD', '0'),
+    })
+
+    from werkzeug.serving import make_server
+    import app as chatbot
+
+    # Build what the first requests would otherwise load lazily, as serve.py does
+    chatbot.preload()
+    server = make_server('127.0.0.1', 0, chatbot.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="benchmark-app", daemon=True).start()
+    warm_up(server.server_port, args, mock, sink)
+    return server, mock, sink, chatbot.azure_ai_service.circuit_breaker
+
+def warm_up(port, args, mock, sink):
+    """One untimed chat flow (LLM client, summary, SMTP), then reset the mock and sink counters"""
+    run_flow('127.0.0.1', port, 1, args.stream, Recorder())
+    deadline = time.time() + 30
+    while sink.messages < 1 and time.time() < deadline:
+        time.sleep(0.05)
+    mock.settings.requests = 0
+    sink.messages = sink.connections = 0
+
+def print_report(recorder, wall, args, memory_per_session=None, mock=None, sink=None, breaker=None):
+    requests = sum(len(values) for name, values in recorder.samples.items() if '(TTFB)' not in name)
+    print(f"\n📊 {args.sessions} Sitzungen × {args.messages} Nachrichten, Parallelität {args.concurrency}")
+    print(f"{'Endpoint':<32}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, values in sorted(recorder.samples.items()):
+        print(f"{name:<32}{len(values):>7}"
+              f"{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}"
+              f"{percentile(values, 99) * 1000:>10.1f}{max(values) * 1000:>10.1f}")
+    print(f"\nDurchsatz: {requests / wall:.1f} Anfragen/s, {args.sessions / wall:.2f} Sitzungen/s in {wall:.2f}s")
+    print(f"Fehler: {recorder.errors}")
+    if memory_per_session is not None:
+        print(f"Speicher pro aktiver Sitzung: {memory_per_session / 1024:.1f} KiB")
+    if mock is not None:
+        print(f"LLM-Aufrufe am Mock-Server: {mock.settings.requests}")
+    if sink is not None:
+        print(f"E-Mails am SMTP-Sink: {sink.messages} über {sink.connections} Verbindungen")
+    if breaker is not None:
+        snapshot = breaker.snapshot()
+        changes = ' -> '.join([CLOSED] + [t['to'] for t in snapshot['transitions']])
+        print(f"Circuit Breaker: {snapshot['state']}, {snapshot['rejected']} Anfragen direkt beantwortet ({changes})")
+
+def write_json(path, recorder, wall, args, memory_per_session):
+    result = {
+        'sessions': args.sessions,
+        'concurrency': args.concurrency,
+        'messages': args.messages,
+        'stream': args.stream,
+        'seconds': wall,
+        'errors': recorder.errors,
+        'memory_per_session_bytes': memory_per_session,
+        'endpoints': {
+            name: {
+                'count': len(values),
+                'p50': percentile(values, 50),
+                'p95': percentile(values, 95),
+                'p99': percentile(values, 99),
+            }
+            for name, values in recorder.samples.items()
+        },
+    }
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load benchmark for the chat endpoints")
+    parser.add_argument('--url', help="benchmark a running server instead of an in-process app")
+    parser.add_argument('--sessions', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--messages', type=int, default=3, help="messages per session")
+    parser.add_argument('--stream', action='store_true', help="use /send_message_stream")
+    parser.add_argument('--cache', action='store_true', help="keep the response cache enabled")
+    parser.add_argument('--intents', action='store_true', help="answer well-covered questions with the intent router")
+    parser.add_argument('--llm-latency', type=float, default=0.3)
+    parser.add_argument('--token-delay', type=float, default=0.005)
+    parser.add_argument('--tokens', type=int, default=60)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--memory-sessions', type=int, default=100, help="sessions held open for the memory measurement (0 to skip)")
+    parser.add_argument('--json', help="also write the results to this file")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    logging.disable(logging.INFO)
+
+    mock = sink = breaker = None
+    if args.url:
+        parsed = urlparse(args.url)
+        host, port = parsed.hostname, parsed.port or 80
+    else:
+        server, mock, sink, breaker = start_local_app(args)
+        host, port = '127.0.0.1', server.server_port
+
+    print(f"🛠️ IT-Support Chatbot - Lasttest gegen {host}:{port}")
+    recorder, wall = run_load(host, port, args.sessions, args.concurrency, args.messages, args.stream)
+
+    memory_per_session = None
+    if not args.url and args.memory_sessions:
+        memory_per_session = measure_memory_per_session(host, port, args.memory_sessions, args.messages)
+
+    # Give the background summary and email workers a moment to drain (summaries call the LLM too)
+    if sink is not None:
+        deadline = time.time() + 30
+        while sink.messages < args.sessions and time.time() < deadline:
+            time.sleep(0.1)
+
+    print_report(recorder, wall, args, memory_per_session, mock, sink, breaker)
+    if args.json:
+        write_json(args.json, recorder, wall, args, memory_per_session)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Offline Evaluation of the Intent Router for IT Support Chatbot
+
+Trains the router like the app does and scores it on labeled messages: a
+built-in set of typical questions (expected intent, or none where the
+LLM should answer) and, with --archive, the newest archived main issues,
+which are then held out from training. For each confidence threshold it
+reports how many messages would skip the LLM and how many of those got
+the wrong answer, plus the routing latency.
+
+Examples:
+    python scripts/evaluate_intents.py
+    python scripts/evaluate_intents.py --archive archive.db --holdout 0.2 --json intents.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault('KB_RELOAD_INTERVAL', '0')
+
+# (message, intent it should be routed to, or None if it needs the LLM)
+EVAL_SET = [
+    ("Hallo", 'greeting'),
+    ("Guten Morgen!", 'greeting'),
+    ("Hi, ist jemand da?", 'greeting'),
+    ("Danke!", 'thanks'),
+    ("Vielen Dank, hat funktioniert", 'thanks'),
+    ("Super, danke für die schnelle Hilfe", 'thanks'),
+    ("Danke, aber das hat nicht geklappt", None),
+    ("Hallo, leider geht es immer noch nicht", None),
+    ("Danke, der Drucker druckt aber immer noch nicht", None),
+    ("Passwort vergessen", 'password'),
+    ("Mein Passwort ist abgelaufen", 'password'),
+    ("Ich muss mein Kennwort zurücksetzen", 'password'),
+    ("Konto gesperrt", 'password'),
+    ("Drucker druckt nicht", 'printer'),
+    ("Papierstau im Drucker", 'printer'),
+    ("Druckauftrag hängt in der Warteschlange", 'printer'),
+    ("VPN verbindet nicht", 'vpn'),
+    ("Keine Verbindung zum VPN von zu Hause", 'vpn'),
+    ("Fernzugriff funktioniert nicht", 'vpn'),
+    ("Outlook synchronisiert keine Mails", 'email'),
+    ("Ich bekomme keine E-Mails mehr", 'email'),
+    ("Posteingang lädt nicht", 'email'),
+    ("Computer ist sehr langsam", 'computer'),
+    ("Laptop friert ständig ein", 'computer'),
+    ("PC startet nicht mehr", 'computer'),
+    ("Software installieren", 'software'),
+    ("Programm stürzt ständig ab", 'software'),
+    ("Ich brauche eine Lizenz für ein Programm", 'software'),
+    ("Wie beantrage ich Urlaub?", None),
+    ("Kann ich ein zweites Headset bestellen?", None),
+    ("Der Bildschirm flackert seit heute morgen", None),
+    ("Teams Kamera wird nicht erkannt", None),
+    ("Wie ist das Wetter morgen?", None),
+    ("Wo finde ich die Reisekostenabrechnung?", None),
+    ("Mein Drucker zeigt Fehler 0x8007 nach dem Windows-Update und der Treiber lässt sich nicht "
+     "neu installieren, was kann ich tun?", None),
+    ("Das VPN verbindet, aber danach kann ich keine Netzlaufwerke öffnen", None),
+    ("Guten Morgen, seit dem Umzug ins neue Büro funktioniert die Docking-Station nicht", None),
+    ("Ist die IT heute erreichbar?", None),
+]
+
+THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95)
+
+def evaluate(router, knowledge_base, examples):
+    """Return (routed intent or None, expected intent) per message, for the router's threshold"""
+    outcomes = []
+    for message, expected in examples:
+        route = router.route(knowledge_base, message)
+        outcomes.append((route.intent if route else None, expected))
+    return outcomes
+
+def summarize(outcomes):
+    routed = [(intent, expected) for intent, expected in outcomes if intent is not None]
+    wrong = sum(1 for intent, expected in routed if intent != expected)
+    answerable = sum(1 for _, expected in outcomes if expected is not None)
+    return {
+        'messages': len(outcomes),
+        'routed': len(routed),
+        'correct': len(routed) - wrong,
+        'wrong': wrong,
+        'coverage': len(routed) / len(outcomes) if outcomes else 0.0,
+        'precision': (len(routed) - wrong) / len(routed) if routed else 1.0,
+        'recall': (len(routed) - wrong) / answerable if answerable else 0.0,
+    }
+
+def latency(router, knowledge_base, messages, repeat=200):
+    """Median microseconds for routing one message, and per message when scoring a batch"""
+    model = router.model_for(knowledge_base)
+    single = []
+    for message in messages:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            router.route(knowledge_base, message)
+        single.append((time.perf_counter() - started) / repeat * 1e6)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        model.predict(messages)
+    batch = (time.perf_counter() - started) / repeat / len(messages) * 1e6
+    return statistics.median(single), batch
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the intent router offline")
+    parser.add_argument('--archive', help="archive database to train on and to hold out test messages from")
+    parser.add_argument('--holdout', type=float, default=0.2, help="share of the newest archived issues used for testing")
+    parser.add_argument('--limit', type=int, default=5000, help="archived issues to read")
+    parser.add_argument('--min-coverage', type=float, default=0.5, help="share of words the training data must know")
+    parser.add_argument('--max-words', type=int, default=12)
+    parser.add_argument('--dim', type=int, default=1024, help="hashed feature dimensions")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)
+    from knowledge_base import get_knowledge_base
+    from intent_router import IntentRouter, training_examples
+    from conversation_archive import read_labeled_issues
+
+    kb = get_knowledge_base()
+    archived = read_labeled_issues(args.archive, args.limit) if args.archive else []
+    split = len(archived) - int(len(archived) * args.holdout)
+    train, held_out = archived[:split], [(text, category) for text, category in archived[split:]
+                                         if category in kb.articles]
+
+    router = IntentRouter(min_coverage=args.min_coverage, max_words=args.max_words, dim=args.dim)
+    examples = training_examples(kb, train)
+    started = time.perf_counter()
+    router.train(kb, train)
+    train_seconds = time.perf_counter() - started
+
+    print(f"🛠️ IT-Support Chatbot - Intent-Router ({len(examples)} Trainingsbeispiele, {train_seconds:.2f}s)\n")
+    results = {'train_examples': len(examples), 'train_seconds': train_seconds, 'sets': {}}
+    for name, examples in (('Testsatz', EVAL_SET), ('Archiv', held_out)):
+        if not examples:
+            continue
+        print(f"{name} ({len(examples)} Nachrichten)")
+        print(f"  {'Schwelle':>8}{'ohne LLM':>10}{'richtig':>9}{'falsch':>8}{'Präzision':>11}{'Recall':>8}")
+        rows = {}
+        for threshold in THRESHOLDS:
+            router.threshold = threshold
+            row = summarize(evaluate(router, kb, examples))
+            rows[threshold] = row
+            print(f"  {threshold:>8.2f}{row['coverage']:>9.0%} {row['correct']:>8}{row['wrong']:>8}"
+                  f"{row['precision']:>10.0%} {row['recall']:>7.0%}")
+        results['sets'][name] = rows
+        print()
+
+    single, batch = latency(router, kb, [message for message, _ in EVAL_SET])
+    results['latency_us'] = {'single': single, 'batch_per_message': batch}
+    print(f"Latenz: {single:.0f} µs pro Nachricht, {batch:.0f} µs pro Nachricht im Batch")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Hot Path Microbenchmarks for IT Support Chatbot
+
+Times the CPU-bound pieces of a chat request in isolation: knowledge base
+matching, the keyword fallback, intent routing, context building, the
+response cache, session summaries and summary email rendering.
+"""
+
+import os
+import sys
+import json
+import timeit
+import logging
+import argparse
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault('KB_RELOAD_INTERVAL', '0')
+os.environ.setdefault('AZURE_OPENAI_API_KEY', '')
+
+MESSAGES = [
+    "Ich kann mich nicht mit dem VPN verbinden",
+    "Mein Passwort funktioniert nicht mehr seit dem letzten Update",
+    "Der Drucker im zweiten Stock hat einen Papierstau",
+    "Mein Computer läuft sehr langsam und friert ständig ein",
+    "Outlook synchronisiert meine E-Mails nicht",
+    "Wie beantrage ich einen neuen Monitor?",
+]
+
+def make_history(turns):
+    from chat_history import ChatHistory, ChatMessage, Sender
+
+    history = ChatHistory()
+    for i in range(turns):
+        history.append(ChatMessage(Sender.USER, MESSAGES[i % len(MESSAGES)]))
+        history.append(ChatMessage(Sender.BOT, "1. Schritt mit ausführlicher Erklärung\n" * 30))
+    return history
+
+def history_memory(entries):
+    """Traced bytes of a history of short messages: (list of dicts as before, ChatHistory)"""
+    from chat_history import ChatHistory, ChatMessage, Sender
+
+    def dicts():
+        return [{'timestamp': datetime.now().strftime('%H:%M:%S'), 'sender': 'User' if i % 2 == 0 else 'Bot',
+                 'message': f"Nachricht {i}"} for i in range(entries)]
+
+    def slotted():
+        return ChatHistory(ChatMessage(Sender.USER if i % 2 == 0 else Sender.BOT, f"Nachricht {i}") for i in range(entries))
+
+    sizes = []
+    for build in (dicts, slotted):
+        tracemalloc.start()
+        history = build()
+        sizes.append(tracemalloc.get_traced_memory()[0])
+        tracemalloc.stop()
+        del history
+    return sizes
+
+def bench(name, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"{name:<45}{seconds * 1e6:>12.1f} µs")
+    return name, seconds
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the chat hot path")
+    parser.add_argument('--number', type=int, default=2000, help="iterations per measurement")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    import app
+    from context_builder import ContextBuilder
+    from response_cache import ResponseCache
+    from email_summary import get_summary_renderer
+    from session_summary import extractive_summary
+
+    service = app.azure_ai_service
+    builder = ContextBuilder()
+    cache = ResponseCache()
+    for message in MESSAGES:
+        cache.put(message, "Antwort")
+    kb = app.knowledge_base.current()
+    service.intent_router.model_for(kb)
+    short_history = make_history(3)
+    long_history = make_history(100)
+    renderer = get_summary_renderer()
+    summary = extractive_summary(long_history, MESSAGES[0])
+    n = args.number
+
+    print("🛠️ IT-Support Chatbot - Microbenchmarks\n")
+    results = [
+        bench("find_relevant_solution", lambda: [app.find_relevant_solution(m) for m in MESSAGES], n // 10),
+        bench("_get_fallback_response", lambda: [service._get_fallback_response(m) for m in MESSAGES], n // 10),
+        bench("IntentRouter.route", lambda: [service.intent_router.route(kb, m) for m in MESSAGES], n // 10),
+        bench("ContextBuilder.build (6 entries)", lambda: builder.build(short_history), n),
+        bench("ContextBuilder.build (200 entries)", lambda: builder.build(long_history), n),
+        bench("ResponseCache.get (hit)", lambda: cache.get(MESSAGES[0]), n),
+        bench("ResponseCache.get (miss)", lambda: cache.get("Teams Kamera wird nicht erkannt"), n // 10),
+        bench("extractive_summary (6 entries)", lambda: extractive_summary(short_history, MESSAGES[0]), n // 10),
+        bench("extractive_summary (200 entries)", lambda: extractive_summary(long_history, MESSAGES[0]), n // 100),
+        bench("SummaryRenderer.build_message",
+              lambda: renderer.build_message('bot@example.com', 'it@example.com', 'Max', 'max@example.com', summary,
+                                             MESSAGES[0]).as_string(),
+              n // 10),
+    ]
+
+    entries = 200
+    before, after = history_memory(entries)
+    print(f"\nChat-Verlauf ({entries} kurze Nachrichten): {before / entries:.0f} B/Eintrag als dict, "
+          f"{after / entries:.0f} B/Eintrag als ChatMessage ({(1 - after / before) * 100:.0f}% weniger)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                **{name: seconds for name, seconds in results},
+                'history_bytes_per_entry_dict': before / entries,
+                'history_bytes_per_entry_slotted': after / entries,
+            }, f, indent=2)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Mock Azure OpenAI Server for IT Support Chatbot
+
+Serves the chat completions endpoint with configurable latency, streaming and
+error injection, so the bot can be benchmarked and tested without a real
+Azure OpenAI deployment.
+
+Point the bot at it with:
+    ENDPOINT_URL=http://127.0.0.1:8081/
+    AZURE_OPENAI_API_KEY=mock-key
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_ANSWER = (
+    "1. Starten Sie das Gerät neu\n"
+    "2. Überprüfen Sie alle Kabelverbindungen\n"
+    "3. Installieren Sie verfügbare Updates\n"
+    "Falls das Problem weiterhin besteht, kontaktieren Sie die IT unter Durchwahl 1234."
+)
+
+class MockSettings:
+    """Behaviour of the mock server, adjustable while it runs"""
+
+    def __init__(self, latency=0.5, token_delay=0.01, tokens=60, error_rate=0.0, answer=DEFAULT_ANSWER):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.answer = answer
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def answer_tokens(self):
+        words = self.answer.split(' ')
+        tokens = [word + ' ' for word in words]
+        while len(tokens) < self.tokens:
+            tokens += tokens
+        return tokens[:self.tokens]
+
+class MockAzureOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        settings = self.server.settings
+        with settings.lock:
+            settings.requests += 1
+
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+
+        if not self.path.split('?')[0].endswith('/chat/completions'):
+            self._send_json(404, {'error': {'code': 'NotFound', 'message': self.path}})
+            return
+
+        time.sleep(settings.latency)
+        if settings.error_rate and random.random() < settings.error_rate:
+            self._send_json(503, {'error': {'code': 'ServiceUnavailable', 'message': 'Injected failure'}})
+            return
+
+        tokens = settings.answer_tokens()
+        prompt_tokens = sum(
+            len(part.get('text', '')) // 4
+            for message in payload.get('messages', [])
+            for part in (message['content'] if isinstance(message['content'], list) else [{'text': message['content']}])
+        )
+        usage = {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': len(tokens),
+            'total_tokens': prompt_tokens + len(tokens),
+        }
+        model = payload.get('model', 'mock')
+
+        if payload.get('stream'):
+            include_usage = (payload.get('stream_options') or {}).get('include_usage')
+            self._send_stream(model, tokens, settings.token_delay, usage if include_usage else None)
+        else:
+            time.sleep(settings.token_delay * len(tokens))
+            self._send_json(200, {
+                'id': 'chatcmpl-mock',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{
+                    'index': 0,
+                    'finish_reason': 'stop',
+                    'message': {'role': 'assistant', 'content': ''.join(tokens).strip()},
+                }],
+                'usage': usage,
+            })
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, model, tokens, token_delay, usage=None):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def write_event(data):
+            frame = f"data: {data}\n\n".encode('utf-8')
+            self.wfile.write(f"{len(frame):x}\r\n".encode('ascii') + frame + b"\r\n")
+            self.wfile.flush()
+
+        for token in tokens:
+            time.sleep(token_delay)
+            write_event(json.dumps({
+                'id': 'chatcmpl-mock',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}],
+            }))
+        if usage:
+            write_event(json.dumps({
+                'id': 'chatcmpl-mock',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [],
+                'usage': usage,
+            }))
+        write_event('[DONE]')
+        self.wfile.write(b"0\r\n\r\n")
+
+def start_mock_server(host='127.0.0.1', port=0, settings=None):
+    """Start the mock server on a background thread, return (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), MockAzureOpenAIHandler)
+    server.daemon_threads = True
+    server.settings = settings or MockSettings()
+    threading.Thread(target=server.serve_forever, name="mock-azure-openai", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Azure OpenAI chat completions server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument('--token-delay', type=float, default=0.01, help="seconds between tokens")
+    parser.add_argument('--tokens', type=int, default=60, help="completion tokens per answer")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    settings = MockSettings(args.latency, args.token_delay, args.tokens, args.error_rate)
+    server, url = start_mock_server(args.host, args.port, settings)
+    print(f"🤖 Mock Azure OpenAI läuft auf {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
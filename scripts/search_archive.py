@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Conversation Archive Search for IT Support Chatbot
+
+Searches the archive of ended chat sessions by user email, date range,
+knowledge base category or free text, one page at a time.
+
+Examples:
+    python scripts/search_archive.py --text "vpn fehler"
+    python scripts/search_archive.py --email max@example.com --since 2025-01-01
+    python scripts/search_archive.py --category drucker --cursor 1234
+    python scripts/search_archive.py --show 42
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conversation_archive import ConversationArchive
+
+def parse_date(value):
+    return time.mktime(datetime.strptime(value, '%Y-%m-%d').timetuple())
+
+def print_page(page):
+    for row in page['results']:
+        ended = datetime.fromtimestamp(row['ended_at']).strftime('%Y-%m-%d %H:%M')
+        print(f"#{row['id']:<7} {ended}  {row['user_email'] or '-':<30} [{row['category'] or '-'}] "
+              f"{row['message_count']:>3} Nachrichten  {(row['main_issue'] or '')[:60]}")
+    if not page['results']:
+        print("Keine Gespräche gefunden.")
+    if page['next_cursor']:
+        print(f"\nWeitere Ergebnisse: --cursor {page['next_cursor']}")
+
+def print_conversation(conversation):
+    ended = datetime.fromtimestamp(conversation['ended_at']).strftime('%Y-%m-%d %H:%M:%S')
+    print(f"Gespräch #{conversation['id']} - {conversation['user_name']} <{conversation['user_email']}>, {ended}")
+    print(f"Hauptproblem: {conversation['main_issue']} [{conversation['category']}]\n")
+    for entry in conversation['chat_history']:
+        print(f"{entry['timestamp']} - {entry['sender']}: {entry['message']}\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search archived chat sessions")
+    parser.add_argument('--db', default=os.environ.get('ARCHIVE_DB_PATH', 'archive.db'))
+    parser.add_argument('--email', help="user email address")
+    parser.add_argument('--since', help="first day, YYYY-MM-DD")
+    parser.add_argument('--until', help="last day (inclusive), YYYY-MM-DD")
+    parser.add_argument('--category', help="knowledge base category, e.g. vpn")
+    parser.add_argument('--text', help="words that must all appear (use word* for prefixes)")
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--cursor', help="next_cursor of the previous page")
+    parser.add_argument('--show', type=int, help="print the transcript of one conversation")
+    parser.add_argument('--json', action='store_true', help="print raw JSON")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        sys.exit(f"❌ Archiv {args.db} nicht gefunden")
+    archive = ConversationArchive(args.db)
+
+    if args.show is not None:
+        conversation = archive.get(args.show)
+        if conversation is None:
+            sys.exit(f"❌ Gespräch #{args.show} nicht gefunden")
+        if args.json:
+            print(json.dumps(conversation, ensure_ascii=False, indent=2))
+        else:
+            print_conversation(conversation)
+        sys.exit(0)
+
+    started = time.perf_counter()
+    page = archive.search(
+        user_email=args.email,
+        since=parse_date(args.since) if args.since else None,
+        until=parse_date(args.until) + 86400 if args.until else None,
+        category=args.category,
+        text=args.text,
+        limit=args.limit,
+        cursor=args.cursor
+    )
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps(page, ensure_ascii=False, indent=2))
+    else:
+        print_page(page)
+        print(f"({elapsed * 1000:.1f} ms)")
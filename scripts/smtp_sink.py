@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Local SMTP Sink for IT Support Chatbot
+
+Accepts and counts every message without delivering it, so summary emails can
+be tested and benchmarked without real credentials. Speaks just enough SMTP
+for smtplib (no TLS, no AUTH); use it with SMTP_USE_TLS=false and an empty
+SENDER_PASSWORD.
+"""
+
+import time
+import argparse
+import threading
+import socketserver
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode('ascii'))
+
+    def handle(self):
+        sink = self.server
+        with sink.lock:
+            sink.connections += 1
+        self.reply("220 smtp-sink ready")
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip().upper()
+
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply("250 smtp-sink")
+            elif command.startswith(('MAIL', 'RCPT', 'RSET', 'NOOP')):
+                self.reply("250 OK")
+            elif command == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b".\r\n", b".\n"):
+                        break
+                    size += len(data)
+                with sink.lock:
+                    sink.messages += 1
+                    sink.bytes += size
+                self.reply("250 OK queued")
+            elif command == 'QUIT':
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, SMTPSinkHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+        self.bytes = 0
+
+def start_smtp_sink(host='127.0.0.1', port=0):
+    """Start the sink on a background thread, return (sink, port)"""
+    sink = SMTPSink((host, port))
+    threading.Thread(target=sink.serve_forever, name="smtp-sink", daemon=True).start()
+    return sink, sink.server_address[1]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local SMTP sink")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8025)
+    args = parser.parse_args()
+
+    sink, port = start_smtp_sink(args.host, args.port)
+    print(f"📬 SMTP-Sink läuft auf {args.host}:{port}")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"   {sink.messages} Nachrichten über {sink.connections} Verbindungen empfangen")
+    except KeyboardInterrupt:
+        sink.shutdown()
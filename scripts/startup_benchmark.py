@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark for IT Support Chatbot
+
+Starts fresh interpreters that import app.py under `python -X importtime`
+and reports what a new worker costs: import time, the slowest imports,
+resident memory after the import and after preload(), and how long the
+first use of the lazily created Azure OpenAI client takes.
+
+Examples:
+    python scripts/startup_benchmark.py
+    python scripts/startup_benchmark.py --runs 10 --top 15 --json bench_startup.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the measured interpreter; prints one JSON line
+WORKER = r'''
+import json, time, logging
+
+def rss_kb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+logging.disable(logging.INFO)
+started = time.perf_counter()
+import app
+result = {'import_seconds': time.perf_counter() - started, 'rss_import_kb': rss_kb()}
+
+started = time.perf_counter()
+app.preload()
+result.update(preload_seconds=time.perf_counter() - started, rss_preload_kb=rss_kb())
+
+started = time.perf_counter()
+app.azure_ai_service.provider.prepare()
+result.update(client_seconds=time.perf_counter() - started, rss_client_kb=rss_kb())
+print(json.dumps(result))
+'''
+
+def parse_importtime(stderr):
+    """Return {module: (self µs, cumulative µs, depth)} for the import of app from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, raw = line[len('import time:'):].split('|', 2)
+        # One space after the bar, then two per nesting level
+        depth = (len(raw) - len(raw.lstrip()) - 1) // 2
+        modules[raw.strip()] = (int(own), int(cumulative), depth)
+        # A module is reported after everything it imported: drop the interpreter's own
+        # startup imports (site, encodings) and stop before the ones of preload()
+        if depth == 0:
+            if raw.strip() == 'app':
+                break
+            modules = {}
+    return modules
+
+def run_once():
+    env = dict(os.environ, KB_RELOAD_INTERVAL='0', ARCHIVE_ENABLED='false', PYTHONDONTWRITEBYTECODE='1')
+    # Any key works: the client is created, no request is sent
+    env.setdefault('AZURE_OPENAI_API_KEY', 'startup-benchmark')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', WORKER],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return result, parse_importtime(proc.stderr)
+
+def median(runs, key):
+    return statistics.median(run[key] for run in runs)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the cold start of one worker")
+    parser.add_argument('--runs', type=int, default=5, help="fresh interpreters to start")
+    parser.add_argument('--top', type=int, default=10, help="slowest imports to list")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    runs, imports = [], []
+    for _ in range(args.runs):
+        result, modules = run_once()
+        runs.append(result)
+        imports.append(modules)
+
+    # Modules imported directly by app.py, by median cumulative time
+    names = [name for name, (_, _, depth) in imports[0].items() if depth == 1]
+    slowest = sorted(
+        ((name, statistics.median(run[name][1] for run in imports if name in run) / 1e6) for name in names),
+        key=lambda item: item[1], reverse=True
+    )[:args.top]
+
+    print(f"🛠️ IT-Support Chatbot - Kaltstart ({args.runs} Läufe, Median)\n")
+    print(f"{'import app':<30}{median(runs, 'import_seconds') * 1000:>10.1f} ms{median(runs, 'rss_import_kb') / 1024:>10.1f} MB RSS")
+    print(f"{'preload()':<30}{median(runs, 'preload_seconds') * 1000:>10.1f} ms{median(runs, 'rss_preload_kb') / 1024:>10.1f} MB RSS")
+    print(f"{'erster Azure OpenAI Client':<30}{median(runs, 'client_seconds') * 1000:>10.1f} ms{median(runs, 'rss_client_kb') / 1024:>10.1f} MB RSS")
+    print("\nLangsamste Importe von app.py:")
+    for name, seconds in slowest:
+        print(f"  {name:<28}{seconds * 1000:>10.1f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'runs': runs,
+                'median': {key: median(runs, key) for key in runs[0]},
+                'slowest_imports': dict(slowest),
+            }, f, indent=2)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Production Server for IT Support Chatbot
+
+Runs the Flask app under Gunicorn with threaded (gthread) workers. The app,
+knowledge base, retrieval index and templates are loaded once in the master
+process before forking, so workers share that memory copy-on-write.
+
+    python serve.py --workers 4 --threads 8 --bind 0.0.0.0:5000
+
+`kill -HUP <master pid>` replaces all workers one by one after they
+finished their current requests, e.g. to drop leaked memory. The new
+workers are forked from the same preloaded master, so HUP does not pick
+up code changes; restart serve.py to deploy them. Knowledge base changes
+are picked up by the workers without either. Each worker answers
+/healthz (liveness) and /readyz (readiness).
+
+Each chat message holds a request thread until its answer (or the last
+streamed token) is sent, so at most workers x threads messages are
+answered at the same time; more wait for a free thread.
+
+Without Gunicorn (e.g. on Windows) the app falls back to Werkzeug's
+threaded server in a single process.
+"""
+
+import os
+import gc
+import sys
+import signal
+import logging
+import argparse
+import multiprocessing
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    # gunicorn not installed, serve with Werkzeug's threaded server
+    BaseApplication = None
+
+logger = logging.getLogger(__name__)
+
+def load_app():
+    """Import the app and warm every lazily built structure"""
+    import app as chatbot
+    chatbot.preload()
+    # Keep the garbage collector from touching (and so copying) the preloaded objects in every worker
+    gc.freeze()
+    return chatbot.app
+
+if BaseApplication is not None:
+    class ChatbotServer(BaseApplication):
+        """Gunicorn application with the preloaded Flask app"""
+
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return load_app()
+
+def post_fork(server, worker):
+    logger.info(f"👷 Worker {worker.pid} started")
+
+def worker_exit(server, worker):
+    logger.info(f"👋 Worker {worker.pid} stopped")
+
+def serve_gunicorn(args):
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'keepalive': args.keepalive,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10 if args.max_requests else 0,
+        'accesslog': '-' if args.access_log else None,
+        'post_fork': post_fork,
+        'worker_exit': worker_exit,
+    }
+    if args.workers > 1 and os.environ.get('SESSION_STORE', 'memory').lower() != 'sqlite':
+        logger.warning("⚠️  SESSION_STORE is not sqlite: each worker keeps its own sessions, "
+                       "set SESSION_STORE=sqlite when running more than one worker")
+    logger.info(f"🚀 Starting {args.workers} workers x {args.threads} threads on {args.bind}")
+    ChatbotServer(options).run()
+
+def serve_werkzeug(args):
+    from werkzeug.serving import make_server
+
+    host, _, port = args.bind.rpartition(':')
+    server = make_server(host or '0.0.0.0', int(port), load_app(), threaded=True)
+    signal.signal(signal.SIGTERM, lambda *_: server.shutdown())
+    logger.warning("⚠️  gunicorn not installed, serving with Werkzeug's threaded server in a single process")
+    logger.info(f"🚀 Listening on {args.bind}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the IT support chatbot in production")
+    parser.add_argument('--bind', default=os.environ.get('SERVER_BIND', '0.0.0.0:5000'))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('SERVER_WORKERS', min(4, multiprocessing.cpu_count()))))
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('SERVER_THREADS', '8')),
+                        help="request threads per worker (streaming responses hold one each)")
+    parser.add_argument('--timeout', type=int, default=int(os.environ.get('SERVER_TIMEOUT', '120')))
+    parser.add_argument('--graceful-timeout', type=int, default=int(os.environ.get('SERVER_GRACEFUL_TIMEOUT', '30')))
+    parser.add_argument('--keepalive', type=int, default=5)
+    parser.add_argument('--max-requests', type=int, default=int(os.environ.get('SERVER_MAX_REQUESTS', '0')),
+                        help="recycle a worker after this many requests (0 = never)")
+    parser.add_argument('--access-log', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    if BaseApplication is not None and hasattr(os, 'fork'):
+        serve_gunicorn(args)
+    else:
+        serve_werkzeug(args)
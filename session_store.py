@@ -0,0 +1,366 @@
+import os
+import time
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+
+from chat_history import ChatHistory, ChatMessage, Sender
+
+logger = logging.getLogger(__name__)
+
+SESSION_FIELDS = ('user_name', 'user_email', 'main_issue')
+
+class SessionStore:
+    """
+    Server-side storage for chat sessions
+
+    The browser cookie only carries the session id. Chat history is a
+    ChatHistory of ChatMessage records, stored as appended entries instead of
+    being re-serialized on every request.
+    """
+
+    def create(self, session_id, user_name, user_email):
+        raise NotImplementedError
+
+    def get(self, session_id):
+        """Return the session as a dict with its chat_history, or None"""
+        raise NotImplementedError
+
+    def update(self, session_id, **fields):
+        raise NotImplementedError
+
+    def append_message(self, session_id, message):
+        raise NotImplementedError
+
+    def delete(self, session_id):
+        raise NotImplementedError
+
+    def evict_expired(self):
+        """Remove sessions idle for longer than the TTL, return how many"""
+        raise NotImplementedError
+
+class MemorySessionStore(SessionStore):
+    """
+    In-process LRU session store with idle TTL eviction
+
+    Entries are kept in last-access order, so expired sessions are always at
+    the front and an eviction sweep only touches what it removes.
+    """
+
+    def __init__(self, max_sessions=1000, ttl_seconds=7200):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _touch(self, session_id):
+        record = self._sessions.get(session_id)
+        if record is None:
+            return None
+        if time.time() - record['last_access'] > self.ttl_seconds:
+            del self._sessions[session_id]
+            return None
+        record['last_access'] = time.time()
+        self._sessions.move_to_end(session_id)
+        return record
+
+    def put(self, session_id, record):
+        """Insert a full session record, evicting the least recently used one if full"""
+        with self._lock:
+            record['last_access'] = time.time()
+            self._sessions[session_id] = record
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                evicted_id, _ = self._sessions.popitem(last=False)
+                logger.debug(f"Evicted session {evicted_id} from memory (LRU)")
+
+    def create(self, session_id, user_name, user_email):
+        self.evict_expired()
+        self.put(session_id, {
+            'session_id': session_id,
+            'user_name': user_name,
+            'user_email': user_email,
+            'main_issue': None,
+            'chat_history': ChatHistory(),
+        })
+
+    def get(self, session_id):
+        with self._lock:
+            return self._touch(session_id)
+
+    def update(self, session_id, **fields):
+        with self._lock:
+            record = self._touch(session_id)
+            if record is not None:
+                record.update(fields)
+
+    def append_message(self, session_id, message):
+        with self._lock:
+            record = self._touch(session_id)
+            if record is not None:
+                record['chat_history'].append(message)
+
+    def refresh(self, session_id, update):
+        """Merge fields and newer messages loaded from a backing store"""
+        with self._lock:
+            record = self._touch(session_id)
+            if record is None:
+                return None
+            for name in SESSION_FIELDS:
+                record[name] = update[name]
+            # Concurrent requests may load the same rows; only merge what this copy does not have yet
+            last_seq = record.get('last_seq', 0)
+            record['chat_history'].extend(
+                message for seq, message in zip(update['seqs'], update['chat_history']) if seq > last_seq
+            )
+            record['last_seq'] = max(last_seq, update['last_seq'])
+            return record
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def evict_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        evicted = 0
+        with self._lock:
+            while self._sessions:
+                session_id, record = next(iter(self._sessions.items()))
+                if record['last_access'] > cutoff:
+                    break
+                del self._sessions[session_id]
+                evicted += 1
+        return evicted
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite-backed session store shared by all worker processes on a host
+
+    Messages live in their own table so each reply is a single INSERT; the
+    sender and epoch timestamp are stored as integers.
+    """
+
+    def __init__(self, path='sessions.db', ttl_seconds=7200, sweep_interval=300):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self._local = threading.local()
+        self._init_schema()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # SQLite connections must not be shared with the parent process
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    user_name TEXT,
+                    user_email TEXT,
+                    main_issue TEXT,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_last_access ON sessions(last_access)')
+        conn.execute('BEGIN IMMEDIATE')
+        with conn:
+            if conn.execute('PRAGMA user_version').fetchone()[0] < 1:
+                self._migrate_messages(conn)
+                conn.execute('PRAGMA user_version = 1')
+
+    def _migrate_messages(self, conn):
+        """Create the messages table, converting one with text timestamps and senders"""
+        legacy = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages'").fetchone()
+        if legacy:
+            conn.execute('ALTER TABLE messages RENAME TO messages_v0')
+            conn.execute('DROP INDEX IF EXISTS idx_messages_session')
+        conn.execute('''
+            CREATE TABLE messages (
+                session_id TEXT NOT NULL REFERENCES sessions(session_id) ON DELETE CASCADE,
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp INTEGER NOT NULL,
+                sender INTEGER NOT NULL,
+                message TEXT
+            )
+        ''')
+        conn.execute('CREATE INDEX idx_messages_session ON messages(session_id, seq)')
+        if legacy:
+            # Old rows hold 'HH:MM:SS' of a session that is at most a TTL old: assume today
+            conn.execute(f'''
+                INSERT INTO messages (session_id, seq, timestamp, sender, message)
+                SELECT session_id, seq,
+                       COALESCE(CAST(strftime('%s', date('now', 'localtime') || ' ' || timestamp, 'utc') AS INTEGER), 0),
+                       CASE lower(sender) WHEN 'user' THEN {Sender.USER:d} ELSE {Sender.BOT:d} END,
+                       message
+                FROM messages_v0
+            ''')
+            conn.execute('DROP TABLE messages_v0')
+            logger.info(f"Converted chat messages in {self.path} to integer timestamps and senders")
+
+    def _maybe_sweep(self):
+        if time.time() - self._last_sweep > self.sweep_interval:
+            self._last_sweep = time.time()
+            self.evict_expired()
+
+    def create(self, session_id, user_name, user_email):
+        self._maybe_sweep()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO sessions (session_id, user_name, user_email, main_issue, last_access) '
+                'VALUES (?, ?, ?, NULL, ?)',
+                (session_id, user_name, user_email, time.time())
+            )
+
+    def get(self, session_id, after_seq=0):
+        """Return the session with messages newer than after_seq and their seq numbers, or None"""
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT user_name, user_email, main_issue, last_access FROM sessions WHERE session_id = ?',
+            (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        if time.time() - row[3] > self.ttl_seconds:
+            self.delete(session_id)
+            return None
+
+        with conn:
+            conn.execute('UPDATE sessions SET last_access = ? WHERE session_id = ?', (time.time(), session_id))
+        messages = conn.execute(
+            'SELECT seq, timestamp, sender, message FROM messages WHERE session_id = ? AND seq > ? ORDER BY seq',
+            (session_id, after_seq)
+        ).fetchall()
+        return {
+            'session_id': session_id,
+            'user_name': row[0],
+            'user_email': row[1],
+            'main_issue': row[2],
+            'chat_history': ChatHistory(
+                ChatMessage(Sender(sender), message, timestamp)
+                for _, timestamp, sender, message in messages
+            ),
+            'seqs': [seq for seq, _, _, _ in messages],
+            'last_seq': messages[-1][0] if messages else after_seq,
+        }
+
+    def update(self, session_id, **fields):
+        columns = [name for name in fields if name in SESSION_FIELDS]
+        if not columns:
+            return
+        assignments = ', '.join(f'{name} = ?' for name in columns)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                f'UPDATE sessions SET {assignments}, last_access = ? WHERE session_id = ?',
+                [fields[name] for name in columns] + [time.time(), session_id]
+            )
+
+    def append_message(self, session_id, message):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                'INSERT INTO messages (session_id, timestamp, sender, message) VALUES (?, ?, ?, ?)',
+                (session_id, message.timestamp, int(message.sender), message.message)
+            )
+            conn.execute('UPDATE sessions SET last_access = ? WHERE session_id = ?', (time.time(), session_id))
+
+    def delete(self, session_id):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+
+    def evict_expired(self):
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute('DELETE FROM sessions WHERE last_access < ?', (time.time() - self.ttl_seconds,))
+        if cursor.rowcount:
+            logger.info(f"Evicted {cursor.rowcount} idle sessions from {self.path}")
+        return cursor.rowcount
+
+class TieredSessionStore(SessionStore):
+    """
+    In-process LRU tier in front of a persistent store
+
+    Writes go to the backend only. Reads fetch just the messages appended since
+    the cached copy was loaded, so other worker processes' writes are seen
+    without transferring the whole history again.
+    """
+
+    def __init__(self, memory, backend):
+        self.memory = memory
+        self.backend = backend
+
+    def create(self, session_id, user_name, user_email):
+        self.backend.create(session_id, user_name, user_email)
+        self.memory.create(session_id, user_name, user_email)
+
+    def get(self, session_id):
+        cached = self.memory.get(session_id)
+        after_seq = cached.get('last_seq', 0) if cached else 0
+
+        update = self.backend.get(session_id, after_seq=after_seq)
+        if update is None:
+            self.memory.delete(session_id)
+            return None
+
+        record = self.memory.refresh(session_id, update) if cached else None
+        if record is None:
+            if after_seq:
+                # Cached copy vanished meanwhile, load the full history
+                update = self.backend.get(session_id)
+                if update is None:
+                    return None
+            del update['seqs']
+            self.memory.put(session_id, update)
+            record = update
+        return record
+
+    def update(self, session_id, **fields):
+        self.backend.update(session_id, **fields)
+        self.memory.update(session_id, **fields)
+
+    def append_message(self, session_id, message):
+        self.backend.append_message(session_id, message)
+
+    def delete(self, session_id):
+        self.backend.delete(session_id)
+        self.memory.delete(session_id)
+
+    def evict_expired(self):
+        self.memory.evict_expired()
+        return self.backend.evict_expired()
+
+def create_session_store():
+    """Create the session store configured by the SESSION_* environment variables"""
+    ttl_seconds = int(os.environ.get('SESSION_TTL_SECONDS', '7200'))
+    memory = MemorySessionStore(
+        max_sessions=int(os.environ.get('SESSION_CACHE_SIZE', '1000')),
+        ttl_seconds=ttl_seconds
+    )
+
+    backend = os.environ.get('SESSION_STORE', 'memory').lower()
+    if backend == 'sqlite':
+        db_path = os.environ.get('SESSION_DB_PATH', 'sessions.db')
+        logger.info(f"Using SQLite session store at {db_path}")
+        return TieredSessionStore(memory, SQLiteSessionStore(db_path, ttl_seconds=ttl_seconds))
+
+    if backend != 'memory':
+        logger.warning(f"Unknown SESSION_STORE '{backend}', using in-memory sessions")
+    return memory
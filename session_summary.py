@@ -0,0 +1,262 @@
+import os
+import re
+import time
+import uuid
+import atexit
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import metrics
+from chat_history import Sender
+from email_summary import get_summary_renderer
+from job_store import MemoryJobStore
+
+logger = logging.getLogger(__name__)
+
+SUMMARIES = metrics.counter('it_support_session_summaries_total', 'Session summaries by method', ['method'])
+SUMMARY_EMAILS = metrics.counter('it_support_summary_emails_queued_total', 'Summary emails queued, by kind', ['kind'])
+
+_BULLET = re.compile(r'^\s*(?:[-*•]|\d+[.)])\s*')
+_MARKUP = re.compile(r'[*_#`]+')
+
+def clip(text, max_chars=200):
+    """Text on one line, cut at max_chars"""
+    text = ' '.join(text.split())
+    return text if len(text) <= max_chars else text[:max_chars - 1].rstrip() + '…'
+
+def parse_points(text, max_points=8):
+    """Bullet points of an LLM summary, without their list markers"""
+    points = []
+    for line in text.splitlines():
+        line = _MARKUP.sub('', _BULLET.sub('', line)).strip()
+        if line:
+            points.append(clip(line, 400))
+    return points[:max_points]
+
+def extractive_summary(chat_history, main_issue=None, max_user=4, max_bot=3):
+    """
+    Summarize a session locally: what the user wrote and the headline of each answer
+
+    Bot answers are knowledge base articles or LLM text the IT team already
+    knows, so their first line is enough; the user's messages carry the
+    details of the problem.
+    """
+    points = [f"Anliegen: {clip(main_issue)}"] if main_issue else []
+    user_messages, headlines = [], []
+    for entry in chat_history:
+        if entry.sender is Sender.USER:
+            if entry.message != main_issue and entry.message not in user_messages:
+                user_messages.append(entry.message)
+        else:
+            headline = next((line for line in (_MARKUP.sub('', line).strip() for line in entry.message.splitlines())
+                             if line), '')
+            if headline and headline not in headlines:
+                headlines.append(headline)
+    points.extend(f"Nutzer: {clip(message)}" for message in user_messages[:max_user])
+    if len(user_messages) > max_user:
+        points.append(f"… und {len(user_messages) - max_user} weitere Nachrichten des Nutzers")
+    points.extend(f"Antwort: {clip(headline)}" for headline in headlines[:max_bot])
+    return points
+
+class SummaryPipeline:
+    """
+    Summarizes ended sessions in the background and mails them to the IT team
+
+    /end_session only snapshots the session and returns. A worker then asks
+    the LLM for a short summary (bounded by llm_deadline, skipped when more
+    than max_pending sessions are waiting) or condenses the chat locally.
+    While fewer than digest_threshold sessions ended within digest_window
+    seconds every summary is mailed on its own; above that, summaries are
+    collected and sent as one digest email when the window closes. Job
+    status goes to the job store, like that of the dispatcher.
+    """
+
+    def __init__(self, dispatcher, recipient, summarize=None, num_workers=2, llm_deadline=15.0, max_pending=100,
+                 digest_window=300.0, digest_threshold=5, max_tracked_jobs=10000, jobs=None):
+        self.dispatcher = dispatcher
+        self.recipient = recipient
+        # summarize(chat_history, main_issue, deadline) -> text or None
+        self.summarize = summarize
+        self.num_workers = num_workers
+        self.llm_deadline = llm_deadline
+        self.max_pending = max_pending
+        self.digest_window = digest_window
+        self.digest_threshold = digest_threshold
+        self.jobs = jobs or MemoryJobStore(max_tracked_jobs)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+        self._ended = deque()
+        self._digest = []
+        self._timer = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # Worker threads and the digest timer are not copied into a forked process
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+        self._ended = deque()
+        self._digest = []
+        self._timer = None
+
+    def start(self):
+        """Start the worker threads if they are not running yet"""
+        with self._lock:
+            if self._executor is None:
+                # Registered before our own shutdown, so atexit stops the dispatcher after the last digest
+                self.dispatcher.start()
+                self._executor = ThreadPoolExecutor(self.num_workers, thread_name_prefix='session-summary')
+                atexit.register(self.shutdown)
+
+    def submit(self, chat_session):
+        """Queue an ended session for summarizing and return its job id"""
+        self.start()
+        session = {
+            'user_name': chat_session.get('user_name'),
+            'user_email': chat_session.get('user_email'),
+            'main_issue': chat_session.get('main_issue') or 'General IT Support',
+            'chat_history': list(chat_session['chat_history']),
+            'ended_at': time.time(),
+        }
+        job = {
+            'job_id': str(uuid.uuid4()),
+            'status': 'summarizing',
+            'summary_method': None,
+            'digest': False,
+            'email_job_id': None,
+            'error': None,
+            'created_at': session['ended_at'],
+        }
+        with self._lock:
+            # Many sessions ending within one window go into a digest
+            self._ended.append(session['ended_at'])
+            while self._ended[0] < session['ended_at'] - self.digest_window:
+                self._ended.popleft()
+            job['digest'] = bool(self.digest_threshold) and len(self._ended) > self.digest_threshold
+            self.jobs.put('summary', job)
+            use_llm = self.summarize is not None and self._pending < self.max_pending
+            self._pending += 1
+            executor = self._executor
+        executor.submit(self._process, job, session, use_llm)
+        return job['job_id']
+
+    def get_status(self, job_id):
+        """Return the summary job merged with the delivery status of its email, or None if unknown"""
+        job = self.jobs.get('summary', job_id)
+        if job and job['email_job_id']:
+            delivery = self.dispatcher.get_status(job['email_job_id'])
+            if delivery:
+                job.update(status=delivery['status'], attempts=delivery['attempts'], error=delivery['error'],
+                           sent_at=delivery['sent_at'])
+        return job
+
+    def shutdown(self, timeout=10.0):
+        """Finish the queued summaries and send the pending digest"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        self.flush()
+
+    def flush(self):
+        """Send the summaries collected for the current digest right away"""
+        with self._lock:
+            batch, self._digest = self._digest, []
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        if batch:
+            self._send(batch)
+
+    def _process(self, job, session, use_llm):
+        try:
+            summary = None
+            if use_llm:
+                text = self.summarize(session['chat_history'], session['main_issue'], self.llm_deadline)
+                summary = parse_points(text) if text else None
+            method = 'llm' if summary else 'extractive'
+            if not summary:
+                summary = extractive_summary(session['chat_history'], session['main_issue'])
+            SUMMARIES.inc(method=method)
+            session['summary'] = summary
+            with self._lock:
+                job['summary_method'] = method
+                self.jobs.put('summary', job)
+            self._collect(job, session)
+        except Exception as e:
+            logger.error(f"Failed to summarize session of {session['user_email']}: {e}")
+            with self._lock:
+                job['status'] = 'failed'
+                job['error'] = str(e)
+                self.jobs.put('summary', job)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _collect(self, job, session):
+        """Mail the summary now, or hold it for the digest of the current window"""
+        with self._lock:
+            if job['digest'] or self._digest:
+                job['status'] = 'waiting_for_digest'
+                job['digest'] = True
+                self.jobs.put('summary', job)
+                self._digest.append((job, session))
+                if self._timer is None:
+                    self._timer = threading.Timer(self.digest_window, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+        self._send([(job, session)])
+
+    def _send(self, batch):
+        renderer = get_summary_renderer()
+        sender_email = self.dispatcher.config.sender_email
+        try:
+            with metrics.span('email_render'):
+                if len(batch) == 1:
+                    _, session = batch[0]
+                    msg = renderer.build_message(
+                        sender_email, self.recipient, session['user_name'], session['user_email'],
+                        session['summary'], session['main_issue'], session_date=format_date(session['ended_at'])
+                    )
+                else:
+                    msg = renderer.build_digest(sender_email, self.recipient, [
+                        dict(session, session_date=format_date(session['ended_at'])) for _, session in batch
+                    ])
+            email_job_id = self.dispatcher.submit(msg, [self.recipient])
+        except Exception as e:
+            logger.error(f"Failed to queue summary email: {e}")
+            email_job_id = None
+        kind = 'single' if len(batch) == 1 else 'digest'
+        with self._lock:
+            for job, _ in batch:
+                job['email_job_id'] = email_job_id
+                job['status'] = 'queued' if email_job_id else 'failed'
+                self.jobs.put('summary', job)
+        if email_job_id:
+            SUMMARY_EMAILS.inc(kind=kind)
+            logger.info(f"📧 Summary email with {len(batch)} session(s) queued as job {email_job_id}")
+
+def format_date(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+def create_summary_pipeline(dispatcher, recipient, summarize=None, jobs=None):
+    """Create the pipeline configured by the SUMMARY_* environment variables"""
+    if os.environ.get('SUMMARY_LLM_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+        summarize = None
+    return SummaryPipeline(
+        dispatcher,
+        recipient,
+        summarize=summarize,
+        num_workers=int(os.environ.get('SUMMARY_WORKERS', '2')),
+        llm_deadline=float(os.environ.get('SUMMARY_LLM_DEADLINE', '15')),
+        max_pending=int(os.environ.get('SUMMARY_MAX_PENDING', '100')),
+        digest_window=float(os.environ.get('SUMMARY_DIGEST_WINDOW', '300')),
+        digest_threshold=int(os.environ.get('SUMMARY_DIGEST_THRESHOLD', '5')),
+        jobs=jobs
+    )
@@ -34,7 +34,7 @@ echo "2. Run: python app.py"
 echo "3. Open http://localhost:5000 in your browser"
 echo ""
 echo "For production deployment, consider:"
-echo "- Using a proper WSGI server like Gunicorn"
+echo "- Running: SESSION_STORE=sqlite python serve.py --workers 4"
 echo "- Setting up HTTPS"
 echo "- Using environment variables for secrets"
 echo "- Deploying to Azure App Service or similar"
@@ -0,0 +1,168 @@
+import hashlib
+import threading
+import logging
+
+import metrics
+from response_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+COALESCED = metrics.counter('it_support_coalesced_calls_total', 'LLM requests by single-flight role', ['role'])
+
+def flight_key(namespace, message, context=()):
+    """Key for requests that would send the same prompt upstream"""
+    parts = [namespace, normalize_text(message)] + [normalize_text(part) for part in context]
+    return hashlib.sha256('\x00'.join(parts).encode('utf-8')).hexdigest()
+
+class _Call:
+    """Result of one upstream call, handed to every caller that waited for it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class _StreamFlight:
+    """Chunks of one upstream stream, replayed to every subscriber"""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.cancelled = False
+        self._changed = threading.Condition()
+
+    def publish(self, chunk=None, done=False, error=None):
+        with self._changed:
+            if chunk is not None:
+                self.chunks.append(chunk)
+            self.done = self.done or done
+            self.error = error
+            self._changed.notify_all()
+
+    def subscribe(self):
+        index = 0
+        while True:
+            with self._changed:
+                while index >= len(self.chunks) and not self.done:
+                    self._changed.wait()
+                chunks, done, error = self.chunks[index:], self.done, self.error
+            for chunk in chunks:
+                yield chunk
+            index += len(chunks)
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+class SingleFlight:
+    """
+    Share one upstream LLM call between identical concurrent requests
+
+    Flights are tracked per process, so requests from every Flask thread
+    are coalesced. The first request for a key makes the call; the others
+    wait for its result. A shared stream is read by a pump thread, and
+    subscribers that arrive late get the chunks produced so far replayed
+    before following the live stream.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.leaders = 0
+        self.followers = 0
+        self._calls = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def _count(self, leader):
+        if leader:
+            self.leaders += 1
+        else:
+            self.followers += 1
+        COALESCED.inc(role='leader' if leader else 'follower')
+
+    def do(self, key, factory):
+        """Call factory() once per key among concurrent callers and share its result"""
+        if not self.enabled:
+            return factory()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._count(leader)
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = factory()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stream(self, key, factory):
+        """Iterate the generator factory() once per key and fan its chunks out"""
+        if not self.enabled:
+            yield from factory()
+            return
+
+        with self._lock:
+            flight = self._streams.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._streams[key] = _StreamFlight()
+            self._count(leader)
+            flight.subscribers += 1
+        if leader:
+            # Not read on the leader's thread, so the others keep their stream if its client goes away
+            threading.Thread(target=self._pump, args=(key, flight, factory), name="single-flight-stream",
+                             daemon=True).start()
+
+        try:
+            yield from flight.subscribe()
+        finally:
+            with self._lock:
+                flight.subscribers -= 1
+                # Nobody is listening any more, stop paying for the tokens
+                if not flight.subscribers and not flight.done:
+                    if self._streams.get(key) is flight:
+                        del self._streams[key]
+                    flight.cancelled = True
+
+    def _pump(self, key, flight, factory):
+        source = factory()
+        try:
+            for chunk in source:
+                if flight.cancelled:
+                    break
+                flight.publish(chunk)
+            flight.publish(done=True)
+        except Exception as e:
+            logger.error(f"Shared LLM stream failed: {e}")
+            flight.publish(done=True, error=e)
+        finally:
+            # Late arrivals after this point start a fresh call (or hit the response cache)
+            with self._lock:
+                if self._streams.get(key) is flight:
+                    del self._streams[key]
+            source.close()
+
+    def stats(self):
+        total = self.leaders + self.followers
+        return {
+            'enabled': self.enabled,
+            'upstream_calls': self.leaders,
+            'coalesced_requests': self.followers,
+            'in_flight': len(self._calls) + len(self._streams),
+            'dedup_ratio': self.followers / total if total else 0.0,
+        }
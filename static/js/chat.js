@@ -0,0 +1,374 @@
+let sessionActive = false;
+let userName = '';
+let userEmail = '';
+
+// Copy of the server-side chat history, kept in sessionStorage so a reload only fetches newer messages
+let chatHistory = { key: null, cursor: 0, messages: [] };
+let historyPush = false;
+let historyEvents = null;
+let awaitingReply = false;
+let pushedDuringReply = [];
+
+// Auto-resize textarea
+function adjustTextarea() {
+    const textarea = document.getElementById('messageInput');
+    textarea.style.height = 'auto';
+    textarea.style.height = Math.min(textarea.scrollHeight, 200) + 'px';
+
+    // Enable/disable send button
+    const sendButton = document.getElementById('sendButton');
+    sendButton.disabled = textarea.value.trim() === '';
+}
+
+// Handle Enter key
+function handleKeyDown(event) {
+    if (event.key === 'Enter' && !event.shiftKey) {
+        event.preventDefault();
+        sendMessage();
+    }
+}
+
+// Fill example text
+function fillExample(text) {
+    if (sessionActive) {
+        document.getElementById('messageInput').value = text;
+        adjustTextarea();
+        document.getElementById('messageInput').focus();
+    } else {
+        // If no session yet, show alert suggesting to start chat first
+        alert('Bitte starten Sie zuerst einen Chat, indem Sie Ihre Daten eingeben und auf "Chat starten" klicken.');
+    }
+}
+
+// Start chat session
+function startSession() {
+    const nameInput = document.getElementById('userName');
+    const emailInput = document.getElementById('userEmail');
+
+    if (!nameInput.value.trim() || !emailInput.value.trim()) {
+        alert('Bitte geben Sie Ihren Namen und Ihre E-Mail-Adresse ein.');
+        return;
+    }
+
+    userName = nameInput.value.trim();
+    userEmail = emailInput.value.trim();
+
+    fetch('/start_session', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            name: userName,
+            email: userEmail
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.status === 'success') {
+            sessionActive = true;
+
+            // Hide welcome area and show chat
+            document.getElementById('welcomeArea').style.display = 'none';
+            document.getElementById('chatMessages').style.display = 'block';
+            document.getElementById('chatInputArea').style.display = 'block';
+            document.getElementById('endSessionBtn').style.display = 'block';
+
+            // Add welcome message
+            addMessage(data.message, 'bot');
+            resetChatHistory(data.sync_key);
+            openHistoryEvents();
+
+            // Focus on input
+            document.getElementById('messageInput').focus();
+        } else {
+            alert('Fehler beim Starten der Sitzung: ' + data.message);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Fehler beim Starten der Sitzung.');
+    });
+}
+
+// Send message
+function sendMessage() {
+    const messageInput = document.getElementById('messageInput');
+    const message = messageInput.value.trim();
+
+    if (!message || !sessionActive) return;
+
+    // Add user message
+    addMessage(message, 'user');
+
+    // Clear input
+    messageInput.value = '';
+    adjustTextarea();
+
+    // Show typing indicator
+    showTypingIndicator();
+    awaitingReply = true;
+
+    // Send to server and render tokens as they arrive
+    fetch('/send_message_stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            message: message
+        })
+    })
+    .then(response => {
+        const contentType = response.headers.get('Content-Type') || '';
+        if (!contentType.startsWith('text/event-stream')) {
+            // End words and errors are answered with plain JSON
+            return response.json().then(data => {
+                hideTypingIndicator();
+                if (data.session_ended) {
+                    sessionActive = false;
+                    clearChatHistory();
+                    addMessage(data.message, 'bot');
+                    document.getElementById('chatInputArea').style.display = 'none';
+                } else if (data.status === 'success') {
+                    addMessage(data.message, 'bot');
+                } else {
+                    addMessage('Entschuldigung, es gab einen Fehler. Bitte versuchen Sie es erneut.', 'bot');
+                }
+            });
+        }
+        return readMessageStream(response, message);
+    })
+    .catch(error => {
+        hideTypingIndicator();
+        console.error('Error:', error);
+        addMessage('Verbindungsfehler. Bitte versuchen Sie es erneut.', 'bot');
+    })
+    .finally(finishReply);
+}
+
+// Read Server-Sent Events from a streaming response into one bot message
+function readMessageStream(response, userMessage) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let text = '';
+    let content = null;
+
+    function handleEvent(frame) {
+        const data = frame.split('\n')
+            .filter(line => line.startsWith('data: '))
+            .map(line => line.slice(6))
+            .join('\n');
+        if (!data) return;
+
+        const event = JSON.parse(data);
+        text = event.done ? event.message : text + event.delta;
+        if (event.done) {
+            recordExchange(userMessage, event.message, event.cursor);
+        }
+        if (!content) {
+            hideTypingIndicator();
+            content = addMessage('', 'bot');
+        }
+        content.innerHTML = formatMessage(text);
+        const chatMessages = document.getElementById('chatMessages');
+        chatMessages.scrollTop = chatMessages.scrollHeight;
+    }
+
+    function pump() {
+        return reader.read().then(({ done, value }) => {
+            if (done) {
+                if (buffer.trim()) handleEvent(buffer);
+                if (!content) hideTypingIndicator();
+                return;
+            }
+            buffer += decoder.decode(value, { stream: true });
+            const frames = buffer.split('\n\n');
+            buffer = frames.pop();
+            frames.forEach(handleEvent);
+            return pump();
+        });
+    }
+
+    return pump();
+}
+
+// Add message to chat
+function addMessage(message, sender) {
+    const chatMessages = document.getElementById('chatMessages');
+    const messageDiv = document.createElement('div');
+    messageDiv.className = 'message';
+
+    const avatar = sender === 'user' ? 
+        `<div class="message-avatar user-avatar">${userName.charAt(0).toUpperCase()}</div>` :
+        `<div class="message-avatar bot-avatar">IT</div>`;
+
+    messageDiv.innerHTML = `
+        ${avatar}
+        <div class="message-content">${formatMessage(message)}</div>
+    `;
+
+    chatMessages.appendChild(messageDiv);
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+    return messageDiv.querySelector('.message-content');
+}
+
+// Format message content
+function formatMessage(message) {
+    return message
+        .replace(/\n/g, '<br>')
+        .replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>')
+        .replace(/\*(.*?)\*/g, '<em>$1</em>');
+}
+
+// Show/hide typing indicator
+function showTypingIndicator() {
+    document.getElementById('typingIndicator').style.display = 'flex';
+    const chatMessages = document.getElementById('chatMessages');
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+}
+
+function hideTypingIndicator() {
+    document.getElementById('typingIndicator').style.display = 'none';
+}
+
+// End session
+function endSession() {
+    if (!sessionActive) return;
+
+    if (confirm('Möchten Sie die Sitzung wirklich beenden? Eine Zusammenfassung wird per E-Mail gesendet.')) {
+        fetch('/end_session', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            }
+        })
+        .then(response => response.json())
+        .then(data => {
+            sessionActive = false;
+            clearChatHistory();
+            addMessage('Vielen Dank für die Nutzung unseres IT-Support-Services. Eine Zusammenfassung wurde an Ihre E-Mail-Adresse gesendet.', 'bot');
+
+            // Hide input and show restart option
+            document.getElementById('chatInputArea').style.display = 'none';
+
+            setTimeout(() => {
+                if (confirm('Möchten Sie eine neue Sitzung starten?')) {
+                    location.reload();
+                }
+            }, 3000);
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            alert('Fehler beim Beenden der Sitzung.');
+        });
+    }
+}
+
+// Store the history copy; sessionStorage may be unavailable (private mode, quota)
+function saveChatHistory() {
+    try {
+        sessionStorage.setItem('chatHistory', JSON.stringify(chatHistory));
+    } catch (error) {
+        console.warn('Chat history not cached:', error);
+    }
+}
+
+function loadChatHistory() {
+    try {
+        return JSON.parse(sessionStorage.getItem('chatHistory')) || chatHistory;
+    } catch (error) {
+        return chatHistory;
+    }
+}
+
+function resetChatHistory(key) {
+    chatHistory = { key: key, cursor: 0, messages: [] };
+    saveChatHistory();
+}
+
+function clearChatHistory() {
+    if (historyEvents) {
+        historyEvents.close();
+        historyEvents = null;
+    }
+    chatHistory = { key: null, cursor: 0, messages: [] };
+    sessionStorage.removeItem('chatHistory');
+}
+
+// Render messages the server has and this page has not shown yet
+function appendChatHistory(entries, cursor) {
+    entries.forEach(entry => {
+        chatHistory.messages.push(entry);
+        addMessage(entry.message, entry.sender.toLowerCase() === 'user' ? 'user' : 'bot');
+    });
+    chatHistory.cursor = cursor;
+    saveChatHistory();
+}
+
+// The page already shows its own exchange; only remember it
+function recordExchange(userMessage, botMessage, cursor) {
+    chatHistory.messages.push({ sender: 'User', message: userMessage }, { sender: 'Bot', message: botMessage });
+    chatHistory.cursor = Math.max(chatHistory.cursor, cursor || 0);
+    saveChatHistory();
+}
+
+function finishReply() {
+    awaitingReply = false;
+    pushedDuringReply.splice(0).forEach(applyPushedMessage);
+}
+
+function applyPushedMessage(event) {
+    const cursor = parseInt(event.lastEventId, 10);
+    if (cursor > chatHistory.cursor) {
+        appendChatHistory([JSON.parse(event.data)], cursor);
+    }
+}
+
+// Messages written in other tabs of this session arrive while the page is open
+function openHistoryEvents() {
+    if (!historyPush || historyEvents || !window.EventSource) return;
+
+    historyEvents = new EventSource('/chat_events?after=' + chatHistory.cursor);
+    historyEvents.onmessage = event => {
+        // Wait until the own answer is recorded, so it is not shown twice
+        if (awaitingReply) {
+            pushedDuringReply.push(event);
+        } else {
+            applyPushedMessage(event);
+        }
+    };
+    historyEvents.addEventListener('ended', () => clearChatHistory());
+}
+
+// Load chat history on page load: cached messages first, then only what is new
+window.addEventListener('load', function() {
+    const cached = loadChatHistory();
+    fetch('/get_chat_history?after=' + cached.cursor + '&key=' + encodeURIComponent(cached.key || ''))
+        .then(response => response.json())
+        .then(data => {
+            historyPush = data.push;
+            if (data.session_active && data.user_name) {
+                sessionActive = true;
+                userName = data.user_name;
+
+                // Show chat interface
+                document.getElementById('welcomeArea').style.display = 'none';
+                document.getElementById('chatMessages').style.display = 'block';
+                document.getElementById('chatInputArea').style.display = 'block';
+                document.getElementById('endSessionBtn').style.display = 'block';
+
+                // Render the cached transcript, then the messages added since
+                chatHistory = data.reset ? { key: data.sync_key, cursor: 0, messages: [] } : cached;
+                const known = chatHistory.messages.splice(0);
+                appendChatHistory(known.concat(data.chat_history || []), data.cursor);
+                openHistoryEvents();
+
+                document.getElementById('messageInput').focus();
+            } else if (cached.key) {
+                clearChatHistory();
+            }
+        })
+        .catch(error => console.error('Error loading chat history:', error));
+});
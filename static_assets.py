@@ -0,0 +1,131 @@
+import os
+import gzip
+import hashlib
+import mimetypes
+import threading
+import logging
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:
+    # brotli not installed, assets are precompressed with gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.environ.get('STATIC_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+URL_PREFIX = '/static/'
+
+# Fingerprinted URLs change with their content, so browsers may keep them for a year
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Plain URLs and pages are revalidated with their ETag on every use
+REVALIDATE = 'no-cache'
+
+COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+def compress(data, mimetype):
+    """Return {encoding: body} with every encoding that makes data smaller, best first"""
+    bodies = {}
+    if mimetype.startswith(COMPRESSIBLE):
+        if brotli is not None:
+            bodies['br'] = brotli.compress(data, quality=11)
+        # mtime=0 keeps the output, and so the ETag, identical across builds
+        bodies['gzip'] = gzip.compress(data, 9, mtime=0)
+        bodies = {encoding: body for encoding, body in bodies.items() if len(body) < len(data)}
+    bodies['identity'] = data
+    return bodies
+
+class Asset:
+    """An immutable response body in every precompressed encoding, with one ETag per encoding"""
+
+    __slots__ = ('mimetype', 'cache_control', 'bodies', 'etags')
+
+    def __init__(self, data, mimetype, cache_control, bodies=None):
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+        self.bodies = bodies or compress(data, mimetype)
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        self.etags = {encoding: digest if encoding == 'identity' else f"{digest}-{encoding}" for encoding in self.bodies}
+
+class AssetBundle:
+    """
+    Every file under static/, fingerprinted and precompressed once per process
+
+    A file is served under its content-hashed name (css/chat.3f2a9c1b.css)
+    with a one-year immutable Cache-Control, and under its plain name with
+    ETag revalidation. Rendered pages such as the chat UI are added the same
+    way, so a request only picks the encoding and compares the ETag.
+    """
+
+    def __init__(self, static_dir=STATIC_DIR):
+        self.static_dir = static_dir
+        self.urls = {}
+        self.assets = {}
+        self.pages = {}
+        for name in self._files():
+            with open(os.path.join(static_dir, name), 'rb') as f:
+                data = f.read()
+            mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            asset = Asset(data, mimetype, IMMUTABLE)
+            stem, ext = os.path.splitext(name)
+            fingerprinted = f"{stem}.{asset.etags['identity'][:8]}{ext}"
+            self.assets[fingerprinted] = asset
+            self.assets[name] = Asset(data, mimetype, REVALIDATE, bodies=asset.bodies)
+            self.urls[name] = URL_PREFIX + fingerprinted
+        logger.info(f"Prepared {len(self.urls)} static assets from {static_dir}")
+
+    def _files(self):
+        names = []
+        for root, dirs, files in os.walk(self.static_dir):
+            dirs.sort()
+            for filename in sorted(files):
+                names.append(os.path.relpath(os.path.join(root, filename), self.static_dir).replace(os.sep, '/'))
+        return names
+
+    def url(self, name):
+        """Fingerprinted URL of a file in static/; raises KeyError for unknown files"""
+        return self.urls[name]
+
+    def get(self, name):
+        """The Asset served at /static/<name>, or None"""
+        return self.assets.get(name)
+
+    def add_page(self, name, html):
+        """Precompute a rendered page; it is served with ETag revalidation"""
+        page = Asset(html.encode('utf-8'), 'text/html', REVALIDATE)
+        self.pages[name] = page
+        return page
+
+    @staticmethod
+    def respond(asset, request):
+        """Response in the best encoding the client accepts, or 304 if its copy is current"""
+        encoding = request.accept_encodings.best_match(list(asset.bodies), default='identity')
+        response = Response(asset.bodies[encoding], mimetype=asset.mimetype)
+        response.headers['Cache-Control'] = asset.cache_control
+        response.vary.add('Accept-Encoding')
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.set_etag(asset.etags[encoding])
+        return response.make_conditional(request)
+
+def compressed_response(body, mimetype, request, min_size=1024):
+    """Response for a dynamic body, gzip-compressed when it is large and the client accepts gzip"""
+    response = Response(body, mimetype=mimetype)
+    response.vary.add('Accept-Encoding')
+    if len(body) >= min_size and 'gzip' in request.accept_encodings:
+        response.set_data(gzip.compress(body, 6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+_bundle = None
+_bundle_lock = threading.Lock()
+
+def get_static_assets():
+    """Return the process-wide AssetBundle, reading and compressing static/ on first use"""
+    global _bundle
+    with _bundle_lock:
+        if _bundle is None:
+            _bundle = AssetBundle()
+        return _bundle
@@ -0,0 +1,23 @@
+import os
+
+import pytest
+
+@pytest.fixture(scope='session')
+def chatbot(tmp_path_factory):
+    """The Flask app module with keyword answers only and nothing written outside a temporary directory"""
+    data_dir = tmp_path_factory.mktemp('app')
+    os.environ.update({
+        'LLM_PROVIDER': 'keyword',
+        'SESSION_STORE': 'memory',
+        'ARCHIVE_ENABLED': 'false',
+        'RATE_LIMIT_ENABLED': 'false',
+        'KB_RELOAD_INTERVAL': '0',
+        'EMAIL_DRY_RUN': 'true',
+        'EMAIL_SPOOL_DIR': str(data_dir / 'mail_spool'),
+    })
+    import app
+    return app
+
+@pytest.fixture
+def client(chatbot):
+    return chatbot.app.test_client()
@@ -0,0 +1,82 @@
+import pytest
+
+from chat_history import ChatHistory, ChatMessage, Sender, pack_history, unpack_history
+from session_store import SQLiteSessionStore
+
+def test_pack_round_trip():
+    messages = [ChatMessage(Sender.USER, 'Drucker ✓ geht nicht', 1700000000), ChatMessage('Bot', '', 1700000005)]
+    assert list(unpack_history(pack_history(messages))) == messages
+    assert list(unpack_history(pack_history([]))) == []
+    with pytest.raises(ValueError):
+        unpack_history(b'[]')
+
+def test_message_is_a_slotted_record_with_epoch_seconds():
+    message = ChatMessage('User', 'Hallo', 1700000000.9)
+    assert not hasattr(message, '__dict__')
+    assert (message.sender, message.timestamp) == (Sender.USER, 1700000000)
+    assert message.to_dict() == {'timestamp': message.time, 'sender': 'User', 'message': 'Hallo'}
+    assert len(message.time) == len('14:05:09')
+
+def test_sqlite_store_keeps_sender_and_timestamp(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / 'sessions.db'))
+    store.create('s1', 'Max', 'max@example.com')
+    sent = [ChatMessage(Sender.USER, 'Drucker ✓', 1700000000), ChatMessage(Sender.BOT, 'Antwort', 1700000005)]
+    for message in sent:
+        store.append_message('s1', message)
+    assert list(store.get('s1')['chat_history']) == sent
+
+def test_sender_parse_and_since():
+    assert Sender.parse('user') is Sender.USER
+    assert Sender.parse('1') is Sender.BOT
+    history = ChatHistory(ChatMessage(Sender.USER, str(index)) for index in range(3))
+    assert [entry.message for entry in history.since(1)] == ['1', '2']
+    assert history.since(3) == []
+
+def start(client):
+    return client.post('/start_session', json={'name': 'Max', 'email': 'max@example.com'}).get_json()['sync_key']
+
+def sync(client, after=None, key=None):
+    query = {} if after is None else {'after': after, 'key': key}
+    return client.get('/get_chat_history', query_string=query).get_json()
+
+def test_cursor_returns_only_new_messages(client):
+    key = start(client)
+    client.post('/send_message', json={'message': 'Mein Drucker druckt nicht'})
+    first = sync(client, 0, key)
+    assert (len(first['chat_history']), first['cursor'], first['reset']) == (2, 2, False)
+
+    client.post('/send_message', json={'message': 'Outlook startet nicht'})
+    update = sync(client, first['cursor'], key)
+    assert [entry['message'] for entry in update['chat_history']][:1] == ['Outlook startet nicht']
+    assert (len(update['chat_history']), update['cursor'], update['reset']) == (2, 4, False)
+    assert sync(client, update['cursor'], key)['chat_history'] == []
+
+@pytest.mark.parametrize('query', [
+    {},
+    {'after': 0, 'key': 'other-session'},
+    {'after': 99},
+    {'after': -1},
+])
+def test_unknown_key_or_cursor_resets_to_the_full_history(client, query):
+    sync_key = start(client)
+    client.post('/send_message', json={'message': 'VPN geht nicht'})
+    query = dict({'key': sync_key} if 'after' in query else {}, **query)
+    page = client.get('/get_chat_history', query_string=query).get_json()
+    assert page['reset'] is True
+    assert len(page['chat_history']) == 2
+    assert page['cursor'] == 2
+    assert page['sync_key'] == sync_key
+
+def test_new_session_gets_a_new_sync_key(client):
+    first = start(client)
+    client.post('/send_message', json={'message': 'VPN geht nicht'})
+    second = start(client)
+    assert second != first
+    page = sync(client, 2, first)
+    assert page['reset'] is True
+    assert page['chat_history'] == []
+
+def test_no_session(client):
+    page = sync(client)
+    assert page['session_active'] is False
+    assert page['chat_history'] == []
@@ -0,0 +1,91 @@
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def open_breaker():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_rate=0.5, min_calls=4, window_seconds=30, open_seconds=10, clock=clock)
+    for _ in range(2):
+        breaker.record_success()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    return breaker, clock
+
+def half_open_breaker():
+    breaker, clock = open_breaker()
+    assert not breaker.allow()
+    clock.now += 10
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.allow()
+    return breaker, clock
+
+def test_failures_open_and_window_forgets_them():
+    breaker, clock = open_breaker()
+    assert breaker.snapshot()['rejected'] == 0
+    assert not breaker.allow()
+    assert breaker.snapshot()['rejected'] == 1
+
+    clock = Clock()
+    breaker = CircuitBreaker(failure_rate=0.5, min_calls=4, window_seconds=30, clock=clock)
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.now += 31
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+def test_successful_probe_closes():
+    breaker, _ = half_open_breaker()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+def test_failed_probe_opens_again():
+    breaker, clock = half_open_breaker()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    clock.now += 5
+    assert not breaker.allow()
+
+def test_neutral_probe_keeps_half_open_and_frees_the_slot():
+    breaker, _ = half_open_breaker()
+    breaker.record_neutral()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+def test_neutral_calls_do_not_count_while_closed():
+    breaker = CircuitBreaker(failure_rate=0.5, min_calls=2)
+    breaker.record_failure()
+    for _ in range(5):
+        breaker.record_neutral()
+    assert breaker.snapshot()['window_calls'] == 1
+    assert breaker.state == CLOSED
+
+def test_lost_probe_is_replaced_after_open_seconds():
+    breaker, clock = half_open_breaker()
+    clock.now += 10
+    assert breaker.allow()
+
+def test_rejected_prompt_is_neutral_for_the_service():
+    from types import SimpleNamespace
+    from azure_openai_service import AzureOpenAIService
+
+    breaker, _ = half_open_breaker()
+    service = SimpleNamespace(circuit_breaker=breaker)
+    AzureOpenAIService._record_outcome(service, ValueError('content filter'))
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    AzureOpenAIService._record_outcome(service, TimeoutError())
+    assert breaker.state == OPEN
@@ -0,0 +1,77 @@
+import pytest
+
+from chat_history import ChatMessage, Sender
+from conversation_archive import ConversationArchive
+
+ISSUES = ['VPN Fehler 809', 'Drucker druckt nicht', 'VPN trennt ständig', 'Outlook "offline"', 'VPN AND Drucker']
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = ConversationArchive(str(tmp_path / 'archive.db'))
+    for index, issue in enumerate(ISSUES):
+        email = 'max@example.com' if index % 2 == 0 else 'erika@example.com'
+        archive.submit({
+            'session_id': f's{index}',
+            'user_name': 'Test',
+            'user_email': email,
+            'main_issue': issue,
+            'chat_history': [ChatMessage(Sender.USER, issue), ChatMessage(Sender.BOT, f'Antwort {index}')],
+        }, category='vpn' if 'VPN' in issue else None)
+    archive.flush()
+    yield archive
+    archive.shutdown()
+
+def issues(page):
+    return [result['main_issue'] for result in page['results']]
+
+def all_pages(archive, **filters):
+    found, cursor = [], None
+    while True:
+        page = archive.search(limit=1, cursor=cursor, **filters)
+        found.extend(issues(page))
+        cursor = page['next_cursor']
+        if cursor is None:
+            return found
+
+def test_fts_query_quotes_every_word():
+    assert ConversationArchive.fts_query('vpn fehler') == '"vpn" "fehler"'
+    assert ConversationArchive.fts_query('druck*') == '"druck"*'
+    assert ConversationArchive.fts_query('say "hi" OR NOT -x') == '"say" """hi""" "OR" "NOT" "-x"'
+    assert ConversationArchive.fts_query('* "') == '""""'
+
+@pytest.mark.parametrize('text', ['"offline"', 'VPN AND', 'NEAR(vpn', '-vpn', 'vpn OR', '*', 'col:vpn', '^vpn'])
+def test_search_text_with_fts_syntax_does_not_fail(archive, text):
+    archive.search(text=text)
+
+def test_search_matches_words_and_prefixes(archive):
+    assert issues(archive.search(text='vpn')) == ['VPN AND Drucker', 'VPN trennt ständig', 'VPN Fehler 809']
+    assert issues(archive.search(text='druck*')) == ['VPN AND Drucker', 'Drucker druckt nicht']
+    assert issues(archive.search(text='"offline"')) == ['Outlook "offline"']
+    # Operators are plain words
+    assert issues(archive.search(text='vpn AND')) == ['VPN AND Drucker']
+    # Diacritics are folded
+    assert issues(archive.search(text='standig')) == ['VPN trennt ständig']
+
+@pytest.mark.parametrize('filters', [
+    {},
+    {'text': 'vpn'},
+    {'text': 'vpn', 'user_email': 'MAX@example.com'},
+    {'category': 'vpn'},
+])
+def test_keyset_pages_return_every_match_once(archive, filters):
+    expected = issues(archive.search(limit=100, **filters))
+    assert expected
+    assert all_pages(archive, **filters) == expected
+
+def test_last_page_has_no_cursor_and_limit_is_at_least_one(archive):
+    page = archive.search(limit=len(ISSUES))
+    assert len(page['results']) == len(ISSUES)
+    assert page['next_cursor'] is None
+    assert len(archive.search(limit=0)['results']) == 1
+    assert len(archive.search(limit=-1)['results']) == 1
+
+def test_get_returns_the_transcript(archive):
+    conversation_id = archive.search(text='809')['results'][0]['id']
+    conversation = archive.get(conversation_id)
+    assert [entry['message'] for entry in conversation['chat_history']] == ['VPN Fehler 809', 'Antwort 0']
+    assert archive.get(12345) is None
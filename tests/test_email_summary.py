@@ -0,0 +1,79 @@
+from email import message_from_bytes
+
+from chat_history import ChatMessage, Sender
+from email_dispatch import EmailDispatcher, SMTPConfig
+from email_summary import SummaryRenderer
+from session_summary import extractive_summary, parse_points
+
+def bodies(msg):
+    """(plain text, HTML) of a built message, decoded like a mail client would"""
+    parsed = message_from_bytes(msg.as_bytes())
+    parts = {part.get_content_subtype(): part.get_payload(decode=True).decode('utf-8') for part in parsed.get_payload()}
+    return parts['plain'], parts['html']
+
+def test_summary_message_has_text_and_html_alternatives():
+    msg = SummaryRenderer().build_message('bot@example.com', 'it@example.com', 'Jörg', 'joerg@example.com',
+                                          ['Anliegen: Drucker', 'Nutzer: Papierstau in Fach 2'], 'Drucker',
+                                          '2026-01-02 10:00:00')
+    assert msg.get_content_type() == 'multipart/alternative'
+    assert (msg['From'], msg['To']) == ('bot@example.com', 'it@example.com')
+    assert msg['Subject'] == 'IT-Support Sitzung Zusammenfassung: Drucker'
+    text, html = bodies(msg)
+    for body in (text, html):
+        assert 'Jörg' in body and '2026-01-02 10:00:00' in body and 'Papierstau in Fach 2' in body
+    assert '- Nutzer: Papierstau in Fach 2' in text
+    assert '<li>Nutzer: Papierstau in Fach 2</li>' in html
+
+def test_only_the_html_part_is_escaped():
+    text, html = SummaryRenderer().render('<b>Max</b>', 'max@example.com', ['a < b & c'], 'Fehler <script>')
+    assert '<b>Max</b>' in text and 'a < b & c' in text
+    assert '&lt;b&gt;Max&lt;/b&gt;' in html and 'a &lt; b &amp; c' in html
+    assert '<script>' not in html
+
+def test_digest_lists_every_session():
+    sessions = [
+        {'user_name': 'Max', 'user_email': 'max@example.com', 'main_issue': 'VPN', 'session_date': '2026-01-02',
+         'summary': ['Anliegen: VPN']},
+        {'user_name': 'Erika', 'user_email': 'erika@example.com', 'main_issue': 'Drucker',
+         'session_date': '2026-01-03', 'summary': ['Anliegen: Drucker']},
+    ]
+    msg = SummaryRenderer().build_digest('bot@example.com', 'it@example.com', sessions)
+    assert msg['Subject'] == 'IT-Support Zusammenfassung: 2 Sitzungen'
+    text, html = bodies(msg)
+    assert '1. VPN' in text and '2. Drucker' in text
+    assert 'Erika' in html and 'Anliegen: VPN' in html
+
+def test_extractive_summary_keeps_user_details_and_answer_headlines():
+    history = [
+        ChatMessage(Sender.USER, 'Drucker druckt nicht'),
+        ChatMessage(Sender.BOT, '**Druckerprobleme beheben**\n1. Neu starten\n2. Treiber prüfen'),
+        ChatMessage(Sender.USER, 'Papierstau in Fach 2'),
+        ChatMessage(Sender.USER, 'Papierstau in Fach 2'),
+        ChatMessage(Sender.BOT, '**Druckerprobleme beheben**\nNoch einmal'),
+    ]
+    assert extractive_summary(history, 'Drucker druckt nicht') == [
+        'Anliegen: Drucker druckt nicht',
+        'Nutzer: Papierstau in Fach 2',
+        'Antwort: Druckerprobleme beheben',
+    ]
+    many = [ChatMessage(Sender.USER, f'Nachricht {index}') for index in range(6)]
+    assert extractive_summary(many, max_user=4)[-1] == '… und 2 weitere Nachrichten des Nutzers'
+
+def test_parse_points_strips_list_markers():
+    assert parse_points('- **Drucker** offline\n\n2) Treiber neu\n* fertig', max_points=2) == [
+        'Drucker offline', 'Treiber neu',
+    ]
+
+def test_dry_run_writes_the_message_to_the_spool(tmp_path, monkeypatch):
+    monkeypatch.setenv('EMAIL_DRY_RUN', 'true')
+    monkeypatch.setenv('EMAIL_SPOOL_DIR', str(tmp_path))
+    dispatcher = EmailDispatcher(config=SMTPConfig(), num_workers=1)
+    msg = SummaryRenderer().build_message('bot@example.com', 'it@example.com', 'Max', 'max@example.com',
+                                          ['Anliegen: VPN'], 'VPN')
+    job_id = dispatcher.submit(msg, ['it@example.com'])
+    dispatcher.shutdown()
+
+    assert dispatcher.get_status(job_id)['status'] == 'spooled'
+    [spooled] = tmp_path.iterdir()
+    assert spooled.name.endswith(f'{job_id}.eml')
+    assert bodies(message_from_bytes(spooled.read_bytes()))[0] == bodies(msg)[0]
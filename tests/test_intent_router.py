@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from chat_history import ChatMessage, Sender
+from intent_router import IntentRouter
+from knowledge_base import get_knowledge_base
+
+@pytest.fixture(scope='module')
+def kb():
+    return get_knowledge_base()
+
+@pytest.fixture(scope='module')
+def router(kb):
+    router = IntentRouter()
+    router.train(kb)
+    return router
+
+def intent(router, kb, message, chat_history=()):
+    route = router.route(kb, message, chat_history)
+    return route.intent if route else None
+
+def test_confident_messages_are_routed(router, kb):
+    route = router.route(kb, 'Drucker geht nicht')
+    assert route.intent == 'printer'
+    assert route.confidence >= router.threshold
+    assert route.answer == kb.articles['printer']['response']
+    assert intent(router, kb, 'Passwort vergessen') == 'password'
+
+def test_abstains_below_the_threshold(router, kb):
+    model = router.model_for(kb)
+    _, confidences = model.predict(['Drucker geht nicht'])
+    strict = IntentRouter(threshold=float(confidences[0]) + 0.001)
+    strict.train(kb)
+    assert intent(strict, kb, 'Drucker geht nicht') is None
+
+def test_abstains_on_unknown_and_long_messages(router, kb):
+    assert intent(router, kb, 'Mein Bildschirm zeigt seit dem Update komische Farben') is None
+    assert intent(router, kb, 'asdf qwer') is None
+    assert intent(router, kb, 'Drucker geht nicht ' * 5) is None
+
+def test_small_talk_only_without_problem_words(router, kb):
+    assert intent(router, kb, 'Hallo') == 'greeting'
+    assert intent(router, kb, 'Vielen Dank!') == 'thanks'
+    assert intent(router, kb, 'Danke, aber das hat nicht geklappt') is None
+
+def test_article_is_not_given_twice_in_a_chat(router, kb):
+    history = [ChatMessage(Sender.USER, 'Drucker geht nicht'), ChatMessage(Sender.BOT, kb.articles['printer']['response'])]
+    assert intent(router, kb, 'Drucker geht nicht', history) is None
+    # Small talk may repeat
+    assert intent(router, kb, 'Hallo', [ChatMessage(Sender.BOT, router.answer_for(kb, 'greeting'))]) == 'greeting'
+
+def test_messages_go_to_the_llm_while_training(kb):
+    router = IntentRouter()
+    assert router.ready_model(kb) is None
+    assert intent(router, kb, 'Drucker geht nicht') is None
+    deadline = time.monotonic() + 30
+    while router.ready_model(kb) is None:
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    assert intent(router, kb, 'Drucker geht nicht') == 'printer'
@@ -0,0 +1,39 @@
+import time
+from email.message import EmailMessage
+
+from email_dispatch import EmailDispatcher, SMTPConfig
+from job_store import MemoryJobStore, SQLiteJobStore
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+def test_memory_store_keeps_kinds_apart_and_drops_oldest():
+    store = MemoryJobStore(max_jobs=2)
+    store.put('email', {'job_id': 'a', 'status': 'queued'})
+    store.put('summary', {'job_id': 'a', 'status': 'summarizing'})
+    assert store.get('email', 'a')['status'] == 'queued'
+    store.put('email', {'job_id': 'b', 'status': 'queued'})
+    assert store.get('email', 'a') is None
+    assert store.get('summary', 'a')['status'] == 'summarizing'
+
+def test_sqlite_status_is_visible_to_other_workers(tmp_path, monkeypatch):
+    monkeypatch.setenv('EMAIL_DRY_RUN', 'true')
+    monkeypatch.setenv('EMAIL_SPOOL_DIR', str(tmp_path / 'spool'))
+    path = str(tmp_path / 'sessions.db')
+    dispatcher = EmailDispatcher(config=SMTPConfig(), jobs=SQLiteJobStore(path))
+    # Another worker process opens its own store on the same database
+    other_worker = SQLiteJobStore(path)
+
+    msg = EmailMessage()
+    msg['Subject'] = 'Summary'
+    msg.set_content('text')
+    job_id = dispatcher.submit(msg, ['it@example.com'])
+    try:
+        assert wait_for(lambda: (other_worker.get('email', job_id) or {}).get('status') == 'spooled')
+        assert other_worker.get('email', job_id)['attempts'] == 1
+        assert other_worker.get('summary', job_id) is None
+    finally:
+        dispatcher.shutdown()
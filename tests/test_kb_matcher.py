@@ -0,0 +1,43 @@
+from kb_matcher import KeywordMatcher
+from knowledge_base import get_knowledge_base
+
+MESSAGES = [
+    'Mein Computer startet nicht mehr',
+    'Outlook zeigt keine neuen E-Mails an',
+    'Der Drucker im 2. Stock druckt nur leere Seiten',
+    'VPN-Verbindung bricht ab, WLAN ist aber da',
+    'Passwort vergessen und Konto gesperrt',
+    'PC und Drucker gehen beide nicht, und Outlook hängt',
+    'Hallo',
+    '',
+]
+
+def keyword_scan(keyword_map, text):
+    """The linear scan the matcher replaced: `keyword in message.lower()` for every keyword"""
+    text = text.lower()
+    matches = {}
+    for category, keywords in keyword_map.items():
+        found = {keyword.lower() for keyword in keywords if keyword.lower() in text}
+        if found:
+            matches[category] = found
+    return matches
+
+def test_overlapping_keywords_match_like_substring_search():
+    keyword_map = {'a': ['he', 'she', 'hers'], 'b': ['his', 'e'], 'c': ['Mail', 'e-mail']}
+    matcher = KeywordMatcher(keyword_map)
+    for text in ('ushers', 'this is his', 'E-Mail', 'nothing', 'shehishers'):
+        assert matcher.find(text) == keyword_scan(keyword_map, text)
+
+def test_knowledge_base_matches_equal_the_keyword_scan():
+    kb = get_knowledge_base()
+    for matcher, entries in ((kb.article_matcher, kb.articles), (kb.fallback_matcher, kb.fallbacks)):
+        keyword_map = {category: entry['keywords'] for category, entry in entries.items()}
+        for message in MESSAGES:
+            assert matcher.find(message) == keyword_scan(keyword_map, message)
+
+def test_rank_prefers_more_keywords_then_category_order():
+    matcher = KeywordMatcher({'printer': ['drucker'], 'email': ['outlook', 'mail'], 'vpn': ['vpn']})
+    assert matcher.rank('Outlook Mail und Drucker') == [('email', 2), ('printer', 1)]
+    # A tie keeps the first category, like the first hit of the old scan
+    assert matcher.best('Drucker und VPN') == 'printer'
+    assert matcher.best('Bildschirm flackert') is None
@@ -0,0 +1,53 @@
+from metrics import MetricsRegistry
+
+def test_counter_counts_per_label_and_escapes_values():
+    registry = MetricsRegistry()
+    requests = registry.counter('requests_total', 'Requests', ['route'])
+    requests.inc(route='chat')
+    requests.inc(2, route='chat')
+    requests.inc(route='say "hi"\n')
+    assert requests.value(route='chat') == 3
+    assert requests.value(route='other') == 0
+    assert registry.counter('requests_total', 'Requests', ['route']) is requests
+
+    text = registry.render()
+    assert '# TYPE requests_total counter' in text
+    assert 'requests_total{route="chat"} 3' in text
+    assert 'requests_total{route="say \\"hi\\"\\n"} 1' in text
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert 'latency_seconds_sum 3.65' in lines
+    assert 'latency_seconds_count 4' in lines
+
+def test_gauge_keeps_the_last_value():
+    registry = MetricsRegistry()
+    queue = registry.gauge('queue_size', 'Queue size')
+    queue.set(5)
+    queue.set(2)
+    assert 'queue_size 2' in registry.render().splitlines()
+
+def test_span_observes_the_duration():
+    registry = MetricsRegistry()
+    with registry.span('llm'):
+        pass
+    assert 'it_support_span_duration_seconds_count{span="llm"} 1' in registry.render().splitlines()
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+    requests = registry.counter('requests_total', 'Requests')
+    requests.inc()
+    registry.gauge('queue_size', 'Queue size').set(1)
+    registry.histogram('latency_seconds', 'Latency').observe(0.5)
+    with registry.span('llm'):
+        pass
+    assert requests.value() == 0
+    assert all(line.startswith('#') for line in registry.render().splitlines())
@@ -0,0 +1,69 @@
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limit
+from rate_limit import AzureQuota, MemoryBucketStore, RateLimiter, SQLiteBucketStore, parse_rate
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(rate_limit, 'time', SimpleNamespace(monotonic=lambda: clock.now, time=lambda: clock.now))
+    return clock
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path, clock):
+    if request.param == 'memory':
+        return MemoryBucketStore()
+    return SQLiteBucketStore(str(tmp_path / 'ratelimit.db'))
+
+def test_parse_rate():
+    assert parse_rate('10/60') == (10.0, 10.0 / 60)
+    assert parse_rate('5') == (5.0, 5.0 / 60)
+    assert parse_rate('0/60') is None
+    assert parse_rate('') is None
+
+def test_bucket_refills_over_time(store, clock):
+    assert store.take('k', 1, 2, 1.0) == (True, 1.0)
+    assert store.take('k', 1, 2, 1.0) == (True, 0.0)
+    assert store.take('k', 1, 2, 1.0)[0] is False
+    clock.now += 0.5
+    assert store.take('k', 1, 2, 1.0)[0] is False
+    clock.now += 0.5
+    assert store.take('k', 1, 2, 1.0)[0] is True
+    # Never above capacity
+    clock.now += 100
+    assert store.take('k', 0, 2, 1.0) == (True, 2.0)
+
+def test_refund_and_forced_debt(store):
+    store.take('k', 2, 2, 0.001)
+    assert store.take('k', -1, 2, 0.001, force=True)[1] == pytest.approx(1.0, abs=0.01)
+    # Forced takes may go into debt, but not below -capacity
+    assert store.take('k', 10, 2, 0.001, force=True)[1] == -2
+
+def test_rejected_message_refunds_the_buckets_it_passed(store):
+    limiter = RateLimiter(store, session_rate=(5, 0.001), user_rate=(1, 0.001))
+    assert limiter.check('s1', 'max@example.com') is None
+    assert limiter.check('s1', 'Max@Example.com') == 'user'
+    assert store.take('session:s1', 0, 5, 0.001)[1] == pytest.approx(4.0, abs=0.01)
+
+def test_azure_quota_settles_reported_usage(store):
+    quota = AzureQuota(store, rpm=3, tpm=1000)
+    assert quota.acquire(600)
+    quota.settle(600, 100)
+    assert quota.acquire(800)
+    assert not quota.acquire(200)
+    # The call rejected for tokens gave its request back
+    assert store.take('azure:rpm', 0, 3, 3 / 60)[1] == pytest.approx(1.0, abs=0.01)
+
+def test_locked_database_lets_the_call_through(tmp_path):
+    path = str(tmp_path / 'ratelimit.db')
+    store = SQLiteBucketStore(path, lock_timeout=0.01)
+    other_worker = sqlite3.connect(path, isolation_level=None)
+    other_worker.execute('BEGIN IMMEDIATE')
+    try:
+        assert store.take('k', 1, 1, 1.0) == (True, None)
+    finally:
+        other_worker.execute('ROLLBACK')
+    assert store.take('k', 1, 1, 1.0) == (True, 0.0)
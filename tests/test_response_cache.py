@@ -0,0 +1,58 @@
+from response_cache import ResponseCache, create_response_cache
+
+def near_cache():
+    # A low threshold lets MinHash propose the candidates; the word check has to reject them
+    return ResponseCache(near_duplicates=True, similarity_threshold=0.5)
+
+def test_exact_hit_ignores_case_and_punctuation():
+    cache = ResponseCache()
+    cache.put('Wie richte ich Outlook ein?', 'answer')
+    assert cache.get('wie richte ich  outlook ein') == 'answer'
+    assert cache.get('Wie richte ich Teams ein?') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+def test_context_and_namespace_separate_entries():
+    cache = ResponseCache()
+    cache.put('Und jetzt?', 'after vpn', context=('VPN geht nicht',))
+    assert cache.get('Und jetzt?', context=('Drucker geht nicht',)) is None
+    assert cache.get('Und jetzt?', context=('VPN geht nicht',)) == 'after vpn'
+    cache.set_namespace('kb-v2')
+    assert cache.get('Und jetzt?', context=('VPN geht nicht',)) is None
+
+def test_expired_and_evicted_entries_miss():
+    cache = ResponseCache(max_entries=2, ttl_seconds=0)
+    cache.put('a', 'first')
+    assert cache.get('a') is None
+    cache = ResponseCache(max_entries=2)
+    for message in ('a', 'b', 'c'):
+        cache.put(message, message)
+    assert cache.get('a') is None
+    assert cache.get('c') == 'c'
+    assert cache.stats()['evictions'] == 1
+
+def test_near_duplicates_are_off_by_default(monkeypatch):
+    monkeypatch.delenv('RESPONSE_CACHE_NEAR_DUPLICATES', raising=False)
+    assert create_response_cache().minhasher is None
+    assert ResponseCache().minhasher is None
+
+def test_near_duplicate_serves_a_typo():
+    cache = near_cache()
+    cache.put('Wie richte ich Outlook auf dem iPhone ein', 'outlook')
+    assert cache.get('Wie richte ich Outlok auf dem iPhone ein') == 'outlook'
+    assert cache.stats()['near_duplicate_hits'] == 1
+
+def test_near_duplicate_rejects_negating_prefix():
+    cache = near_cache()
+    cache.put('Wie installiere ich Teams auf meinem Laptop', 'install')
+    assert cache.get('Wie deinstalliere ich Teams auf meinem Laptop') is None
+
+def test_near_duplicate_rejects_other_numbers():
+    cache = near_cache()
+    cache.put('VPN verbinden, Fehler 809', 'error 809')
+    assert cache.get('VPN verbinden, Fehler 691') is None
+
+def test_near_duplicate_rejects_negation():
+    cache = near_cache()
+    cache.put('Mein Drucker druckt mehr im Büro', 'printer')
+    assert cache.get('Mein Drucker druckt nicht mehr im Büro') is None
@@ -0,0 +1,48 @@
+import threading
+
+from chat_history import ChatMessage, Sender
+from session_store import MemorySessionStore, SQLiteSessionStore, TieredSessionStore
+
+def messages(record):
+    return [entry.message for entry in record['chat_history']]
+
+def test_concurrent_get_merges_new_messages_once(tmp_path):
+    store = TieredSessionStore(MemorySessionStore(), SQLiteSessionStore(str(tmp_path / 'sessions.db')))
+    store.create('s1', 'Max', 'max@example.com')
+    store.append_message('s1', ChatMessage(Sender.USER, 'a'))
+    assert messages(store.get('s1')) == ['a']
+
+    for round_number in range(20):
+        text = f'b{round_number}'
+        store.append_message('s1', ChatMessage(Sender.BOT, text))
+        barrier = threading.Barrier(8)
+
+        def read():
+            barrier.wait()
+            store.get('s1')
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    expected = ['a'] + [f'b{round_number}' for round_number in range(20)]
+    assert messages(store.get('s1')) == expected
+    assert messages(store.memory.get('s1')) == expected
+
+def test_refresh_never_moves_last_seq_back(tmp_path):
+    store = TieredSessionStore(MemorySessionStore(), SQLiteSessionStore(str(tmp_path / 'sessions.db')))
+    store.create('s1', 'Max', 'max@example.com')
+    store.append_message('s1', ChatMessage(Sender.USER, 'a'))
+    store.append_message('s1', ChatMessage(Sender.BOT, 'b'))
+    record = store.get('s1')
+
+    # A request that loaded the session before 'b' was written finishes late
+    stale = store.backend.get('s1', after_seq=0)
+    stale['seqs'], stale['chat_history'] = stale['seqs'][:1], list(stale['chat_history'])[:1]
+    stale['last_seq'] = stale['seqs'][0]
+    store.memory.refresh('s1', stale)
+
+    assert record['last_seq'] == store.backend.get('s1')['last_seq']
+    assert messages(store.get('s1')) == ['a', 'b']
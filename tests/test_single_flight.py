@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight, flight_key
+
+def run_together(target, count):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(target())) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_flight_key_ignores_case_and_punctuation():
+    assert flight_key('ns', 'Drucker geht nicht!') == flight_key('ns', 'drucker  geht nicht')
+    assert flight_key('ns', 'Drucker') != flight_key('other', 'Drucker')
+    assert flight_key('ns', 'Und jetzt?', ('VPN',)) != flight_key('ns', 'Und jetzt?', ('WLAN',))
+
+def test_concurrent_calls_share_one_upstream_call():
+    flights = SingleFlight()
+    calls = []
+
+    def call():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'answer'
+
+    assert run_together(lambda: flights.do('key', call), 5) == ['answer'] * 5
+    assert len(calls) == 1
+    stats = flights.stats()
+    assert (stats['upstream_calls'], stats['coalesced_requests'], stats['in_flight']) == (1, 4, 0)
+
+    # Finished calls are not reused
+    assert flights.do('key', call) == 'answer'
+    assert len(calls) == 2
+
+def test_error_reaches_every_waiting_caller():
+    flights = SingleFlight()
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError('upstream down')
+
+    errors = []
+
+    def follower():
+        started.wait()
+        try:
+            flights.do('key', fail)
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=follower)
+    thread.start()
+    with pytest.raises(RuntimeError):
+        flights.do('key', fail)
+    thread.join()
+    assert len(errors) == 1
+
+def test_disabled_calls_every_time():
+    flights = SingleFlight(enabled=False)
+    calls = []
+    run_together(lambda: flights.do('key', lambda: calls.append(1)), 3)
+    assert len(calls) == 3
+
+def test_stream_is_read_once_and_replayed_to_late_subscribers():
+    flights = SingleFlight()
+    reads = []
+
+    def chunks():
+        reads.append(1)
+        for word in ('a', 'b', 'c'):
+            time.sleep(0.05)
+            yield word
+
+    assert run_together(lambda: ''.join(flights.stream('key', chunks)), 4) == ['abc'] * 4
+    assert len(reads) == 1
+
+def test_stream_stops_when_the_last_subscriber_leaves():
+    flights = SingleFlight()
+    closed = threading.Event()
+
+    def chunks():
+        try:
+            for word in ('a', 'b', 'c', 'd'):
+                time.sleep(0.05)
+                yield word
+        finally:
+            closed.set()
+
+    stream = flights.stream('key', chunks)
+    assert next(stream) == 'a'
+    stream.close()
+    assert closed.wait(1.0)
+    assert flights.stats()['in_flight'] == 0
@@ -0,0 +1,57 @@
+import gzip
+
+from static_assets import IMMUTABLE, REVALIDATE, AssetBundle
+
+def bundle_with(tmp_path, css):
+    (tmp_path / 'css').mkdir(exist_ok=True)
+    (tmp_path / 'css' / 'chat.css').write_text(css)
+    return AssetBundle(str(tmp_path))
+
+def test_fingerprint_follows_the_content(tmp_path):
+    first = bundle_with(tmp_path, 'body { color: red; }' * 50)
+    url = first.url('css/chat.css')
+    assert url.startswith('/static/css/chat.') and url.endswith('.css')
+    assert bundle_with(tmp_path, 'body { color: red; }' * 50).url('css/chat.css') == url
+    assert bundle_with(tmp_path, 'body { color: blue; }' * 50).url('css/chat.css') != url
+
+def test_fingerprinted_name_is_immutable_and_plain_name_revalidates(tmp_path):
+    bundle = bundle_with(tmp_path, 'body { color: red; }' * 50)
+    fingerprinted = bundle.get(bundle.url('css/chat.css')[len('/static/'):])
+    plain = bundle.get('css/chat.css')
+    assert fingerprinted.cache_control == IMMUTABLE
+    assert plain.cache_control == REVALIDATE
+    assert plain.etags == fingerprinted.etags
+    assert gzip.decompress(plain.bodies['gzip']) == plain.bodies['identity']
+    assert plain.etags['gzip'] != plain.etags['identity']
+    assert bundle.get('css/missing.css') is None
+
+def test_static_file_etag_and_304(client, chatbot):
+    url = chatbot.get_static_assets().url('js/chat.js')
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == IMMUTABLE
+    etag = response.headers['ETag']
+
+    cached = client.get(url, headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+    assert client.get(url, headers={'If-None-Match': '"stale"'}).status_code == 200
+    assert client.get('/static/js/missing.js').status_code == 404
+
+def test_each_encoding_has_its_own_etag(client, chatbot):
+    url = chatbot.get_static_assets().url('js/chat.js')
+    plain = client.get(url)
+    zipped = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in zipped.headers['Vary']
+    assert zipped.headers['ETag'] != plain.headers['ETag']
+    assert gzip.decompress(zipped.data) == plain.data
+    # An identity ETag does not validate the gzip body
+    assert client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': plain.headers['ETag']}).status_code == 200
+
+def test_chat_page_revalidates_with_its_etag(client):
+    page = client.get('/')
+    assert page.status_code == 200
+    assert page.headers['Cache-Control'] == REVALIDATE
+    assert b'/static/js/chat.' in page.data
+    assert client.get('/', headers={'If-None-Match': page.headers['ETag']}).status_code == 304